@@ -0,0 +1,99 @@
+"""
+Local verification of the user service's signed access tokens.
+
+An access token (user_service/app_user/access_tokens.py) is a JWT signed with
+HMAC-SHA256 under one of the keys in ACCESS_TOKEN_KEYS, named by its `kid`
+header. Verifying one takes a few microseconds and no network: the signature,
+issuer, type and expiry (with ACCESS_TOKEN_LEEWAY seconds of clock skew) are
+checked, and `sub` is the user id.
+
+When the user service deletes the DRF token a session was started with
+(logout), it publishes the token's hash, which is the access tokens' `sid`,
+on AUTH_TOKEN_REVOKED_CHANNEL. token_cache's listener thread passes it to
+revoke_session, and the session's access tokens are refused until they would
+have expired anyway. A process started after a logout does not know about it
+and accepts the session's tokens for at most ACCESS_TOKEN_TTL seconds.
+"""
+from django.conf import settings
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+ISSUER = 'user_service'
+
+# Session id -> time (monotonic) after which its access tokens have all expired
+_revoked_sessions = {}
+_revoked_lock = threading.Lock()
+
+
+class InvalidAccessToken(Exception):
+    """The token is malformed, signed with an unknown key or has a bad signature or claims"""
+
+
+class ExpiredAccessToken(InvalidAccessToken):
+    pass
+
+
+class RevokedAccessToken(InvalidAccessToken):
+    pass
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def revoke_session(sid: str):
+    """Refuse the access tokens of session `sid` (the SHA-256 of its DRF token)"""
+    now = time.monotonic()
+    with _revoked_lock:
+        _revoked_sessions[sid] = now + settings.ACCESS_TOKEN_TTL + settings.ACCESS_TOKEN_LEEWAY
+        if len(_revoked_sessions) > 1000:
+            for expired in [key for key, until in _revoked_sessions.items() if until <= now]:
+                del _revoked_sessions[expired]
+
+
+def _is_revoked(sid: str) -> bool:
+    until = _revoked_sessions.get(sid)
+    return until is not None and until > time.monotonic()
+
+
+def verify(token: str) -> dict:
+    """The claims of a valid access token; raises InvalidAccessToken (or a subclass) otherwise"""
+    try:
+        header_segment, claims_segment, signature_segment = token.split('.')
+        header = json.loads(_b64decode(header_segment))
+        signature = _b64decode(signature_segment)
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidAccessToken('Malformed token')
+    if not isinstance(header, dict):
+        raise InvalidAccessToken('Malformed header')
+    if header.get('alg') != 'HS256':
+        raise InvalidAccessToken('Unsupported algorithm')
+    kid = header.get('kid')
+    secret = settings.ACCESS_TOKEN_KEYS.get(kid) if isinstance(kid, str) else None
+    if secret is None:
+        raise InvalidAccessToken('Unknown signing key')
+    expected = hmac.new(secret.encode(), f"{header_segment}.{claims_segment}".encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected):
+        raise InvalidAccessToken('Bad signature')
+
+    try:
+        claims = json.loads(_b64decode(claims_segment))
+        if not isinstance(claims, dict) or not isinstance(claims.get('sid', ''), str):
+            raise TypeError('Claims are not an object')
+        exp = float(claims['exp'])
+        user_id = int(claims['sub'])
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise InvalidAccessToken('Malformed claims')
+    if claims.get('iss') != ISSUER or claims.get('typ') != 'access':
+        raise InvalidAccessToken('Not an access token')
+    if exp + settings.ACCESS_TOKEN_LEEWAY < time.time():
+        raise ExpiredAccessToken('Token has expired')
+    if _is_revoked(claims.get('sid')):
+        raise RevokedAccessToken('Session has ended')
+    claims['user_id'] = user_id
+    return claims
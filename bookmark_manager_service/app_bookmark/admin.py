@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Bookmark, SupportedSite, ScrapingLog
+from django.db.models import Count
+from .models import Bookmark, SupportedSite, ScrapingLog, ScrapeCacheEntry, ThumbnailBlob
 
 @admin.register(Bookmark)
 class BookmarkAdmin(admin.ModelAdmin):
@@ -10,12 +11,34 @@ class BookmarkAdmin(admin.ModelAdmin):
 
 @admin.register(SupportedSite)
 class SupportedSiteAdmin(admin.ModelAdmin):
-    list_display = ['name', 'domain', 'is_active', 'created_at']
+    list_display = ['name', 'domain', 'is_active', 'rate_limit_per_minute', 'burst', 'max_concurrency', 'created_at']
     list_filter = ['is_active']
     search_fields = ['name', 'domain', 'description']
 
+@admin.register(ThumbnailBlob)
+class ThumbnailBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'size', 'reference_count', 'last_referenced_at', 'created_at']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'file', 'size', 'created_at', 'last_referenced_at']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            bookmark_refs=Count('bookmarks', distinct=True),
+            cache_refs=Count('cache_entries', distinct=True),
+        )
+
+    @admin.display(description='References')
+    def reference_count(self, obj):
+        return obj.bookmark_refs + obj.cache_refs
+
+@admin.register(ScrapeCacheEntry)
+class ScrapeCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['title', 'url', 'site', 'scraped_at']
+    list_filter = ['site']
+    search_fields = ['title', 'url']
+
 @admin.register(ScrapingLog)
 class ScrapingLogAdmin(admin.ModelAdmin):
-    list_display = ['url', 'status', 'scraping_duration', 'created_at']
-    list_filter = ['status', 'created_at']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    list_display = ['url', 'status', 'tier', 'failure_type', 'scraping_duration', 'ready_wait_duration', 'created_at']
+    list_filter = ['status', 'tier', 'failure_type', 'created_at']
+    readonly_fields = ['timings', 'created_at']
\ No newline at end of file
@@ -1,8 +1,16 @@
-import requests
+import httpx
 import os
+import time
 from django.contrib.auth.models import AnonymousUser
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+import logging
+from .metrics import AUTH_LATENCY, AUTH_ACCESS_TOKEN_VERIFICATIONS
+from . import access_tokens, token_cache
+from .service_client import ServiceUnavailable, get_client
+from .timing import log_event
+
+logger = logging.getLogger(__name__)
 
 class SimpleAuthenticatedUser:
     def __init__(self, user_id):
@@ -21,47 +29,86 @@ class SimpleAuthenticatedUser:
 class UserServiceTokenAuthentication(BaseAuthentication):
     def authenticate(self, request):
         auth_header = request.META.get('HTTP_AUTHORIZATION')
+        if auth_header and auth_header.lower().startswith('bearer '):
+            return self.authenticate_access_token(auth_header.split(' ')[1])
         if not auth_header or not auth_header.lower().startswith('token '):
             return None  # No token provided, authentication will fail or be handled by other classes
 
         token = auth_header.split(' ')[1]
 
+        found, user_id = token_cache.lookup(token)
+        if found:
+            if user_id is None:
+                raise AuthenticationFailed('Invalid or expired token.')
+            return (SimpleAuthenticatedUser(user_id), token)
+
         user_service_url = os.environ.get('USER_SERVICE_VALIDATE_TOKEN_URL')
         if not user_service_url:
-            print("CRITICAL: USER_SERVICE_VALIDATE_TOKEN_URL is not configured.")
+            log_event(logger, logging.CRITICAL, 'user_service_url_missing', setting='USER_SERVICE_VALIDATE_TOKEN_URL')
             raise AuthenticationFailed('User service URL not configured. Authentication cannot proceed.')
 
+        start = time.monotonic()
+        outcome = 'error'
         try:
             # This endpoint in user_service should be protected and return user details if token is valid
-            response = requests.get(
+            # Pooled, with retries and a circuit breaker (see service_client.py)
+            response = get_client().get(
+                'user_service',
                 user_service_url,
                 headers={'Authorization': f'Token {token}'},
-                timeout=5
             )
+            outcome = 'rejected' if response.status_code in (401, 403) else 'error'
             response.raise_for_status()  # Raises HTTPError for bad responses (4xx or 5xx)
             user_data = response.json()
 
             if 'id' in user_data:
                 # Successfully authenticated with user_service
+                outcome = 'ok'
+                token_cache.remember(token, user_data['id'])
                 return (SimpleAuthenticatedUser(user_data['id']), token)
             else:
                 raise AuthenticationFailed('Invalid user data format from user service.')
 
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPStatusError as e:
             if e.response.status_code == 401 or e.response.status_code == 403:
                 # Token is invalid or expired according to user_service
+                token_cache.remember(token, None)
                 raise AuthenticationFailed('Invalid or expired token.')
             else:
                 # Other HTTP error from user_service
-                print(f"HTTP error when validating token with user service: {e}")
+                log_event(logger, logging.ERROR, 'user_service_http_error', status=e.response.status_code, error=str(e))
                 raise AuthenticationFailed('Error validating token with user service.')
-        except requests.exceptions.RequestException as e:
+        except ServiceUnavailable as e:
+            # The user service kept failing; fail fast instead of tying up this worker
+            outcome = 'unavailable'
+            log_event(logger, logging.ERROR, 'user_service_unavailable', error=str(e))
+            raise AuthenticationFailed('User service is unavailable, try again shortly.')
+        except httpx.HTTPError as e:
             # Network error, timeout, etc.
-            print(f"Could not connect to user service: {e}")
+            log_event(logger, logging.ERROR, 'user_service_unreachable', error=str(e))
             raise AuthenticationFailed('Could not connect to user service for token validation.')
         except ValueError:  # Includes JSONDecodeError
-            print("Invalid JSON response from user service.")
+            log_event(logger, logging.ERROR, 'user_service_invalid_response')
             raise AuthenticationFailed('Invalid response from user service.')
+        finally:
+            AUTH_LATENCY.labels(outcome).observe(time.monotonic() - start)
+
+    def authenticate_access_token(self, token):
+        # Signed by the user service and verified here, without calling it
+        token_cache.start_revocation_listener()
+        try:
+            claims = access_tokens.verify(token)
+        except access_tokens.ExpiredAccessToken:
+            AUTH_ACCESS_TOKEN_VERIFICATIONS.labels('expired').inc()
+            raise AuthenticationFailed('Access token has expired.')
+        except access_tokens.RevokedAccessToken:
+            AUTH_ACCESS_TOKEN_VERIFICATIONS.labels('revoked').inc()
+            raise AuthenticationFailed('Invalid or expired token.')
+        except access_tokens.InvalidAccessToken:
+            AUTH_ACCESS_TOKEN_VERIFICATIONS.labels('invalid').inc()
+            raise AuthenticationFailed('Invalid or expired token.')
+        AUTH_ACCESS_TOKEN_VERIFICATIONS.labels('ok').inc()
+        return (SimpleAuthenticatedUser(claims['user_id']), token)
 
     def authenticate_header(self, request):
         # Used to populate the WWW-Authenticate header for 401 Unauthorized responses
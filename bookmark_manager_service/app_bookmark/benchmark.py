@@ -0,0 +1,289 @@
+"""
+Offline scraper benchmark.
+
+Recorded pages and images of each site live in benchmarks/fixtures/<domain>/,
+with a manifest.json mapping URL paths (regular expressions) to files. A
+FixtureServer serves one site's directory on a local port, and the scrapers
+are pointed at it through SCRAPER_HOST_OVERRIDES, so a run needs no network
+and gives the same pages every time. run_benchmark scrapes a target repeatedly
+from a pool of worker threads and reports latency percentiles, throughput per
+worker and peak memory (including Chrome), as a dict that can be saved as JSON
+and compared with a later run (see the benchmark_scrapers command).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.conf import settings
+from django.db import connections
+import json
+import os
+import platform
+import re
+import subprocess
+import threading
+import time
+import psutil
+
+FIXTURES_DIR = os.path.join(settings.BASE_DIR, 'benchmarks', 'fixtures')
+
+# Benchmark targets: (site domain, what runs for each sample)
+TARGETS = {
+    'hitomi': ('hitomi.la', 'browser'),
+    'bato': ('bato.to', 'browser'),
+    'hitomi_http': ('hitomi.la', 'http'),
+    'bato_http': ('bato.to', 'http'),
+    'task_hitomi': ('hitomi.la', 'task'),
+    'task_bato': ('bato.to', 'task'),
+}
+
+# user_id of the bookmarks created by task targets; they are deleted afterwards
+BENCHMARK_USER_ID = -1
+
+
+class FixtureSite:
+    """A site's recorded responses: manifest routes plus the files they serve"""
+
+    def __init__(self, domain: str, fixtures_dir: str = FIXTURES_DIR):
+        self.domain = domain
+        self.directory = os.path.join(fixtures_dir, domain)
+        with open(os.path.join(self.directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+        self.sample_url = manifest['sample_url']
+        self.routes = []
+        for route in manifest['routes']:
+            with open(os.path.join(self.directory, route['file']), 'rb') as f:
+                body = f.read()
+            content_type = route.get('content_type', 'application/octet-stream')
+            self.routes.append((re.compile(route['path']), content_type, body))
+
+    def match(self, path: str):
+        """(content type, body) recorded for a request path, or None"""
+        for pattern, content_type, body in self.routes:
+            if pattern.search(path):
+                return content_type, body
+        return None
+
+    def url(self, n: int) -> str:
+        """The n-th page URL of the site; each n is a distinct, uncached page"""
+        return self.sample_url.format(n=n)
+
+
+class FixtureServer:
+    """Serves a FixtureSite on 127.0.0.1, optionally adding latency to every response"""
+
+    def __init__(self, site: FixtureSite, latency: float = 0.0):
+        self.site = site
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are separate writes; Nagle would hold the body for a delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.requests += 1
+                if latency:
+                    time.sleep(latency)
+                found = site.match(self.path.split('?', 1)[0])
+                if found is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                content_type, body = found
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def origin(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class PeakMemorySampler:
+    """Peak RSS of this process plus its children (chromedriver, Chrome) while running"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> int:
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._sample())
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Linear-interpolated percentile of `values` (fraction in 0..1)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _scrape_once(mode: str, domain: str, url: str, start_tier: str = None) -> bool:
+    """Run one sample and return whether it produced a title and cover"""
+    from .scrapers import SCRAPER_REGISTRY, HTTP_SCRAPER_REGISTRY
+    if mode == 'task':
+        from .tasks import scrape_manga_info_task
+        outcome = scrape_manga_info_task.apply(args=(BENCHMARK_USER_ID, url), kwargs={'start_tier': start_tier})
+        if not outcome.successful():
+            raise outcome.result
+        return bool(outcome.result.get('success'))
+    registry = HTTP_SCRAPER_REGISTRY if mode == 'http' else SCRAPER_REGISTRY
+    result = registry[domain].load()().scrape_manga_info(url)
+    return bool(result.title and result.thumbnail_data)
+
+
+def _cleanup_task_run(urls: list):
+    """Delete what task samples left behind: bookmarks, logs and scrape cache entries"""
+    from .canonical import canonicalize_url
+    from .models import Bookmark, ScrapeCacheEntry, ScrapingLog
+    canonical_urls = [canonicalize_url(url) for url in urls]
+    ScrapingLog.objects.filter(url__in=canonical_urls).delete()
+    Bookmark.objects.filter(user_id=BENCHMARK_USER_ID).delete()
+    ScrapeCacheEntry.objects.filter(url__in=canonical_urls).delete()
+
+
+def run_benchmark(target: str, iterations: int = 20, workers: int = 1, warmup: int = 2,
+                  latency: float = 0.0, start_tier: str = None, fixtures_dir: str = FIXTURES_DIR) -> dict:
+    """
+    Scrape `target` `iterations` times from `workers` threads against its
+    fixture server, after `warmup` untimed samples (driver start-up, imports,
+    connection pools). Every sample uses a distinct page URL.
+    """
+    from django.test.utils import override_settings
+    domain, mode = TARGETS[target]
+    site = FixtureSite(domain, fixtures_dir)
+    urls = [site.url(n) for n in range(1, warmup + iterations + 1)]
+    latencies = []
+    failures = 0
+
+    def sample(url):
+        start = time.perf_counter()
+        try:
+            ok = _scrape_once(mode, domain, url, start_tier)
+        except Exception as e:
+            print(f"[ERROR] Benchmark sample {url} failed: {type(e).__name__}: {e}")
+            ok = False
+        finally:
+            connections.close_all()
+        return time.perf_counter() - start, ok
+
+    overrides = {'SCRAPER_HOST_OVERRIDES': None}
+    if mode == 'task':
+        # The politeness limits would turn most samples into deferrals
+        overrides.update(
+            SCRAPER_DEFAULT_RATE_PER_MINUTE=10 ** 6, SCRAPER_DEFAULT_BURST=10 ** 6,
+            SCRAPER_DEFAULT_MAX_CONCURRENCY=10 ** 6,
+        )
+
+    with FixtureServer(site, latency) as server:
+        overrides['SCRAPER_HOST_OVERRIDES'] = {domain: server.origin}
+        with override_settings(**overrides):
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    list(pool.map(sample, urls[:warmup]))
+                    with PeakMemorySampler() as memory:
+                        started = time.perf_counter()
+                        for elapsed, ok in pool.map(sample, urls[warmup:]):
+                            latencies.append(elapsed)
+                            failures += not ok
+                        wall = time.perf_counter() - started
+            finally:
+                if mode == 'task':
+                    _cleanup_task_run(urls)
+                    connections.close_all()
+
+    completed = len(latencies) - failures
+    return {
+        'target': target,
+        'iterations': iterations,
+        'workers': workers,
+        'warmup': warmup,
+        'latency_injected_ms': round(latency * 1000),
+        'start_tier': start_tier,
+        'failures': failures,
+        'p50_seconds': round(percentile(latencies, 0.50), 4),
+        'p95_seconds': round(percentile(latencies, 0.95), 4),
+        'mean_seconds': round(sum(latencies) / len(latencies), 4),
+        'wall_seconds': round(wall, 3),
+        'throughput_per_worker': round(completed / wall / workers, 3) if wall else None,
+        'peak_rss_mib': round(memory.peak / 2 ** 20, 1),
+        'fixture_requests': server.requests,
+        'environment': environment(),
+    }
+
+
+def environment() -> dict:
+    """What a result was measured on, so runs are only compared like for like"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'lean_page_loads': settings.SCRAPER_LEAN_PAGE_LOADS,
+        'webdriver_pool_size': settings.WEBDRIVER_POOL_SIZE,
+    }
+
+
+# Lower is better for these; throughput_per_worker is higher-is-better
+COMPARED_METRICS = ['p50_seconds', 'p95_seconds', 'mean_seconds', 'throughput_per_worker', 'peak_rss_mib', 'failures']
+
+
+def compare(baseline: dict, current: dict) -> list:
+    """(metric, baseline value, current value, relative change) for each compared metric"""
+    rows = []
+    for metric in COMPARED_METRICS:
+        before, after = baseline.get(metric), current.get(metric)
+        change = (after - before) / before if before and after is not None else None
+        rows.append((metric, before, after, change))
+    return rows
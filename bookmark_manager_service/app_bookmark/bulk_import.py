@@ -0,0 +1,175 @@
+"""
+Bulk bookmark import.
+
+URLs come from a JSON list or an uploaded browser bookmarks export (Netscape
+HTML as written by every major browser, or a Chrome/Firefox JSON file). They
+are filtered in memory and with one query for the user's existing bookmarks
+and one for the scrape cache; cached titles become bookmarks straight away and
+the rest are dispatched through single-flight (singleflight.py) as one
+Celery group, so a URL that is already being scraped, for another user or by
+a background refresh, is joined rather than scraped twice. Job progress is kept in the cache as
+counters that scrape_manga_info_task bumps as each URL finishes, for the
+job's own tasks and for the flights its URLs joined.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from lxml import html as lxml_html
+import json
+import uuid
+from .models import Bookmark
+from .canonical import canonicalize_url
+from .scrape_cache import get_fresh_entries, create_bookmarks_from_entries
+from .singleflight import dispatch_scrapes
+from .scrapers import is_supported_url
+
+IMPORT_JOB_TTL = 60 * 60 * 24
+
+# Keys holding a bookmark's address in browser JSON exports (Chrome: url, Firefox: uri)
+JSON_URL_KEYS = ('url', 'uri', 'href')
+
+
+def _job_key(job_id: str, field: str) -> str:
+    return f"import_job:{job_id}:{field}"
+
+
+def urls_from_html(content: bytes) -> list:
+    """Links of a Netscape bookmarks file (or any HTML page)"""
+    if not content.strip():
+        return []
+    tree = lxml_html.fromstring(content)
+    return [href.strip() for href in tree.xpath('//a/@href')]
+
+
+def urls_from_json(data) -> list:
+    """URLs in a JSON export: bare strings in lists and url/uri/href values at any depth"""
+    urls = []
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            urls.append(node.strip())
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            urls.extend(node[key].strip() for key in JSON_URL_KEYS if isinstance(node.get(key), str))
+            stack.extend(reversed([value for value in node.values() if isinstance(value, (dict, list))]))
+    return urls
+
+
+def urls_from_file(uploaded_file) -> list:
+    """URLs of an uploaded bookmarks export; raises ValueError if it cannot be parsed"""
+    content = uploaded_file.read()
+    if content.lstrip()[:1] in (b'{', b'['):
+        try:
+            return urls_from_json(json.loads(content))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ValueError(f"Invalid JSON bookmarks file: {e}")
+    try:
+        return urls_from_html(content)
+    except Exception as e:
+        raise ValueError(f"Invalid HTML bookmarks file: {e}")
+
+
+def plan_import(user_id: int, urls) -> dict:
+    """
+    Sort submitted URLs into what to scrape and what to skip. Returns a dict
+    with `to_scrape` (canonical URL -> submitted URL), `cached` (fresh scrape
+    cache entries) and counts of skipped URLs.
+    """
+    validate = URLValidator(schemes=['http', 'https'])
+    pending = {}
+    counts = {'invalid': 0, 'unsupported': 0, 'duplicates': 0}
+    for url in urls:
+        try:
+            validate(url)
+        except ValidationError:
+            counts['invalid'] += 1
+            continue
+        if not is_supported_url(url):
+            counts['unsupported'] += 1
+            continue
+        canonical_url = canonicalize_url(url)
+        if canonical_url in pending:
+            counts['duplicates'] += 1
+            continue
+        pending[canonical_url] = url
+
+    existing = set(
+        Bookmark.objects.filter(user_id=user_id, url__in=list(pending)).values_list('url', flat=True)
+    )
+    for canonical_url in existing:
+        del pending[canonical_url]
+    counts['already_bookmarked'] = len(existing)
+
+    cached = get_fresh_entries(pending)
+    for entry in cached:
+        del pending[entry.url]
+
+    return {'to_scrape': pending, 'cached': cached, **counts}
+
+
+def start_import(user_id: int, urls) -> dict:
+    """
+    Import `urls` for a user. Bookmarks for cached URLs are created before
+    returning; the others lead or join a scrape flight each, and the flights
+    they lead are sent as one Celery group whose id is the job id. Raises
+    ValueError if more than BULK_IMPORT_MAX_URLS need scraping.
+    """
+    plan = plan_import(user_id, urls)
+    to_scrape = plan['to_scrape']
+    if len(to_scrape) > settings.BULK_IMPORT_MAX_URLS:
+        raise ValueError(
+            f"{len(to_scrape)} URLs need scraping; at most {settings.BULK_IMPORT_MAX_URLS} can be imported at once"
+        )
+
+    imported = create_bookmarks_from_entries(user_id, plan['cached'])
+
+    job_id = str(uuid.uuid4())
+    summary = {
+        'job_id': job_id,
+        'queued': len(to_scrape),
+        'imported': imported,
+        'already_bookmarked': plan['already_bookmarked'],
+        'duplicates': plan['duplicates'],
+        'unsupported': plan['unsupported'],
+        'invalid': plan['invalid'],
+    }
+    cache.set_many({
+        _job_key(job_id, 'meta'): {**summary, 'user_id': user_id},
+        _job_key(job_id, 'succeeded'): 0,
+        _job_key(job_id, 'failed'): 0,
+    }, timeout=IMPORT_JOB_TTL)
+
+    if to_scrape:
+        # The user watches each task before it runs (see dispatch_scrapes)
+        dispatch_scrapes(user_id, to_scrape.values(), import_job_id=job_id)
+    return summary
+
+
+def record_import_progress(job_id: str, succeeded: bool):
+    """Count one finished URL of an import job"""
+    try:
+        cache.incr(_job_key(job_id, 'succeeded' if succeeded else 'failed'))
+    except ValueError:
+        pass  # Job expired
+
+
+def get_import_progress(job_id: str, user_id: int):
+    """Progress of a user's import job, or None if it does not exist or is not theirs"""
+    meta = cache.get(_job_key(job_id, 'meta'))
+    if not meta or meta['user_id'] != user_id:
+        return None
+    counters = cache.get_many([_job_key(job_id, 'succeeded'), _job_key(job_id, 'failed')])
+    succeeded = counters.get(_job_key(job_id, 'succeeded'), 0)
+    failed = counters.get(_job_key(job_id, 'failed'), 0)
+    completed = succeeded + failed
+    progress = {key: value for key, value in meta.items() if key != 'user_id'}
+    progress.update({
+        'status': 'COMPLETED' if completed >= meta['queued'] else 'IN_PROGRESS',
+        'completed': completed,
+        'succeeded': succeeded,
+        'failed': failed,
+    })
+    return progress
@@ -0,0 +1,40 @@
+from urllib.parse import urlparse, urlunparse
+import re
+
+# Helper function to shorten Hitomi.la URLs
+def shorten_hitomi_url(original_url: str) -> str:
+    """
+    Shortens a Hitomi.la URL to its essential parts if it matches the common pattern.
+    Example: https://hitomi.la/doujinshi/long-title-here-12345.html#1
+    Becomes: https://hitomi.la/doujinshi/-12345.html#1
+    Otherwise, returns the original URL.
+    """
+    parsed_url = urlparse(original_url)
+    # Check if the domain is hitomi.la or www.hitomi.la
+    if parsed_url.netloc.endswith('hitomi.la'):
+        path = parsed_url.path
+        # Regex to find:
+        # 1. base_path: The content type part like "/doujinshi/" or "/manga/"
+        # 2. slug: The descriptive (long) part of the URL slug.
+        # 3. id_part: The crucial "-<numbers>.html" part at the end of the path.
+        match = re.match(r'(?P<base_path>/[^/]+/)(?P<slug>.*?)(?P<id_part>-\d+\.html)$', path)
+        if match:
+            # Reconstruct path with only base_path and id_part
+            new_path = match.group('base_path') + match.group('id_part')
+            # Reconstruct the full URL with the new path, preserving other components
+            return urlunparse((
+                parsed_url.scheme,
+                parsed_url.netloc,
+                new_path,
+                '',
+                '',
+                parsed_url.fragment
+            ))
+    return original_url # Return original if not a matching Hitomi.la URL or pattern mismatch
+
+def canonicalize_url(url: str) -> str:
+    """
+    Return the canonical form of a bookmark URL. This is the URL stored on
+    Bookmark rows and used as the key of the shared scrape cache.
+    """
+    return shorten_hitomi_url(url)
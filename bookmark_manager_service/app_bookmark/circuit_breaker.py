@@ -0,0 +1,100 @@
+"""
+Per-domain circuit breaker for scrapers, shared by all workers through Redis.
+
+closed:    scrapes run normally; SCRAPER_CIRCUIT_FAILURE_THRESHOLD consecutive
+           site-health failures (timeouts, blocks, network errors) open it.
+open:      scrapes are deferred without loading anything for
+           SCRAPER_CIRCUIT_OPEN_SECONDS.
+half_open: one probe scrape is let through every
+           SCRAPER_CIRCUIT_PROBE_INTERVAL seconds; a success closes the
+           circuit, a failure opens it again.
+"""
+from django.conf import settings
+from django_redis import get_redis_connection
+import logging
+from .rate_limit import ScrapeDeferred
+from .timing import span, log_event, STAGE_RATE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# KEYS: circuit hash. ARGV: probe interval.
+# In half_open, open_until is reused as the time the next probe may start.
+ALLOW_SCRIPT = """
+local state = redis.call('hget', KEYS[1], 'state')
+if not state or state == 'closed' then
+    return {1, '0'}
+end
+local clock = redis.call('time')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local open_until = tonumber(redis.call('hget', KEYS[1], 'open_until')) or 0
+if now < open_until then
+    return {0, tostring(open_until - now)}
+end
+redis.call('hset', KEYS[1], 'state', 'half_open', 'open_until', tostring(now + tonumber(ARGV[1])))
+return {1, '0'}
+"""
+
+# KEYS: circuit hash. ARGV: healthy (1/0), failure threshold, open seconds.
+# Returns the state after recording the outcome, or 'opened' if it just opened.
+RECORD_SCRIPT = """
+if ARGV[1] == '1' then
+    redis.call('del', KEYS[1])
+    return 'closed'
+end
+local state = redis.call('hget', KEYS[1], 'state') or 'closed'
+if state == 'open' then
+    return state
+end
+local failures = redis.call('hincrby', KEYS[1], 'failures', 1)
+if state == 'half_open' or failures >= tonumber(ARGV[2]) then
+    local clock = redis.call('time')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    redis.call('hset', KEYS[1], 'state', 'open', 'open_until', tostring(now + tonumber(ARGV[3])))
+    state = 'opened'
+end
+redis.call('expire', KEYS[1], 60 * 60 * 24)
+return state
+"""
+
+
+class CircuitOpen(ScrapeDeferred):
+    """The site failed repeatedly and is not being scraped for now"""
+
+    def __init__(self, domain: str, retry_after: float):
+        super().__init__(domain, retry_after, f"Circuit open for {domain}, retry in {retry_after:.1f}s")
+
+
+def _circuit_key(domain: str) -> str:
+    return f"scrape_circuit:{domain}"
+
+
+def check_circuit(domain: str):
+    """Raise CircuitOpen unless a scrape of `domain` may run now"""
+    with span(STAGE_RATE_LIMIT):
+        allowed, retry_after = get_redis_connection('default').eval(
+            ALLOW_SCRIPT, 1, _circuit_key(domain), settings.SCRAPER_CIRCUIT_PROBE_INTERVAL
+        )
+    if not allowed:
+        raise CircuitOpen(domain, float(retry_after))
+
+
+def record_outcome(domain: str, healthy: bool) -> str:
+    """Record whether a scrape found the site healthy; returns the new circuit state"""
+    state = get_redis_connection('default').eval(
+        RECORD_SCRIPT, 1, _circuit_key(domain), int(healthy),
+        settings.SCRAPER_CIRCUIT_FAILURE_THRESHOLD, settings.SCRAPER_CIRCUIT_OPEN_SECONDS
+    )
+    state = state.decode() if isinstance(state, bytes) else state
+    if state == 'opened':
+        log_event(logger, logging.WARNING, 'circuit_opened', domain=domain, open_seconds=settings.SCRAPER_CIRCUIT_OPEN_SECONDS)
+        state = 'open'
+    return state
+
+
+def circuit_state(domain: str) -> dict:
+    """Current state and consecutive failure count of a domain's circuit"""
+    state, failures = get_redis_connection('default').hmget(_circuit_key(domain), 'state', 'failures')
+    return {
+        'state': state.decode() if state else 'closed',
+        'failures': int(failures or 0),
+    }
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from app_bookmark.benchmark import TARGETS, FIXTURES_DIR, run_benchmark, compare
+import json
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark a scraper, or the whole scrape task, against recorded site fixtures served "
+        "locally (benchmarks/fixtures). Reports p50/p95 latency, throughput per worker and peak RSS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='+', choices=sorted(TARGETS))
+        parser.add_argument('--iterations', type=int, default=20, help="Timed samples per target (default 20)")
+        parser.add_argument('--workers', type=int, default=1, help="Concurrent worker threads (default 1)")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed samples first (default 2)")
+        parser.add_argument('--latency-ms', type=int, default=0, help="Delay added to every fixture response")
+        parser.add_argument(
+            '--start-tier', choices=['http', 'browser'],
+            help="Task targets only: skip the cheaper tiers, as an escalated task does"
+        )
+        parser.add_argument('--fixtures', default=FIXTURES_DIR, help="Fixture directory (default benchmarks/fixtures)")
+        parser.add_argument('--json', dest='json_path', help="Write the results to this file")
+        parser.add_argument('--compare', dest='baseline_path', help="Compare with results saved by an earlier --json")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['workers'] < 1:
+            raise CommandError("--iterations and --workers must be at least 1")
+        baseline = {}
+        if options['baseline_path']:
+            with open(options['baseline_path']) as f:
+                baseline = {result['target']: result for result in json.load(f)}
+
+        results = []
+        for target in options['targets']:
+            self.stdout.write(f"Benchmarking {target}...")
+            result = run_benchmark(
+                target, iterations=options['iterations'], workers=options['workers'],
+                warmup=options['warmup'], latency=options['latency_ms'] / 1000,
+                start_tier=options['start_tier'], fixtures_dir=options['fixtures'],
+            )
+            results.append(result)
+            self.stdout.write(
+                f"{target}: p50 {result['p50_seconds'] * 1000:.1f}ms, p95 {result['p95_seconds'] * 1000:.1f}ms, "
+                f"{result['throughput_per_worker']} scrapes/s per worker, peak RSS {result['peak_rss_mib']} MiB, "
+                f"{result['failures']}/{result['iterations']} failed"
+            )
+            if target in baseline:
+                self._write_comparison(baseline[target], result)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['json_path']}"))
+
+    def _write_comparison(self, baseline: dict, result: dict):
+        if baseline['environment'] != result['environment'] or baseline['workers'] != result['workers']:
+            self.stdout.write(self.style.WARNING("  baseline was measured with a different environment or worker count"))
+        for metric, before, after, change in compare(baseline, result):
+            delta = f"{change:+.1%}" if change is not None else "n/a"
+            self.stdout.write(f"  {metric}: {before} -> {after} ({delta})")
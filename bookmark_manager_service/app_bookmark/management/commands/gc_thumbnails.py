@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from app_bookmark.thumbnails import collect_garbage, adopt_legacy_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Delete thumbnail blobs no longer referenced by any bookmark or scrape cache entry"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-seconds', type=int, default=3600,
+            help="Keep blobs referenced within this many seconds (default 3600)"
+        )
+        parser.add_argument(
+            '--adopt-legacy', action='store_true',
+            help="First move per-user thumbnail copies into content-addressed blobs"
+        )
+
+    def handle(self, *args, **options):
+        if options['adopt_legacy']:
+            converted = adopt_legacy_thumbnails()
+            self.stdout.write(f"Converted {converted} legacy thumbnails to blobs")
+        deleted = collect_garbage(options['grace_seconds'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} unreferenced thumbnail blobs"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from app_bookmark.models import ThumbnailBlob
+from app_bookmark.thumbnails import generate_derivatives
+
+
+class Command(BaseCommand):
+    help = "Generate missing WebP/JPEG derivatives for stored thumbnail blobs"
+
+    def handle(self, *args, **options):
+        written = 0
+        for blob in ThumbnailBlob.objects.iterator():
+            try:
+                written += generate_derivatives(blob)
+            except Exception as e:
+                self.stderr.write(f"Could not generate derivatives for {blob.sha256}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} thumbnail derivatives"))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from app_bookmark.scrapers import get_scraper_for_url
+from app_bookmark.scrapers.base import resolve_host_override
+from app_bookmark.scrapers.page_profile import set_blocked_urls, page_weight
+from app_bookmark.scrapers.readiness import get_ready_timeout
+from app_bookmark.scrapers.webdriver_manager import WebDriverPool
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a page with and without its scraper's lean page-load profile and compare load time "
+        "and bytes transferred. Use SCRAPER_HOST_OVERRIDES to run it against a local fixture site."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url')
+        parser.add_argument('--runs', type=int, default=3, help="Page loads per mode (default 3)")
+
+    def handle(self, *args, **options):
+        scraper_class = get_scraper_for_url(options['url'])
+        if scraper_class is None or not hasattr(scraper_class, 'page_profile'):
+            raise CommandError(f"No browser scraper for {options['url']}")
+        url = resolve_host_override(options['url'])
+        timeout = get_ready_timeout(scraper_class().get_domain())
+
+        pool = WebDriverPool.get_pool()
+        try:
+            with pool.lease() as driver:
+                for mode, patterns in (('full', []), ('lean', scraper_class.page_profile.blocked_patterns())):
+                    for run in range(options['runs']):
+                        driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+                        set_blocked_urls(driver, patterns)
+                        start = time.monotonic()
+                        driver.get(url)
+                        ready, _ = scraper_class.readiness.wait(driver, timeout)
+                        elapsed = time.monotonic() - start
+                        weight = page_weight(driver)
+                        self.stdout.write(
+                            f"{mode} #{run + 1}: {'ready' if ready else 'NOT READY'} in {elapsed:.2f}s, "
+                            f"{weight['bytes']} bytes in {weight['requests']} requests"
+                        )
+        finally:
+            pool.close()
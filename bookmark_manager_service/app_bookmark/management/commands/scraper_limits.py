@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+from app_bookmark.models import SupportedSite
+from app_bookmark.rate_limit import DEFERRALS_KEY, limiter_state
+from app_bookmark.circuit_breaker import circuit_state
+
+
+class Command(BaseCommand):
+    help = "Show each site's scraper token bucket, slots in use, queue, circuit breaker and deferred task count"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset-deferrals', action='store_true',
+            help="Zero the deferral counters after printing them"
+        )
+
+    def handle(self, *args, **options):
+        for site in SupportedSite.objects.filter(is_active=True).order_by('domain'):
+            state = limiter_state(site)
+            circuit = circuit_state(site.domain)
+            self.stdout.write(
+                f"{state['domain']}: {state['tokens']}/{state['burst']} tokens "
+                f"({state['rate_limit_per_minute']}/min), "
+                f"{state['in_flight']}/{state['max_concurrency']} slots in use, "
+                f"{state['queued']} queued ({state['backlog_seconds']}s backlog), "
+                f"circuit {circuit['state']} ({circuit['failures']} failures), "
+                f"{state['deferrals']} deferrals"
+            )
+        if options['reset_deferrals']:
+            get_redis_connection('default').delete(DEFERRALS_KEY)
+            self.stdout.write(self.style.SUCCESS("Deferral counters reset"))
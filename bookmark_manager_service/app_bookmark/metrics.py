@@ -0,0 +1,150 @@
+"""
+Prometheus metrics of the bookmark service and its Celery workers.
+
+Metrics are kept in-process by prometheus_client. The web service serves them
+at /metrics (metrics_view) and each worker on its own port (start_worker_exporter,
+CELERY_METRICS_PORT), so they can be read with curl without a collector.
+Under a multi-process server (several gunicorn workers) set
+PROMETHEUS_MULTIPROC_DIR so that every process's samples are aggregated.
+"""
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST,
+    generate_latest, multiprocess, start_http_server,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+import os
+import sys
+import redis
+import logging
+from .timing import log_event
+
+logger = logging.getLogger(__name__)
+
+REQUEST_LATENCY = Histogram(
+    'bookmark_http_request_duration_seconds', 'Latency of API requests per view',
+    ['view', 'method', 'status']
+)
+AUTH_LATENCY = Histogram(
+    'bookmark_auth_request_duration_seconds', 'Round-trip time of token validation against the user service',
+    ['outcome']
+)
+AUTH_TOKEN_CACHE_LOOKUPS = Counter(
+    'bookmark_auth_token_cache_lookups_total', 'Validated-token cache lookups by level that answered (local, shared) or miss',
+    ['result']
+)
+AUTH_ACCESS_TOKEN_VERIFICATIONS = Counter(
+    'bookmark_auth_access_token_verifications_total', 'Local verifications of signed access tokens by result',
+    ['result']
+)
+SERVICE_REQUEST_DURATION = Histogram(
+    'bookmark_service_request_duration_seconds', 'Duration of calls to other internal services (see service_client.py)',
+    ['service', 'outcome'], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+SERVICE_REQUEST_RETRIES = Counter(
+    'bookmark_service_request_retries_total', 'Retried calls to other internal services',
+    ['service']
+)
+SERVICE_CIRCUIT_OPENED = Counter(
+    'bookmark_service_circuit_opened_total', 'Times the circuit of an internal service opened in a process',
+    ['service']
+)
+TASK_DURATION = Histogram(
+    'bookmark_celery_task_duration_seconds', 'Run time of Celery tasks',
+    ['task', 'state'], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+)
+SCRAPE_DURATION = Histogram(
+    'bookmark_scrape_duration_seconds', 'Scrape duration per site, scraper class and outcome',
+    ['site', 'scraper', 'outcome'], buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+)
+SCRAPE_STAGE_DURATION = Histogram(
+    'bookmark_scrape_stage_duration_seconds', 'Time spent in each scrape stage (see timing.py)',
+    ['stage'], buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20)
+)
+SCRAPE_CACHE_LOOKUPS = Counter(
+    'bookmark_scrape_cache_lookups_total', 'Scrape cache lookups by result (hit ratio = hit / all)',
+    ['result']
+)
+
+# kombu's Redis transport keeps each priority level of a queue in its own list
+PRIORITY_SEPARATOR = '\x06\x16'
+
+
+def observe_scrape(site: str, scraper: str, outcome: str, duration: float, spans: dict = None):
+    SCRAPE_DURATION.labels(site or 'unknown', scraper or 'unknown', outcome).observe(duration)
+    for stage, seconds in (spans or {}).items():
+        SCRAPE_STAGE_DURATION.labels(stage).observe(seconds)
+
+
+class CeleryQueueCollector:
+    """Number of messages waiting in each Celery queue, read from the Redis broker when metrics are collected"""
+
+    def __init__(self, queues):
+        self.queues = queues
+
+    def collect(self):
+        family = GaugeMetricFamily('bookmark_celery_queue_length', 'Messages waiting in a Celery queue', labels=['queue'])
+        steps = settings.CELERY_BROKER_TRANSPORT_OPTIONS.get('priority_steps') or [0]
+        try:
+            connection = redis.Redis.from_url(settings.CELERY_BROKER_URL, socket_timeout=2)
+            pipeline = connection.pipeline()
+            for queue in self.queues:
+                for step in steps:
+                    pipeline.llen(queue if not step else f"{queue}{PRIORITY_SEPARATOR}{step}")
+            lengths = pipeline.execute()
+        except redis.RedisError as e:
+            log_event(logger, logging.ERROR, 'queue_lengths_unavailable', error=str(e))
+            return
+        for index, queue in enumerate(self.queues):
+            family.add_metric([queue], sum(lengths[index * len(steps):(index + 1) * len(steps)]))
+        yield family
+
+
+class WebDriverPoolCollector:
+    """Chrome driver pool gauges of this worker process, if it has a pool"""
+
+    def collect(self):
+        webdriver_manager = sys.modules.get('app_bookmark.scrapers.webdriver_manager')
+        pool = webdriver_manager.WebDriverPool._instance if webdriver_manager else None
+        if pool is None:
+            return
+        stats = pool.stats()
+        for name in ('pool_size', 'drivers_idle', 'drivers_in_use', 'lease_wait_seconds_max'):
+            yield GaugeMetricFamily(f'bookmark_webdriver_{name}', f'WebDriver pool {name.replace("_", " ")}', value=stats[name])
+        for name in ('leases', 'lease_timeouts', 'drivers_created'):
+            yield CounterMetricFamily(f'bookmark_webdriver_{name}', f'WebDriver pool {name.replace("_", " ")}', value=stats[f'{name}_total'])
+        recycled = CounterMetricFamily('bookmark_webdriver_drivers_recycled', 'Drivers recycled by reason', labels=['reason'])
+        for reason, count in stats['drivers_recycled_total'].items():
+            recycled.add_metric([reason], count)
+        yield recycled
+
+
+def _celery_queues() -> list:
+    from .scrapers.base import QUEUE_HTTP, QUEUE_BROWSER
+    return [settings.CELERY_TASK_DEFAULT_QUEUE, QUEUE_HTTP, QUEUE_BROWSER]
+
+
+def build_registry(*collectors) -> CollectorRegistry:
+    """This process's metrics (or every process's, in multi-process mode) plus `collectors`"""
+    registry = CollectorRegistry(auto_describe=False)
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(REGISTRY)
+    for collector in collectors:
+        registry.register(collector)
+    return registry
+
+
+def metrics_view(request):
+    """GET /metrics: Prometheus text exposition of the web service's metrics"""
+    registry = build_registry(CeleryQueueCollector(_celery_queues()))
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def start_worker_exporter(port: int):
+    """Serve this worker's metrics over HTTP on `port`"""
+    registry = build_registry(CeleryQueueCollector(_celery_queues()), WebDriverPoolCollector())
+    start_http_server(port, registry=registry)
+    log_event(logger, logging.DEBUG, 'worker_exporter_listening', port=port)
@@ -0,0 +1,17 @@
+import time
+from .metrics import REQUEST_LATENCY
+
+
+class MetricsMiddleware:
+    """Record the latency of every request, labelled by the view that served it"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.monotonic()
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(time.monotonic() - start)
+        return response
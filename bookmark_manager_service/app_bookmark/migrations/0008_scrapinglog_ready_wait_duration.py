@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_bookmark', '0007_alter_scrapinglog_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapinglog',
+            name='ready_wait_duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
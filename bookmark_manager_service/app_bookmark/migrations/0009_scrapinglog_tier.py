@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_bookmark', '0008_scrapinglog_ready_wait_duration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapinglog',
+            name='tier',
+            field=models.CharField(blank=True, choices=[('http', 'HTTP'), ('browser', 'Browser')], max_length=10, null=True),
+        ),
+    ]
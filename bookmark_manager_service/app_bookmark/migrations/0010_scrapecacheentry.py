@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:53
+
+import app_bookmark.models
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_bookmark', '0009_scrapinglog_tier'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scrapinglog',
+            name='tier',
+            field=models.CharField(blank=True, choices=[('cache', 'Cache'), ('http', 'HTTP'), ('browser', 'Browser')], max_length=10, null=True),
+        ),
+        migrations.CreateModel(
+            name='ScrapeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=767, unique=True, validators=[django.core.validators.URLValidator()])),
+                ('title', models.CharField(max_length=500)),
+                ('thumbnail_url', models.URLField(blank=True, null=True)),
+                ('thumbnail', models.ImageField(blank=True, null=True, upload_to=app_bookmark.models.scrape_cache_thumbnail_path)),
+                ('scraped_at', models.DateTimeField()),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_bookmark.supportedsite')),
+            ],
+        ),
+    ]
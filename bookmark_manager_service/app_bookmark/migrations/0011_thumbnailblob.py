@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:54
+
+import app_bookmark.models
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_bookmark', '0010_scrapecacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('file', models.ImageField(upload_to=app_bookmark.models.thumbnail_blob_path)),
+                ('size', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_referenced_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='scrapecacheentry',
+            name='thumbnail',
+        ),
+        migrations.AddField(
+            model_name='bookmark',
+            name='thumbnail_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='bookmarks', to='app_bookmark.thumbnailblob'),
+        ),
+        migrations.AddField(
+            model_name='scrapecacheentry',
+            name='thumbnail_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='cache_entries', to='app_bookmark.thumbnailblob'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:55
+
+import app_bookmark.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_bookmark', '0011_thumbnailblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('width', models.PositiveIntegerField()),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=10)),
+                ('file', models.ImageField(upload_to=app_bookmark.models.thumbnail_derivative_path)),
+                ('size', models.PositiveIntegerField()),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='derivatives', to='app_bookmark.thumbnailblob')),
+            ],
+            options={
+                'ordering': ['width'],
+                'unique_together': {('blob', 'width', 'format')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_bookmark', '0012_thumbnailderivative'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supportedsite',
+            name='burst',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='supportedsite',
+            name='max_concurrency',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='supportedsite',
+            name='rate_limit_per_minute',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
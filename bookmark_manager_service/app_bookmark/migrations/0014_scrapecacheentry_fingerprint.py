@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_bookmark', '0013_supportedsite_rate_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapecacheentry',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
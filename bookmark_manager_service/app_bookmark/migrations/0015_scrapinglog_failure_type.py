@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_bookmark', '0014_scrapecacheentry_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapinglog',
+            name='failure_type',
+            field=models.CharField(blank=True, choices=[('timeout', 'Timeout'), ('blocked', 'Blocked'), ('selector_missing', 'Selector missing'), ('network', 'Network error'), ('browser_unavailable', 'Browser unavailable'), ('unknown', 'Unknown')], max_length=20, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_bookmark', '0015_scrapinglog_failure_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapinglog',
+            name='timings',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 from django.core.validators import URLValidator
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
 import uuid
 import os
 
@@ -9,6 +12,18 @@ def bookmark_thumbnail_path(instance, filename):
     filename = f"{uuid.uuid4().hex}.{ext}"
     return os.path.join('bookmark_thumbnails', str(instance.user_id), filename)
 
+def scrape_cache_thumbnail_path(instance, filename):
+    """Generate file path for thumbnails held by the shared scrape cache (referenced by migration 0010)"""
+    ext = filename.split('.')[-1]
+    filename = f"{uuid.uuid4().hex}.{ext}"
+    return os.path.join('scrape_cache', filename)
+
+def thumbnail_blob_path(instance, filename):
+    """Generate content-addressed file path: thumbnails/<ab>/<cd>/<sha256>.<ext>"""
+    ext = filename.split('.')[-1]
+    digest = instance.sha256
+    return os.path.join('thumbnails', digest[:2], digest[2:4], f"{digest}.{ext}")
+
 class SupportedSite(models.Model):
     """Model to track supported manga sites"""
     name = models.CharField(max_length=100, unique=True)
@@ -16,18 +31,63 @@ class SupportedSite(models.Model):
     scraper_class = models.CharField(max_length=100)
     is_active = models.BooleanField(default=True)
     description = models.TextField(blank=True, null=True)
+    # Scraper politeness limits (see rate_limit.py); empty uses the SCRAPER_DEFAULT_* settings
+    rate_limit_per_minute = models.PositiveIntegerField(null=True, blank=True)
+    burst = models.PositiveIntegerField(null=True, blank=True)
+    max_concurrency = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return self.name
 
+class ThumbnailBlob(models.Model):
+    """
+    Thumbnail image stored once per distinct content, referenced by bookmarks
+    and scrape cache entries. Unreferenced blobs are removed by gc_thumbnails.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.ImageField(upload_to=thumbnail_blob_path)
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_referenced_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.sha256
+
+def thumbnail_derivative_path(instance, filename):
+    """Store derivatives next to their original: thumbnails/<ab>/<cd>/<sha256>_<width>w.<ext>"""
+    ext = filename.split('.')[-1]
+    digest = instance.blob.sha256
+    return os.path.join('thumbnails', digest[:2], digest[2:4], f"{digest}_{instance.width}w.{ext}")
+
+class ThumbnailDerivative(models.Model):
+    """Resized, re-encoded copy of a thumbnail blob served to the dashboard"""
+    FORMAT_CHOICES = [
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    ]
+
+    blob = models.ForeignKey(ThumbnailBlob, on_delete=models.CASCADE, related_name='derivatives')
+    width = models.PositiveIntegerField()
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    file = models.ImageField(upload_to=thumbnail_derivative_path)
+    size = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['blob', 'width', 'format']
+        ordering = ['width']
+
+    def __str__(self):
+        return f"{self.blob.sha256} {self.width}w {self.format}"
+
 class Bookmark(models.Model):
     """Model to store user bookmarks with scraped data"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user_id = models.IntegerField(db_index=True)
     url = models.URLField(max_length=767, validators=[URLValidator()])
     title = models.CharField(max_length=500)
-    thumbnail = models.ImageField(upload_to=bookmark_thumbnail_path, null=True, blank=True)
+    thumbnail = models.ImageField(upload_to=bookmark_thumbnail_path, null=True, blank=True)  # Legacy per-user copy
+    thumbnail_blob = models.ForeignKey(ThumbnailBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='bookmarks')
     thumbnail_url = models.URLField(null=True, blank=True) 
     site = models.ForeignKey(SupportedSite, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -40,6 +100,32 @@ class Bookmark(models.Model):
     def __str__(self):
         return f"{self.title} - User {self.user_id}"
 
+    @property
+    def thumbnail_file(self):
+        """Stored thumbnail image, preferring the shared blob over a legacy copy"""
+        if self.thumbnail_blob_id:
+            return self.thumbnail_blob.file
+        return self.thumbnail or None
+
+class ScrapeCacheEntry(models.Model):
+    """Scraped metadata shared by every user, keyed by canonical URL"""
+    url = models.URLField(max_length=767, unique=True, validators=[URLValidator()])
+    site = models.ForeignKey(SupportedSite, on_delete=models.CASCADE)
+    title = models.CharField(max_length=500)
+    thumbnail_url = models.URLField(null=True, blank=True)
+    thumbnail_blob = models.ForeignKey(ThumbnailBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='cache_entries')
+    fingerprint = models.CharField(max_length=64, blank=True, default='')  # See scrape_cache.scrape_fingerprint
+    scraped_at = models.DateTimeField()
+
+    def is_fresh(self, max_age: int = None) -> bool:
+        """Whether the entry is younger than `max_age` seconds (default SCRAPE_CACHE_TTL)"""
+        if max_age is None:
+            max_age = settings.SCRAPE_CACHE_TTL
+        return timezone.now() - self.scraped_at < timedelta(seconds=max_age)
+
+    def __str__(self):
+        return f"{self.title} ({self.url})"
+
 class ScrapingLog(models.Model):
     """Model to log scraping attempts and results"""
     STATUS_CHOICES = [
@@ -47,12 +133,29 @@ class ScrapingLog(models.Model):
         ('FAILED', 'Failed'),
         ('ERROR', 'Error'),
     ]
+    TIER_CHOICES = [
+        ('cache', 'Cache'),
+        ('http', 'HTTP'),
+        ('browser', 'Browser'),
+    ]
+    FAILURE_TYPE_CHOICES = [  # See scrapers/failures.py
+        ('timeout', 'Timeout'),
+        ('blocked', 'Blocked'),
+        ('selector_missing', 'Selector missing'),
+        ('network', 'Network error'),
+        ('browser_unavailable', 'Browser unavailable'),
+        ('unknown', 'Unknown'),
+    ]
     
     bookmark = models.ForeignKey(Bookmark, on_delete=models.CASCADE, null=True, blank=True)
     url = models.URLField(max_length=767, validators=[URLValidator()])
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     error_message = models.TextField(null=True, blank=True)
     scraping_duration = models.FloatField(null=True, blank=True)
+    ready_wait_duration = models.FloatField(null=True, blank=True)
+    tier = models.CharField(max_length=10, choices=TIER_CHOICES, null=True, blank=True)
+    failure_type = models.CharField(max_length=20, choices=FAILURE_TYPE_CHOICES, null=True, blank=True)
+    timings = models.JSONField(null=True, blank=True)  # Seconds per scrape stage (see timing.py)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
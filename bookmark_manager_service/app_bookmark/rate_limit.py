@@ -0,0 +1,174 @@
+"""
+Per-domain scraper politeness limits, shared by all workers through Redis.
+
+Each SupportedSite gets a token bucket (rate_limit_per_minute, refilling up
+to `burst` tokens) and a semaphore of max_concurrency slots. A scrape must
+take a token and a slot before it loads anything from the site; when either
+is unavailable, RateLimited tells the task how long to defer itself.
+
+Deferred scrapes queue up rather than compete: each one denied is given the
+next free turn (`reserved_at`), spaced 1/rate apart after the turns already
+handed out, so a backlog of N scrapes is spread over N / rate seconds. A
+scrape that comes back at its turn passes the queue; a new scrape arriving
+while turns are outstanding joins the end of it.
+"""
+from contextlib import contextmanager
+from django.conf import settings
+from django_redis import get_redis_connection
+import math
+import uuid
+from .timing import span, STAGE_RATE_LIMIT
+
+# KEYS: bucket hash (tokens, updated_at, next_free), slots sorted set (slot id -> expiry time)
+# ARGV: tokens per second, burst, max concurrency, slot id, slot TTL, busy retry seconds,
+#       the caller's reserved turn (0 if none)
+# Returns {1, "0", "0"} when a token and slot were taken, else {0, "<seconds to wait>", "<turn>"}
+ACQUIRE_SCRIPT = """
+local clock = redis.call('time')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local reserved_at = tonumber(ARGV[7])
+
+local bucket = redis.call('hmget', KEYS[1], 'tokens', 'updated_at', 'next_free')
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+local next_free = tonumber(bucket[3]) or 0
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local ttl = math.ceil(math.max(burst / rate, next_free - now)) + 60
+
+local function take_turn(wait)
+    local turn = math.max(now + wait, next_free)
+    redis.call('hset', KEYS[1], 'next_free', tostring(turn + 1 / rate))
+    redis.call('expire', KEYS[1], math.max(ttl, math.ceil(turn + 1 / rate - now) + 60))
+    return {0, tostring(turn - now), tostring(turn)}
+end
+
+if reserved_at > 0 then
+    -- Woken early (countdowns are capped): keep waiting for the turn
+    if reserved_at - now > 1 then
+        return {0, tostring(reserved_at - now), ARGV[7]}
+    end
+elseif next_free > now then
+    -- Earlier deferred scrapes hold the coming turns
+    return take_turn(0)
+end
+
+redis.call('zremrangebyscore', KEYS[2], '-inf', now)
+local wait = nil
+if redis.call('zcard', KEYS[2]) >= tonumber(ARGV[3]) then
+    wait = tonumber(ARGV[6])
+elseif tokens < 1 then
+    wait = (1 - tokens) / rate
+end
+if wait then
+    if reserved_at > 0 then
+        -- Our turn came but the site is still busy: retry soon, ahead of the queue
+        return {0, tostring(wait), ARGV[7]}
+    end
+    return take_turn(wait)
+end
+
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens - 1), 'updated_at', tostring(now))
+redis.call('expire', KEYS[1], ttl)
+redis.call('zadd', KEYS[2], now + tonumber(ARGV[5]), ARGV[4])
+redis.call('expire', KEYS[2], tonumber(ARGV[5]))
+return {1, '0', '0'}
+"""
+
+DEFERRALS_KEY = 'scrape_limit:deferrals'
+
+
+class ScrapeDeferred(Exception):
+    """A scrape of `domain` may not run now; the task should retry after `retry_after` seconds"""
+
+    def __init__(self, domain: str, retry_after: float, message: str):
+        super().__init__(message)
+        self.domain = domain
+        self.retry_after = retry_after
+
+
+class RateLimited(ScrapeDeferred):
+    """
+    The site's token bucket or concurrency limit is exhausted. The scrape's
+    turn in the site's queue is `reserved_at` (Redis server time); pass it
+    back to scrape_slot when the task retries.
+    """
+
+    def __init__(self, domain: str, retry_after: float, reserved_at: float):
+        super().__init__(domain, retry_after, f"Rate limit reached for {domain}, retry in {retry_after:.1f}s")
+        self.reserved_at = reserved_at
+
+
+def _bucket_key(domain: str) -> str:
+    return f"scrape_limit:{domain}:bucket"
+
+
+def _slots_key(domain: str) -> str:
+    return f"scrape_limit:{domain}:slots"
+
+
+def site_limits(site) -> tuple:
+    """(requests per minute, burst, max concurrency) for a SupportedSite"""
+    return (
+        site.rate_limit_per_minute or settings.SCRAPER_DEFAULT_RATE_PER_MINUTE,
+        site.burst or settings.SCRAPER_DEFAULT_BURST,
+        site.max_concurrency or settings.SCRAPER_DEFAULT_MAX_CONCURRENCY,
+    )
+
+
+@contextmanager
+def scrape_slot(site, reserved_at: float = None):
+    """
+    Hold a token and a concurrency slot of `site` for the duration of a
+    scrape. `reserved_at` is the turn given by an earlier RateLimited.
+    """
+    per_minute, burst, max_concurrency = site_limits(site)
+    connection = get_redis_connection('default')
+    slot_id = uuid.uuid4().hex
+    with span(STAGE_RATE_LIMIT):
+        allowed, retry_after, turn = connection.eval(
+            ACQUIRE_SCRIPT, 2, _bucket_key(site.domain), _slots_key(site.domain),
+            per_minute / 60, burst, max_concurrency, slot_id,
+            settings.SCRAPER_SLOT_TTL, settings.SCRAPER_BUSY_RETRY_SECONDS, reserved_at or 0
+        )
+    if not allowed:
+        raise RateLimited(site.domain, float(retry_after), float(turn))
+    try:
+        yield
+    finally:
+        connection.zrem(_slots_key(site.domain), slot_id)
+
+
+def record_deferral(domain: str):
+    get_redis_connection('default').hincrby(DEFERRALS_KEY, domain, 1)
+
+
+def limiter_state(site) -> dict:
+    """Current bucket level, slots in use and deferral count of a site"""
+    per_minute, burst, max_concurrency = site_limits(site)
+    connection = get_redis_connection('default')
+    seconds, microseconds = connection.time()
+    now = seconds + microseconds / 1000000
+
+    tokens, updated_at, next_free = connection.hmget(_bucket_key(site.domain), 'tokens', 'updated_at', 'next_free')
+    # next_free is one interval past the last turn handed out
+    backlog_seconds = max(0.0, float(next_free or 0) - 60 / per_minute - now)
+    if tokens is None:
+        tokens = burst
+    else:
+        elapsed = max(0, now - float(updated_at))
+        tokens = min(burst, float(tokens) + elapsed * per_minute / 60)
+
+    return {
+        'domain': site.domain,
+        'rate_limit_per_minute': per_minute,
+        'burst': burst,
+        'tokens': round(tokens, 2),
+        'max_concurrency': max_concurrency,
+        'in_flight': connection.zcount(_slots_key(site.domain), now, '+inf'),
+        # Deferred scrapes holding a turn, and how long until the last one's turn
+        'queued': math.ceil(backlog_seconds * per_minute / 60) if next_free else 0,
+        'backlog_seconds': round(backlog_seconds, 1),
+        'deferrals': int(connection.hget(DEFERRALS_KEY, site.domain) or 0),
+    }
@@ -0,0 +1,70 @@
+"""
+Scheduled background refresh of stale bookmarks.
+
+refresh_stale_bookmarks_task (run by celery beat) picks the canonical URLs
+refreshed longest ago, most-bookmarked first among equals, up to
+BACKGROUND_REFRESH_BUDGET per run. Their scrapes are spread evenly over the
+run interval at low priority. A URL's last refresh is its scrape cache time,
+or the oldest updated_at of its bookmarks if it was never cached, so that
+refreshes which find nothing changed need not touch the bookmarks.
+"""
+from django.conf import settings
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from datetime import timedelta
+from .models import Bookmark, ScrapeCacheEntry, ScrapingLog
+from .timing import span, current_timings, STAGE_DB_TRANSACTION
+
+
+def select_stale_urls(limit: int) -> list:
+    """Canonical URLs due for a background refresh, stalest first"""
+    cutoff = timezone.now() - timedelta(seconds=settings.BACKGROUND_REFRESH_MIN_AGE)
+    last_scraped = ScrapeCacheEntry.objects.filter(url=OuterRef('url')).values('scraped_at')[:1]
+    candidates = (
+        Bookmark.objects
+        .filter(site__is_active=True)
+        .values('url')
+        .annotate(popularity=Count('id'), oldest_update=Min('updated_at'))
+        .annotate(last_refreshed=Coalesce(Subquery(last_scraped), 'oldest_update'))
+        .filter(last_refreshed__lt=cutoff)
+        .order_by('last_refreshed', '-popularity')
+    )
+    return [row['url'] for row in candidates[:limit]]
+
+
+def apply_background_refresh(canonical_url, site, result, thumbnail_blob, scraping_duration, changed):
+    """
+    Update every bookmark of `canonical_url` from a background scrape. When
+    the title and cover match the last scrape (`changed` is False) the
+    bookmarks are left untouched.
+    """
+    updated = 0
+    if result.success and changed:
+        fields = {'updated_at': timezone.now()}  # update() skips auto_now
+        if result.title:
+            fields['title'] = result.title
+        if result.thumbnail_url:
+            fields['thumbnail_url'] = result.thumbnail_url
+        if thumbnail_blob:
+            fields['thumbnail_blob'] = thumbnail_blob
+        with span(STAGE_DB_TRANSACTION):
+            updated = Bookmark.objects.filter(url=canonical_url).update(**fields)
+
+    ScrapingLog.objects.create(
+        url=canonical_url,
+        status='SUCCESS' if result.success else 'FAILED',
+        error_message=result.error_message,
+        scraping_duration=scraping_duration,
+        ready_wait_duration=result.ready_wait,
+        tier=result.tier,
+        failure_type=result.failure_type,
+        timings=current_timings()
+    )
+    return {
+        "success": result.success,
+        "changed": changed,
+        "bookmarks_updated": updated,
+        "error": result.error_message,
+        "bookmark_id": None
+    }
@@ -0,0 +1,20 @@
+"""
+Celery task routing (CELERY_TASK_ROUTES).
+
+scrape_manga_info_task goes to the queue of the scraper class that runs first
+for its URL and start tier, so slow browser scrapes and quick HTTP scrapes are
+consumed by separately sized worker pools. Other tasks use the default queue.
+"""
+from .scrapers import get_engine_for_url
+
+SCRAPE_TASK_NAME = 'app_bookmark.tasks.scrape_manga_info_task'
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    if name != SCRAPE_TASK_NAME:
+        return None
+    url = args[1] if len(args) > 1 else kwargs.get('submitted_url')
+    engine = get_engine_for_url(url) if url else None
+    if engine is None:
+        return None
+    return {'queue': engine.queue_for(kwargs.get('start_tier'))}
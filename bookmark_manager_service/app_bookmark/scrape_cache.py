@@ -0,0 +1,140 @@
+"""
+Cross-user cache of scraped metadata.
+
+Entries are keyed by canonical URL (see canonical.py) and hold the title,
+cover URL and the stored cover's ThumbnailBlob. The scrape task consults the
+cache before invoking a scraper, and BookmarkListCreateView.create and bulk
+imports use fresh entries to create bookmarks synchronously. Every lookup
+counts as a hit or miss in SCRAPE_CACHE_LOOKUPS.
+"""
+from django.utils import timezone
+import hashlib
+from .models import Bookmark, ScrapeCacheEntry, ScrapingLog
+from .metrics import SCRAPE_CACHE_LOOKUPS
+from .scrapers.base import ScrapingResult
+
+TIER_CACHE = 'cache'
+
+
+def get_fresh_entry(canonical_url: str, max_age: int = None):
+    """Return the cache entry for `canonical_url` if it is fresh, else None"""
+    entry = ScrapeCacheEntry.objects.select_related('site').filter(url=canonical_url).first()
+    if entry and entry.is_fresh(max_age):
+        SCRAPE_CACHE_LOOKUPS.labels('hit').inc()
+        return entry
+    SCRAPE_CACHE_LOOKUPS.labels('miss').inc()
+    return None
+
+
+def get_fresh_entries(canonical_urls) -> list:
+    """get_fresh_entry for many URLs in one query: the fresh entries among them"""
+    canonical_urls = list(canonical_urls)
+    if not canonical_urls:
+        return []
+    entries = [
+        entry for entry in ScrapeCacheEntry.objects.select_related('site').filter(url__in=canonical_urls)
+        if entry.is_fresh()
+    ]
+    SCRAPE_CACHE_LOOKUPS.labels('hit').inc(len(entries))
+    SCRAPE_CACHE_LOOKUPS.labels('miss').inc(len(canonical_urls) - len(entries))
+    return entries
+
+
+def result_from_entry(entry: ScrapeCacheEntry) -> ScrapingResult:
+    """
+    Build a scraping result from a cache entry, as if a scraper had returned it.
+    The cover is not loaded; callers link entry.thumbnail_blob instead.
+    """
+    return ScrapingResult(
+        title=entry.title,
+        thumbnail_url=entry.thumbnail_url,
+        success=True,
+        tier=TIER_CACHE
+    )
+
+
+def scrape_fingerprint(title: str, thumbnail_blob) -> str:
+    """Digest of a scrape's title and cover content, to tell whether a page changed"""
+    cover = thumbnail_blob.sha256 if thumbnail_blob else ''
+    return hashlib.sha256(f"{title or ''}\0{cover}".encode()).hexdigest()
+
+
+def store_result(canonical_url: str, site, result: ScrapingResult, thumbnail_blob) -> bool:
+    """
+    Cache a scraping result; only complete results (title and cover) are
+    cached. Returns False if the cached title and cover were already the
+    same, in which case only the entry's scrape time is updated.
+    """
+    if not (result.success and result.title and thumbnail_blob):
+        return True
+
+    fingerprint = scrape_fingerprint(result.title, thumbnail_blob)
+    now = timezone.now()
+    if ScrapeCacheEntry.objects.filter(url=canonical_url, fingerprint=fingerprint).update(scraped_at=now):
+        return False
+
+    ScrapeCacheEntry.objects.update_or_create(
+        url=canonical_url,
+        defaults={
+            'site': site,
+            'title': result.title,
+            'thumbnail_url': result.thumbnail_url,
+            'thumbnail_blob': thumbnail_blob,
+            'fingerprint': fingerprint,
+            'scraped_at': now,
+        }
+    )
+    return True
+
+
+def create_bookmark_from_entry(user_id: int, entry: ScrapeCacheEntry) -> Bookmark:
+    """Create a user's bookmark straight from a cache entry, without scraping"""
+    bookmark, created = Bookmark.objects.get_or_create(
+        user_id=user_id,
+        url=entry.url,
+        defaults={
+            'site': entry.site,
+            'title': entry.title,
+            'thumbnail_url': entry.thumbnail_url,
+            'thumbnail_blob': entry.thumbnail_blob,
+        }
+    )
+    if created:
+        ScrapingLog.objects.create(
+            bookmark=bookmark,
+            url=entry.url,
+            status='SUCCESS',
+            scraping_duration=0,
+            tier=TIER_CACHE
+        )
+    return bookmark
+
+
+def create_bookmarks_from_entries(user_id: int, entries) -> int:
+    """
+    Bulk version of create_bookmark_from_entry used by imports: one INSERT for
+    the bookmarks and one for their logs. URLs the user bookmarked concurrently
+    are skipped. Returns the number of bookmarks created.
+    """
+    bookmarks = [
+        Bookmark(
+            user_id=user_id,
+            url=entry.url,
+            site=entry.site,
+            title=entry.title,
+            thumbnail_url=entry.thumbnail_url,
+            thumbnail_blob=entry.thumbnail_blob,
+        )
+        for entry in entries
+    ]
+    if not bookmarks:
+        return 0
+    Bookmark.objects.bulk_create(bookmarks, ignore_conflicts=True)
+
+    # ignore_conflicts leaves no trace of skipped rows; keep the ids that were inserted
+    created = list(Bookmark.objects.filter(id__in=[bookmark.id for bookmark in bookmarks]).values_list('id', 'url'))
+    ScrapingLog.objects.bulk_create([
+        ScrapingLog(bookmark_id=bookmark_id, url=url, status='SUCCESS', scraping_duration=0, tier=TIER_CACHE)
+        for bookmark_id, url in created
+    ])
+    return len(created)
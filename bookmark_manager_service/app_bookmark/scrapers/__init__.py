@@ -1,18 +1,86 @@
-from .base import BaseMangaScraper
-from .hitomi import HitomiScraper
-from .bato import BatoScraper
+"""
+Scraper registry.
+
+Scrapers are named by dotted path and imported on first use, so that the web
+tier can check whether a site is supported, and route its scrapes, without
+importing Selenium and the browser scrapers. Only a worker that actually runs
+a tier imports that tier's scraper.
+"""
+from importlib import import_module
+from urllib.parse import urlparse
+from .base import BaseMangaScraper, QUEUE_BROWSER, QUEUE_HTTP
+from .engine import ScrapingEngine, TierEscalation, TIER_HTTP, TIER_BROWSER
+
+
+class ScraperRef:
+    """A scraper class given by its dotted path and the Celery queue it runs on"""
+
+    def __init__(self, path: str, queue: str):
+        self.path = path
+        self.queue = queue
+        self._class = None
+
+    @property
+    def name(self) -> str:
+        return self.path.rsplit('.', 1)[1]
+
+    def load(self):
+        """Import the scraper class (once per process)"""
+        if self._class is None:
+            module_path, class_name = self.path.rsplit('.', 1)
+            self._class = getattr(import_module(module_path), class_name)
+        return self._class
+
+
+# Display name of each supported site, as stored in SupportedSite.name
+SITE_NAMES = {
+    'hitomi.la': 'Hitomi.la',
+    'bato.to': 'Bato.to',
+}
 
 SCRAPER_REGISTRY = {
-    'hitomi.la': HitomiScraper,
-    'bato.to': BatoScraper,
+    'hitomi.la': ScraperRef('app_bookmark.scrapers.hitomi.HitomiScraper', QUEUE_BROWSER),
+    'bato.to': ScraperRef('app_bookmark.scrapers.bato.BatoScraper', QUEUE_BROWSER),
 }
 
-def get_scraper_for_url(url):
-    """Get appropriate scraper for a given URL"""
-    from urllib.parse import urlparse
+# Lightweight scrapers tried before the browser scraper of the same domain
+HTTP_SCRAPER_REGISTRY = {
+    'hitomi.la': ScraperRef('app_bookmark.scrapers.http_tier.HitomiHttpScraper', QUEUE_HTTP),
+    'bato.to': ScraperRef('app_bookmark.scrapers.http_tier.BatoHttpScraper', QUEUE_HTTP),
+}
+
+def _domain_of(url):
     domain = urlparse(url).netloc.lower()
     
     if domain.startswith('www.'):
         domain = domain[4:]
-    
-    return SCRAPER_REGISTRY.get(domain)
\ No newline at end of file
+    return domain
+
+def is_supported_url(url):
+    """Whether a scraper exists for the URL's site; imports no scraper"""
+    return _domain_of(url) in SCRAPER_REGISTRY
+
+def get_site_name_for_url(url):
+    """Display name of the URL's site, or None if it is not supported"""
+    domain = _domain_of(url)
+    return SITE_NAMES.get(domain) if domain in SCRAPER_REGISTRY else None
+
+def get_scraper_ref_for_url(url):
+    """Reference to the browser scraper of the URL's site, without importing it"""
+    return SCRAPER_REGISTRY.get(_domain_of(url))
+
+def get_scraper_for_url(url):
+    """Get appropriate (browser) scraper class for a given URL, importing it"""
+    ref = get_scraper_ref_for_url(url)
+    return ref.load() if ref else None
+
+def get_engine_for_url(url):
+    """Get a tiered scraping engine (HTTP first, then browser) for a given URL"""
+    domain = _domain_of(url)
+    if domain not in SCRAPER_REGISTRY:
+        return None
+    tiers = []
+    if domain in HTTP_SCRAPER_REGISTRY:
+        tiers.append((TIER_HTTP, HTTP_SCRAPER_REGISTRY[domain]))
+    tiers.append((TIER_BROWSER, SCRAPER_REGISTRY[domain]))
+    return ScrapingEngine(tiers)
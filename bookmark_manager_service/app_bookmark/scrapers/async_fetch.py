@@ -0,0 +1,122 @@
+"""
+Shared asyncio HTTP client for scrapers.
+
+Each process runs one event loop in a daemon thread, holding a single
+httpx.AsyncClient: one connection pool with keep-alive, and HTTP/2 when the
+server offers it. Scraper code stays synchronous. fetch() and fetch_many()
+hand coroutines to the loop and block only the calling thread, so the
+downloads of every worker thread share connections and stay in flight
+together, and a slow image host no longer holds a connection per request.
+fetch_bytes() streams a body, stops at a size cap and joins it into bytes once.
+"""
+from django.conf import settings
+import asyncio
+import atexit
+import os
+import threading
+import httpx
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+try:
+    import h2  # noqa: F401 - httpx negotiates HTTP/2 only when h2 is installed
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class ResponseTooLarge(Exception):
+    """The response body is larger than the caller's cap"""
+    pass
+
+
+class AsyncFetcher:
+    """Process-wide event loop thread and AsyncClient; use get_fetcher()"""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_connections=100, max_keepalive=20, timeout=15.0, connect_timeout=5.0):
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self._pid = os.getpid()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='async-fetch', daemon=True)
+        self._thread.start()
+        self._client = self._run(self._create_client())
+
+    @classmethod
+    def get_fetcher(cls):
+        """Return the fetcher shared by every scraper in this process"""
+        with cls._instance_lock:
+            # A forked child (prefork pool) inherits the object but not the loop thread
+            if cls._instance is None or cls._instance._pid != os.getpid():
+                cls._instance = cls(
+                    max_connections=settings.SCRAPER_HTTP_MAX_CONNECTIONS,
+                    max_keepalive=settings.SCRAPER_HTTP_MAX_KEEPALIVE,
+                    timeout=settings.SCRAPER_HTTP_TIMEOUT,
+                    connect_timeout=settings.SCRAPER_HTTP_CONNECT_TIMEOUT,
+                )
+                atexit.register(cls._instance.close)
+            return cls._instance
+
+    async def _create_client(self):
+        return httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=self.limits,
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={'User-Agent': DEFAULT_USER_AGENT},
+        )
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _get(self, url, headers=None, timeout=None):
+        response = await self._client.get(url, headers=headers, timeout=timeout or self.timeout)
+        response.raise_for_status()
+        return response
+
+    def fetch(self, url: str, headers: dict = None, timeout: float = None) -> httpx.Response:
+        """GET `url`; raises httpx.HTTPError on network errors and non-2xx responses"""
+        return self._run(self._get(url, headers, timeout))
+
+    async def _get_bytes(self, url, headers, max_bytes, timeout=None):
+        async with self._client.stream('GET', url, headers=headers, timeout=timeout or self.timeout) as response:
+            response.raise_for_status()
+            declared = response.headers.get('Content-Length')
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                raise ResponseTooLarge(f"{url} is {declared} bytes, over the {max_bytes} byte cap")
+            # Joined once at the end: the body is copied a single time
+            chunks = []
+            size = 0
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ResponseTooLarge(f"{url} is over the {max_bytes} byte cap")
+            return b''.join(chunks)
+
+    def fetch_bytes(self, url: str, headers: dict = None, max_bytes: int = None, timeout: float = None) -> bytes:
+        """
+        GET `url` and return its body, streamed and joined into bytes once. Raises
+        ResponseTooLarge as soon as the body (or its Content-Length) exceeds
+        `max_bytes`, defaulting to SCRAPER_MAX_IMAGE_BYTES.
+        """
+        return self._run(self._get_bytes(url, headers, max_bytes or settings.SCRAPER_MAX_IMAGE_BYTES, timeout))
+
+    def fetch_many(self, requests, timeout: float = None) -> list:
+        """
+        GET several URLs concurrently. `requests` is a list of (url, headers)
+        pairs; responses come back in the same order. The first failure is
+        raised.
+        """
+        async def gather():
+            return await asyncio.gather(*(self._get(url, headers, timeout) for url, headers in requests))
+        return self._run(gather())
+
+    def close(self):
+        if self._pid != os.getpid() or not self._loop.is_running():
+            return
+        self._run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
@@ -1,30 +1,68 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
-import requests
+from typing import Optional
 from PIL import Image
 from io import BytesIO
 from django.core.files.base import ContentFile
+from django.conf import settings
+from urllib.parse import urlparse
 import time
+import logging
+from .async_fetch import AsyncFetcher
+from ..timing import span, log_event, STAGE_PAGE_FETCH, STAGE_IMAGE_FETCH, STAGE_IMAGE_VALIDATION
+
+logger = logging.getLogger(__name__)
+
+# Celery queues scrapers run on (see the registry in __init__.py and
+# app_bookmark/routing.py): browser scrapers need Chrome and a driver pool,
+# HTTP scrapers only a network connection
+QUEUE_BROWSER = 'scrape_browser'
+QUEUE_HTTP = 'scrape_http'
+
+
+def resolve_host_override(url: str) -> str:
+    """
+    Rewrite a site URL to the origin configured in SCRAPER_HOST_OVERRIDES.
+    Overrides are matched on the host and then on each parent domain, so an
+    entry for 'hitomi.la' also covers 'ltn.hitomi.la'. Used to point scrapers
+    at a local fixture server.
+    """
+    overrides = getattr(settings, 'SCRAPER_HOST_OVERRIDES', None)
+    if not overrides:
+        return url
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    labels = host.split('.')
+    for i in range(len(labels) - 1):
+        origin = overrides.get('.'.join(labels[i:]))
+        if origin:
+            origin = urlparse(origin)
+            return parsed._replace(scheme=origin.scheme, netloc=origin.netloc).geturl()
+    return url
 
 class ScrapingResult:
     """Data class to hold scraping results"""
     def __init__(self, title: str = None, thumbnail_url: str = None, 
                  thumbnail_data: bytes = None, success: bool = False, 
-                 error_message: str = None):
+                 error_message: str = None, ready_wait: float = None,
+                 tier: str = None, failure_type: str = None, scraper: str = None):
         self.title = title
         self.thumbnail_url = thumbnail_url
         self.thumbnail_data = thumbnail_data
         self.success = success
         self.error_message = error_message
+        self.ready_wait = ready_wait  # Seconds spent waiting for the page to become ready
+        self.tier = tier  # Scraping tier that produced this result (see engine.py)
+        self.failure_type = failure_type  # Why it failed, if it did (see failures.py)
+        self.scraper = scraper  # Name of the scraper class that produced it
 
 class BaseMangaScraper(ABC):
     """Base class for all manga site scrapers"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        # Shared by all scrapers of the process: pooled keep-alive/HTTP2 connections
+        self.fetcher = AsyncFetcher.get_fetcher()
     
     @abstractmethod
     def get_site_name(self) -> str:
@@ -41,22 +79,34 @@ class BaseMangaScraper(ABC):
         """Scrape manga title and thumbnail from the given URL"""
         pass
     
-    def download_thumbnail(self, thumbnail_url: str) -> Optional[bytes]:
-        """Download thumbnail image and return bytes"""
+    def fetch(self, url: str, referer: str = None):
+        """GET a site URL through the shared client; raises httpx.HTTPError on failure"""
+        headers = {'Referer': referer} if referer else None
+        with span(STAGE_PAGE_FETCH):
+            return self.fetcher.fetch(resolve_host_override(url), headers=headers)
+
+    def fetch_many(self, urls, referer: str = None) -> list:
+        """GET several site URLs concurrently; responses are in the order of `urls`"""
+        headers = {'Referer': referer} if referer else None
+        with span(STAGE_PAGE_FETCH):
+            return self.fetcher.fetch_many([(resolve_host_override(url), headers) for url in urls])
+
+    def download_thumbnail(self, thumbnail_url: str, referer: str = None) -> Optional[bytes]:
+        """Download thumbnail image (up to SCRAPER_MAX_IMAGE_BYTES) and return bytes"""
+        headers = {'Referer': referer} if referer else None
         try:
-            response = self.session.get(thumbnail_url, timeout=30)
-            response.raise_for_status()
-            
-            # Validate that it's an image
-            try:
-                img = Image.open(BytesIO(response.content))
-                img.verify()
-                return response.content
-            except Exception:
-                return None
-                
+            with span(STAGE_IMAGE_FETCH):
+                data = self.fetcher.fetch_bytes(resolve_host_override(thumbnail_url), headers=headers)
         except Exception as e:
-            print(f"Error downloading thumbnail: {e}")
+            log_event(logger, logging.WARNING, 'thumbnail_download_failed', url=thumbnail_url, error=str(e))
+            return None
+
+        # Validate that it's an image
+        try:
+            with span(STAGE_IMAGE_VALIDATION):
+                Image.open(BytesIO(data)).verify()
+            return data
+        except Exception:
             return None
     
     def create_thumbnail_file(self, thumbnail_data: bytes, filename: str = None) -> ContentFile:
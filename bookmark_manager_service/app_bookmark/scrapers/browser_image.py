@@ -0,0 +1,106 @@
+"""
+Download images a page shows, as the browser that loaded the page.
+
+The image is fetched by the shared HTTP client with the browser's cookies for
+the image URL, its User-Agent and the page as Referer, so hosts that check
+them serve it as they would to the page. The body is streamed straight into
+one buffer, capped at SCRAPER_MAX_IMAGE_BYTES, instead of being read by a
+script in the page and shipped over the WebDriver protocol as a base64 data
+URL. The in-page fetch is kept as a fallback for hosts that only serve the
+page's own requests.
+"""
+from django.conf import settings
+from urllib.parse import urlparse
+from io import BytesIO
+from PIL import Image
+import base64
+import logging
+from .async_fetch import ResponseTooLarge
+from .base import resolve_host_override
+from .page_profile import lift_blocking
+from ..timing import span, log_event, STAGE_IMAGE_FETCH, STAGE_IMAGE_VALIDATION
+
+logger = logging.getLogger(__name__)
+
+# Reads the image in the page; gives up on non-2xx responses and on bodies over the cap
+IN_PAGE_FETCH_SCRIPT = """
+    const url = arguments[0];
+    const maxBytes = arguments[1];
+    const callback = arguments[arguments.length - 1];
+    fetch(url)
+        .then(resp => resp.ok ? resp.blob() : null)
+        .then(blob => {
+            if (!blob || blob.size > maxBytes) {
+                callback(null);
+                return;
+            }
+            const reader = new FileReader();
+            reader.onloadend = () => callback(reader.result);
+            reader.onerror = () => callback(null);
+            reader.readAsDataURL(blob);
+        })
+        .catch(() => callback(null));
+"""
+
+
+def _browser_cookies(driver, image_url: str) -> list:
+    """Cookies the browser would send with a request for `image_url`"""
+    try:
+        # DevTools also returns cookies of other hosts (CDN subdomains) that the page's cookie jar holds
+        return driver.execute_cdp_cmd('Network.getCookies', {'urls': [image_url]})['cookies']
+    except Exception:
+        host = urlparse(image_url).hostname or ''
+        return [
+            cookie for cookie in driver.get_cookies()
+            if host == cookie.get('domain', '').lstrip('.') or host.endswith('.' + cookie.get('domain', '').lstrip('.'))
+        ]
+
+
+def browser_request_headers(driver, image_url: str) -> dict:
+    """Cookie, User-Agent and Referer headers matching the driver's current page"""
+    headers = {
+        'User-Agent': driver.execute_script("return navigator.userAgent"),
+        'Referer': driver.current_url,
+        'Accept': 'image/avif,image/webp,image/*,*/*;q=0.8',
+    }
+    cookies = _browser_cookies(driver, image_url)
+    if cookies:
+        headers['Cookie'] = '; '.join(f"{cookie['name']}={cookie['value']}" for cookie in cookies)
+    return headers
+
+
+def _fetch_in_page(driver, image_url: str) -> bytes | None:
+    """Fallback: fetch the image with a script in the page and decode its data URL"""
+    lift_blocking(driver)  # the lean page profile blocks images
+    try:
+        driver.set_script_timeout(20)
+        data_url = driver.execute_async_script(IN_PAGE_FETCH_SCRIPT, image_url, settings.SCRAPER_MAX_IMAGE_BYTES)
+        if data_url and isinstance(data_url, str) and data_url.startswith('data:image'):
+            return base64.b64decode(data_url.split(',', 1)[1])
+    except Exception as e:
+        log_event(logger, logging.ERROR, 'in_page_image_fetch_failed', url=image_url, error=str(e))
+    return None
+
+
+def fetch_browser_image(fetcher, driver, image_url: str) -> bytes | None:
+    """Image bytes of `image_url` as seen by the page loaded in `driver`, or None"""
+    try:
+        headers = browser_request_headers(driver, image_url)
+    except Exception as e:
+        log_event(logger, logging.ERROR, 'browser_session_unreadable', url=image_url, error=str(e))
+        headers = {'Referer': driver.current_url}
+
+    try:
+        with span(STAGE_IMAGE_FETCH):
+            data = fetcher.fetch_bytes(resolve_host_override(image_url), headers=headers)
+        with span(STAGE_IMAGE_VALIDATION):
+            Image.open(BytesIO(data)).verify()
+        log_event(logger, logging.DEBUG, 'image_fetched', url=image_url, bytes=len(data))
+        return data
+    except ResponseTooLarge as e:
+        log_event(logger, logging.ERROR, 'image_too_large', url=image_url, error=str(e))
+        return None
+    except Exception as e:
+        log_event(logger, logging.DEBUG, 'session_image_fetch_failed', url=image_url, error=str(e), fallback='in_page')
+    with span(STAGE_IMAGE_FETCH):
+        return _fetch_in_page(driver, image_url)
@@ -0,0 +1,92 @@
+import logging
+from .base import ScrapingResult
+from ..timing import log_event
+
+logger = logging.getLogger(__name__)
+
+TIER_HTTP = 'http'
+TIER_BROWSER = 'browser'
+
+
+class TierEscalation(Exception):
+    """
+    The tiers run so far were incomplete; continue with `tier` on `queue`.
+    `partial` holds the title and cover URL they did find, to pass on to it.
+    """
+
+    def __init__(self, tier: str, queue: str, partial: dict = None):
+        super().__init__(f"Escalating to tier '{tier}' on queue '{queue}'")
+        self.tier = tier
+        self.queue = queue
+        self.partial = partial
+
+
+class ScrapingEngine:
+    """
+    Runs a site's scrapers cheapest first and stops at the first tier that
+    produces both a title and cover image. Fields a tier misses are filled in
+    from earlier tiers, so e.g. a title found over HTTP is kept when only the
+    browser finds the cover. If no tier is complete, the best partial result
+    is returned, preferring later tiers.
+
+    Only consecutive tiers served by the same Celery queue run in one call.
+    When they are incomplete and a later tier needs another queue,
+    TierEscalation is raised so the task can continue on that queue; it
+    carries the partial fields, which the task passes back in as `partial`.
+    """
+
+    def __init__(self, tiers):
+        # tiers: list of (tier name, ScraperRef), cheapest first; classes are imported when their tier runs
+        self.tiers = tiers
+
+    def _remaining_tiers(self, start_tier: str = None):
+        names = [tier for tier, _ in self.tiers]
+        start = names.index(start_tier) if start_tier in names else 0
+        return self.tiers[start:]
+
+    def queue_for(self, start_tier: str = None) -> str:
+        """Celery queue of the tier a scrape starting at `start_tier` runs first"""
+        return self._remaining_tiers(start_tier)[0][1].queue
+
+    def scrape(self, url: str, start_tier: str = None, partial: dict = None) -> ScrapingResult:
+        remaining = self._remaining_tiers(start_tier)
+        queue = remaining[0][1].queue
+        best = None
+        if partial:
+            best = ScrapingResult(title=partial.get('title'), thumbnail_url=partial.get('thumbnail_url'))
+        for tier, scraper_ref in remaining:
+            if scraper_ref.queue != queue:
+                raise TierEscalation(tier, scraper_ref.queue, self._partial(best))
+            result = scraper_ref.load()().scrape_manga_info(url)
+            result.tier = tier
+            result.scraper = scraper_ref.name
+            if best is not None:
+                self._fill_missing(result, best)
+            if result.title and result.thumbnail_data:
+                return result
+            log_event(logger, logging.DEBUG, 'tier_incomplete', url=url, tier=tier, error=result.error_message or 'missing title or cover')
+            if best is None or self._score(result) >= self._score(best):
+                best = result
+        return best
+
+    @staticmethod
+    def _score(result: ScrapingResult) -> int:
+        return int(bool(result.title)) + int(bool(result.thumbnail_data))
+
+    @staticmethod
+    def _fill_missing(result: ScrapingResult, earlier: ScrapingResult):
+        """Fill the title or cover `result` lacks from an earlier tier's result"""
+        if not result.title and earlier.title:
+            result.title = earlier.title
+        if not result.thumbnail_data and earlier.thumbnail_data:
+            result.thumbnail_url, result.thumbnail_data = earlier.thumbnail_url, earlier.thumbnail_data
+        elif not result.thumbnail_url:
+            result.thumbnail_url = earlier.thumbnail_url
+        if not result.success and (result.title or result.thumbnail_data):
+            result.success, result.error_message = True, None
+
+    @staticmethod
+    def _partial(result: ScrapingResult):
+        """Fields of `result` to carry over to a tier on another queue (cover bytes are fetched again)"""
+        fields = {'title': result.title, 'thumbnail_url': result.thumbnail_url} if result else {}
+        return {name: value for name, value in fields.items() if value} or None
@@ -0,0 +1,123 @@
+"""
+Declarative field extraction shared by the HTTP and browser tiers.
+
+An ExtractionSpec maps each field to an ordered list of candidates: an XPath
+and where to read the value from (text, or the first non-empty of several
+attributes). The first candidate that yields a value wins. The same spec runs
+against an lxml tree (extract_from_tree) or inside the browser as one script
+(extract_from_driver), so reading every field costs a single round-trip to
+chromedriver instead of a find_element/get_attribute call per candidate.
+"""
+from urllib.parse import urljoin
+from ..timing import span, STAGE_EXTRACTION
+
+
+class Candidate:
+    """
+    One place a field's value may be found. With no `attributes` the
+    element's text is used. `url` resolves the value against the page URL;
+    `srcset` keeps only the first URL of a srcset attribute.
+    """
+
+    def __init__(self, xpath: str, attributes=(), url: bool = False, srcset: bool = False):
+        self.xpath = xpath
+        self.attributes = list(attributes)
+        self.url = url
+        self.srcset = srcset
+
+    def as_dict(self) -> dict:
+        return {'xpath': self.xpath, 'attributes': self.attributes, 'url': self.url, 'srcset': self.srcset}
+
+
+class ExtractionSpec:
+    """Ordered candidates for each field of a page"""
+
+    def __init__(self, **fields):
+        self.fields = {name: list(candidates) for name, candidates in fields.items()}
+
+    def extend(self, other: 'ExtractionSpec') -> 'ExtractionSpec':
+        """A spec trying this spec's candidates first, then `other`'s"""
+        fields = {name: list(candidates) for name, candidates in self.fields.items()}
+        for name, candidates in other.fields.items():
+            fields.setdefault(name, []).extend(candidates)
+        return ExtractionSpec(**fields)
+
+    def xpaths(self, field: str) -> list:
+        return [candidate.xpath for candidate in self.fields[field]]
+
+    def extract_from_tree(self, tree, base_url: str = None) -> dict:
+        """Values of every field from an lxml tree; missing fields are None"""
+        with span(STAGE_EXTRACTION):
+            return {
+                name: _first_value(tree, candidates, base_url)
+                for name, candidates in self.fields.items()
+            }
+
+    def extract_from_driver(self, driver) -> dict:
+        """Values of every field from the driver's current page, in one script call"""
+        spec = {name: [candidate.as_dict() for candidate in candidates] for name, candidates in self.fields.items()}
+        with span(STAGE_EXTRACTION):
+            values = driver.execute_script(EXTRACT_SCRIPT, spec) or {}
+        return {name: values.get(name) for name in self.fields}
+
+
+def _candidate_value(element, candidate: Candidate, base_url: str = None):
+    if not candidate.attributes:
+        return element.text_content().strip() or None
+    for attribute in candidate.attributes:
+        value = (element.get(attribute) or '').strip()
+        if not value:
+            continue
+        if candidate.srcset:
+            value = value.split()[0]
+        if candidate.url and base_url:
+            value = urljoin(base_url, value)
+        return value
+    return None
+
+
+def _first_value(tree, candidates, base_url: str = None):
+    for candidate in candidates:
+        for element in tree.xpath(candidate.xpath):
+            value = _candidate_value(element, candidate, base_url)
+            if value:
+                return value
+    return None
+
+
+# The browser-side counterpart of extract_from_tree; arguments[0] is {field: [candidate dict, ...]}
+EXTRACT_SCRIPT = """
+    const spec = arguments[0];
+    const valueOf = (element, candidate) => {
+        if (!candidate.attributes.length) {
+            return (element.innerText || element.textContent || '').trim() || null;
+        }
+        for (const attribute of candidate.attributes) {
+            let value = (element.getAttribute(attribute) || '').trim();
+            if (!value) continue;
+            if (candidate.srcset) value = value.split(/\\s+/)[0];
+            if (candidate.url) {
+                try { value = new URL(value, document.baseURI).href; } catch (e) {}
+            }
+            return value;
+        }
+        return null;
+    };
+    const result = {};
+    for (const [field, candidates] of Object.entries(spec)) {
+        result[field] = null;
+        search:
+        for (const candidate of candidates) {
+            const matches = document.evaluate(
+                candidate.xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            for (let i = 0; i < matches.snapshotLength; i++) {
+                const value = valueOf(matches.snapshotItem(i), candidate);
+                if (value) {
+                    result[field] = value;
+                    break search;
+                }
+            }
+        }
+    }
+    return result;
+"""
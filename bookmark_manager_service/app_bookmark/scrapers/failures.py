@@ -0,0 +1,57 @@
+"""
+Classification of failed scrapes from ScrapingResult.error_message.
+
+The class decides what happens next: transient failures are retried with
+backoff, and failures that say the site itself is unhealthy count towards
+its circuit breaker (see app_bookmark/circuit_breaker.py).
+"""
+from django.conf import settings
+import random
+import re
+
+FAILURE_TIMEOUT = 'timeout'
+FAILURE_BLOCKED = 'blocked'
+FAILURE_SELECTOR_MISSING = 'selector_missing'
+FAILURE_NETWORK = 'network'
+FAILURE_BROWSER_UNAVAILABLE = 'browser_unavailable'
+FAILURE_UNKNOWN = 'unknown'
+
+# Worth retrying the same request after a pause
+TRANSIENT_FAILURES = {FAILURE_TIMEOUT, FAILURE_NETWORK, FAILURE_BROWSER_UNAVAILABLE}
+
+# Mean the site is down or refusing us, rather than a problem on our side
+SITE_HEALTH_FAILURES = {FAILURE_TIMEOUT, FAILURE_BLOCKED, FAILURE_NETWORK}
+
+# Checked in order; the first matching pattern wins
+FAILURE_PATTERNS = [
+    (FAILURE_BROWSER_UNAVAILABLE, re.compile(r'browser unavailable', re.I)),
+    (FAILURE_TIMEOUT, re.compile(r'time ?out|timed out', re.I)),
+    (FAILURE_BLOCKED, re.compile(
+        r'\b(401|403|429|503)\b|forbidden|too many requests|captcha|cloudflare|access denied', re.I
+    )),
+    (FAILURE_NETWORK, re.compile(
+        r'connect|name ?resolution|name or service not known|max retries exceeded|remote end closed|remoteprotocolerror|ssl|net::err_|unreachable', re.I
+    )),
+    (FAILURE_SELECTOR_MISSING, re.compile(r'could not find|no such element|unable to locate', re.I)),
+]
+
+
+def classify_failure(result) -> str:
+    """Failure class of an unsuccessful ScrapingResult, or None if it succeeded"""
+    if result.success:
+        return None
+    message = result.error_message or ''
+    for failure_type, pattern in FAILURE_PATTERNS:
+        if pattern.search(message):
+            return failure_type
+    return FAILURE_UNKNOWN
+
+
+def retry_countdown(attempt: int) -> float:
+    """
+    Seconds before retry `attempt + 1` of a transient failure: exponential
+    backoff (SCRAPER_RETRY_BACKOFF * 2^attempt, at most SCRAPER_RETRY_BACKOFF_MAX),
+    jittered over its upper half so retries of a failed batch spread out
+    """
+    backoff = min(settings.SCRAPER_RETRY_BACKOFF_MAX, settings.SCRAPER_RETRY_BACKOFF * 2 ** attempt)
+    return backoff / 2 + random.uniform(0, backoff / 2)
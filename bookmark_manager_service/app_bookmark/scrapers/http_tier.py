@@ -0,0 +1,96 @@
+"""
+Lightweight scrapers that use plain HTTP requests and HTML/JSON parsing.
+
+These are tried before the Selenium scrapers (see engine.py). They never
+raise; a result without a title or cover tells the engine to escalate.
+"""
+from abc import abstractmethod
+from urllib.parse import urlparse
+import json
+import re
+from lxml import html as lxml_html
+from .base import BaseMangaScraper, ScrapingResult
+from .selectors import BATO_PAGE, OPENGRAPH, HITOMI_GALLERY_BLOCK
+
+
+class HttpMangaScraper(BaseMangaScraper):
+    """Base class for HTTP tier scrapers"""
+
+    def scrape_manga_info(self, url: str) -> ScrapingResult:
+        try:
+            title, thumbnail_url = self.extract(url)
+        except Exception as e:
+            return ScrapingResult(success=False, error_message=f"HTTP scraping error: {type(e).__name__}: {str(e)}")
+
+        thumbnail_data = None
+        if thumbnail_url:
+            thumbnail_data = self.download_thumbnail(thumbnail_url, referer=url)
+
+        success = bool(title or thumbnail_data)
+        return ScrapingResult(
+            title=title,
+            thumbnail_url=thumbnail_url,
+            thumbnail_data=thumbnail_data,
+            success=success,
+            error_message=None if success else "Could not find title or thumbnail"
+        )
+
+    @abstractmethod
+    def extract(self, url: str) -> tuple:
+        """Return (title, absolute thumbnail URL) for the page at `url`"""
+
+
+class HitomiHttpScraper(HttpMangaScraper):
+    """
+    Reads Hitomi gallery metadata from the ltn.hitomi.la endpoints the gallery
+    page itself loads: galleries/<id>.js for the title and galleryblock/<id>.html
+    for the cover thumbnail.
+    """
+    ltn_base_url = 'https://ltn.hitomi.la'
+    gallery_id_pattern = re.compile(r'-?(\d+)\.html$')
+
+    def get_site_name(self) -> str:
+        return "Hitomi.la"
+
+    def get_domain(self) -> str:
+        return "hitomi.la"
+
+    def extract(self, url: str) -> tuple:
+        match = self.gallery_id_pattern.search(urlparse(url).path)
+        if not match:
+            raise ValueError(f"No gallery ID in URL: {url}")
+        gallery_id = match.group(1)
+
+        # Both endpoints are fetched concurrently over the shared client
+        info_response, block_response = self.fetch_many([
+            f"{self.ltn_base_url}/galleries/{gallery_id}.js",
+            f"{self.ltn_base_url}/galleryblock/{gallery_id}.html",
+        ], referer=url)
+
+        title = None
+        info = info_response.text
+        # The file is a script assigning one JSON object: "var galleryinfo = {...}"
+        payload = info[info.index('{'):] if '{' in info else ''
+        if payload:
+            galleryinfo = json.loads(payload.rstrip().rstrip(';'))
+            title = (galleryinfo.get('title') or galleryinfo.get('japanese_title') or '').strip() or None
+
+        block = lxml_html.fromstring(block_response.content)
+        thumbnail_url = HITOMI_GALLERY_BLOCK.extract_from_tree(block, base_url=url)['thumbnail_url']
+        return title, thumbnail_url
+
+
+class BatoHttpScraper(HttpMangaScraper):
+    """Parses the server-rendered Bato series page, falling back to OpenGraph tags"""
+    extraction = BATO_PAGE.extend(OPENGRAPH)
+
+    def get_site_name(self) -> str:
+        return "Bato.to"
+
+    def get_domain(self) -> str:
+        return "bato.to"
+
+    def extract(self, url: str) -> tuple:
+        tree = lxml_html.fromstring(self.fetch(url).content)
+        values = self.extraction.extract_from_tree(tree, base_url=url)
+        return values['title'], values['thumbnail_url']
@@ -0,0 +1,86 @@
+"""
+Lean page loads for browser scrapers.
+
+A scraper only needs the page's DOM and the scripts that build it; the cover
+is downloaded separately (browser_image.py). A PageLoadProfile blocks every
+other kind of resource, plus ad and analytics hosts, through the DevTools
+Network.setBlockedURLs command. Profiles are applied on every lease, since a
+pooled driver serves every site, and a scraper allows back whatever kinds
+its pages do need.
+"""
+from django.conf import settings
+import logging
+from ..timing import log_event
+
+logger = logging.getLogger(__name__)
+
+# URL patterns (DevTools wildcards) of each resource kind that can be blocked
+RESOURCE_PATTERNS = {
+    'image': ['*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico', '*.bmp'],
+    'font': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'stylesheet': ['*.css'],
+    'media': ['*.mp4', '*.webm', '*.m3u8', '*.mp3', '*.ogg'],
+}
+
+# Third-party hosts no scraper needs anything from
+TRACKER_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*googlesyndication.com*',
+    '*doubleclick.net*', '*adservice.google.*', '*facebook.net*', '*hotjar.com*',
+    '*cloudflareinsights.com*', '*exoclick.com*', '*juicyads.com*', '*popads.net*',
+    '*adsterra.com*', '*disqus.com*',
+]
+
+
+class PageLoadProfile:
+    """
+    Resources a scraper's pages are loaded without.
+
+    Every kind in RESOURCE_PATTERNS is blocked unless listed in `allow`, and
+    tracker hosts are always blocked. `extra_blocked` adds site-specific URL
+    patterns (e.g. a site's own ad server).
+    """
+
+    def __init__(self, allow=(), extra_blocked=()):
+        unknown = set(allow) - set(RESOURCE_PATTERNS)
+        if unknown:
+            raise ValueError(f"Unknown resource kinds: {', '.join(sorted(unknown))}")
+        self.allow = frozenset(allow)
+        self.extra_blocked = list(extra_blocked)
+
+    def blocked_patterns(self) -> list:
+        patterns = []
+        for kind, kind_patterns in RESOURCE_PATTERNS.items():
+            if kind not in self.allow:
+                patterns.extend(kind_patterns)
+        return patterns + TRACKER_PATTERNS + self.extra_blocked
+
+    def apply(self, driver):
+        """Block this profile's resources for the driver's next page loads"""
+        patterns = self.blocked_patterns() if settings.SCRAPER_LEAN_PAGE_LOADS else []
+        set_blocked_urls(driver, patterns)
+
+
+def set_blocked_urls(driver, patterns: list):
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    except Exception as e:
+        # Not fatal: the page just loads everything
+        log_event(logger, logging.ERROR, 'page_profile_failed', error=str(e))
+
+
+def lift_blocking(driver):
+    """Let every request through again, e.g. before fetching an image in the page"""
+    set_blocked_urls(driver, [])
+
+
+def page_weight(driver) -> dict:
+    """Requests and bytes transferred by the current page so far (Resource Timing)"""
+    return driver.execute_script("""
+        const entries = performance.getEntriesByType('navigation')
+            .concat(performance.getEntriesByType('resource'));
+        return {
+            requests: entries.length,
+            bytes: entries.reduce((total, entry) => total + (entry.transferSize || 0), 0),
+        };
+    """)
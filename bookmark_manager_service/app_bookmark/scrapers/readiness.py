@@ -0,0 +1,59 @@
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+from django.conf import settings
+import time
+from ..timing import span, STAGE_READINESS_WAIT
+
+# arguments[0]: list of XPath groups; true once every group has a matching node
+XPATH_READY_SCRIPT = """
+    return arguments[0].every(group => group.some(xpath => document.evaluate(
+        xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue));
+"""
+
+
+def get_ready_timeout(domain: str) -> float:
+    """Upper bound in seconds for waiting on a page of the given site"""
+    return settings.SCRAPER_READY_TIMEOUTS.get(domain, settings.SCRAPER_READY_TIMEOUT)
+
+
+class ReadinessSpec:
+    """
+    Describes when a scraped page is ready for extraction.
+
+    `groups` is a list of locator groups, each a list of (By, value) pairs.
+    The page is ready once every group has at least one matching element,
+    so alternatives (e.g. several possible title XPaths) go in the same group.
+    """
+
+    def __init__(self, groups, poll_frequency: float = 0.25):
+        self.groups = groups
+        self.poll_frequency = poll_frequency
+        # XPath-only specs are checked with one script call per poll
+        self.xpath_groups = None
+        if all(by == By.XPATH for group in groups for by, _ in group):
+            self.xpath_groups = [[value for _, value in group] for group in groups]
+
+    @classmethod
+    def for_extraction(cls, spec, **kwargs):
+        """Ready once every field of an ExtractionSpec has a candidate element"""
+        return cls([[(By.XPATH, xpath) for xpath in spec.xpaths(field)] for field in spec.fields], **kwargs)
+
+    def is_ready(self, driver) -> bool:
+        if self.xpath_groups is not None:
+            return bool(driver.execute_script(XPATH_READY_SCRIPT, self.xpath_groups))
+        for group in self.groups:
+            if not any(driver.find_elements(by, value) for by, value in group):
+                return False
+        return True
+
+    def wait(self, driver, timeout: float) -> tuple[bool, float]:
+        """Wait until the page is ready or `timeout` elapses; return (ready, seconds waited)"""
+        start = time.monotonic()
+        with span(STAGE_READINESS_WAIT):
+            try:
+                WebDriverWait(driver, timeout, poll_frequency=self.poll_frequency).until(self.is_ready)
+                ready = True
+            except TimeoutException:
+                ready = False
+        return ready, time.monotonic() - start
@@ -0,0 +1,36 @@
+"""Extraction specs for the scraped pages, shared by the browser and HTTP scraping tiers"""
+from .extraction import Candidate, ExtractionSpec
+
+IMAGE_ATTRIBUTES = ['src', 'data-src']
+
+# Bato serves one of two layouts, so each field has two candidate XPaths
+BATO_PAGE = ExtractionSpec(
+    title=[
+        Candidate("/html/body/div/div[1]/div[1]/div[1]/h3/a"),
+        Candidate("/html/body/div/div[1]/div[2]/div[1]/h3/a"),
+    ],
+    thumbnail_url=[
+        Candidate("/html/body/div/div[1]/div[1]/div[3]/div[1]/img", IMAGE_ATTRIBUTES, url=True),
+        Candidate("/html/body/div/div[1]/div[2]/div[3]/div[1]/img", IMAGE_ATTRIBUTES, url=True),
+    ],
+)
+
+# Present in the server-rendered HTML even when the layout changes
+OPENGRAPH = ExtractionSpec(
+    title=[Candidate('//meta[@property="og:title"]', ['content'])],
+    thumbnail_url=[Candidate('//meta[@property="og:image"]', ['content'], url=True)],
+)
+
+# Gallery page once its scripts have filled in the title link and cover
+HITOMI_GALLERY_PAGE = ExtractionSpec(
+    title=[Candidate('//*[@id="gallery-brand"]//a')],
+    thumbnail_url=[Candidate('//*[@id="bigtn_img"]', IMAGE_ATTRIBUTES, url=True)],
+)
+
+# ltn.hitomi.la/galleryblock/<id>.html: a gallery card with a lazy-loaded cover
+HITOMI_GALLERY_BLOCK = ExtractionSpec(
+    thumbnail_url=[
+        Candidate('//img', ['data-src', 'src'], url=True),
+        Candidate('//source', ['data-srcset', 'srcset'], url=True, srcset=True),
+    ],
+)
@@ -1,29 +1,218 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
+from contextlib import contextmanager
+from collections import deque
 import threading
+import atexit
+import time
+import psutil
+import logging
+from ..timing import span, log_event, STAGE_DRIVER_LEASE
 
-class SingletonWebDriver:
+logger = logging.getLogger(__name__)
+
+
+class DriverLeaseTimeout(Exception):
+    """Raised when no driver could be leased from the pool in time"""
+    pass
+
+
+def create_chrome_driver():
+    """Start a new headless Chrome instance configured for scraping"""
+    chrome_options = Options()
+    chrome_options.page_load_strategy = "eager"
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+    service = Service('/usr/local/bin/chromedriver')
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    driver.set_page_load_timeout(30)
+    return driver
+
+
+class PooledDriver:
+    """A Chrome driver owned by the pool, with its usage counters"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages_served = 0
+        self.created_at = time.time()
+
+    def is_healthy(self) -> bool:
+        """Check that the browser still answers over the WebDriver protocol"""
+        try:
+            return self.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def rss_mb(self) -> float:
+        """Resident memory of chromedriver and all Chrome processes it spawned"""
+        try:
+            root = psutil.Process(self.driver.service.process.pid)
+            processes = [root] + root.children(recursive=True)
+        except Exception:
+            return 0.0
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            log_event(logger, logging.ERROR, 'driver_quit_failed', error=str(e))
+
+
+class WebDriverPool:
+    """
+    Bounded pool of Chrome drivers with lease/return semantics.
+
+    Drivers are health-checked when leased and recycled once they have served
+    `max_pages` pages or their process tree grows past `max_rss_mb`. A driver
+    whose lease ended with an exception is discarded rather than reused.
+    """
     _instance = None
-    _lock = threading.Lock()
-
-    def __init__(self):
-        if not hasattr(self, 'driver'):
-            chrome_options = Options()
-            chrome_options.page_load_strategy = "eager"
-            chrome_options.add_argument("--headless")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--window-size=1920,1080")
-            chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-            service = Service('/usr/local/bin/chromedriver')
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            self.driver.set_page_load_timeout(30)
+    _instance_lock = threading.Lock()
+
+    def __init__(self, size=2, lease_timeout=60, max_pages=50, max_rss_mb=1024):
+        self.size = size
+        self.lease_timeout = lease_timeout
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._in_use = 0
+        self._closed = False
+
+        self._leases_total = 0
+        self._lease_timeouts_total = 0
+        self._lease_wait_seconds_total = 0.0
+        self._lease_wait_seconds_max = 0.0
+        self._created_total = 0
+        self._recycled_total = {'pages': 0, 'rss': 0, 'unhealthy': 0, 'error': 0}
 
     @classmethod
-    def get_driver(cls):
-        with cls._lock:
+    def get_pool(cls):
+        """Return the pool shared by every scraper in this process"""
+        with cls._instance_lock:
             if cls._instance is None:
-                cls._instance = SingletonWebDriver()
-            return cls._instance.driver
\ No newline at end of file
+                from django.conf import settings
+                cls._instance = cls(
+                    size=settings.WEBDRIVER_POOL_SIZE,
+                    lease_timeout=settings.WEBDRIVER_LEASE_TIMEOUT,
+                    max_pages=settings.WEBDRIVER_MAX_PAGES,
+                    max_rss_mb=settings.WEBDRIVER_MAX_RSS_MB,
+                )
+                atexit.register(cls._instance.close)
+            return cls._instance
+
+    @contextmanager
+    def lease(self):
+        """Lease a driver for the duration of the `with` block"""
+        with span(STAGE_DRIVER_LEASE):
+            pooled = self._acquire()
+        failed = False
+        try:
+            yield pooled.driver
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._release(pooled, failed)
+
+    def _acquire(self) -> PooledDriver:
+        wait_start = time.monotonic()
+        if not self._slots.acquire(timeout=self.lease_timeout):
+            with self._lock:
+                self._lease_timeouts_total += 1
+            raise DriverLeaseTimeout(
+                f"No browser available after waiting {self.lease_timeout}s (pool size {self.size})"
+            )
+        wait = time.monotonic() - wait_start
+
+        try:
+            pooled = self._checkout_idle()
+            if pooled is None:
+                pooled = PooledDriver(create_chrome_driver())
+                with self._lock:
+                    self._created_total += 1
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._leases_total += 1
+            self._lease_wait_seconds_total += wait
+            self._lease_wait_seconds_max = max(self._lease_wait_seconds_max, wait)
+        return pooled
+
+    def _checkout_idle(self):
+        """Pop idle drivers until a healthy one is found"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                pooled = self._idle.pop()
+            if pooled.is_healthy():
+                return pooled
+            self._recycle(pooled, 'unhealthy')
+
+    def _release(self, pooled: PooledDriver, failed: bool):
+        pooled.pages_served += 1
+        try:
+            if failed:
+                self._recycle(pooled, 'error')
+            elif pooled.pages_served >= self.max_pages:
+                self._recycle(pooled, 'pages')
+            elif self.max_rss_mb and pooled.rss_mb() >= self.max_rss_mb:
+                self._recycle(pooled, 'rss')
+            else:
+                with self._lock:
+                    if self._closed:
+                        pooled.quit()
+                    else:
+                        self._idle.append(pooled)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def _recycle(self, pooled: PooledDriver, reason: str):
+        pooled.quit()
+        with self._lock:
+            self._recycled_total[reason] += 1
+
+    def stats(self) -> dict:
+        """Snapshot of pool metrics"""
+        with self._lock:
+            return {
+                'pool_size': self.size,
+                'drivers_idle': len(self._idle),
+                'drivers_in_use': self._in_use,
+                'leases_total': self._leases_total,
+                'lease_timeouts_total': self._lease_timeouts_total,
+                'lease_wait_seconds_total': self._lease_wait_seconds_total,
+                'lease_wait_seconds_max': self._lease_wait_seconds_max,
+                'drivers_created_total': self._created_total,
+                'drivers_recycled_total': dict(self._recycled_total),
+            }
+
+    def close(self):
+        """Quit every idle driver; drivers still leased are quit on return"""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for pooled in idle:
+            pooled.quit()
@@ -1,28 +1,41 @@
 from rest_framework import serializers
+from django.conf import settings
 from .models import Bookmark, SupportedSite
 
 class BookmarkSerializer(serializers.ModelSerializer):
     thumbnail_url = serializers.SerializerMethodField()
+    thumbnail_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Bookmark
-        fields = ['id', 'title', 'url', 'thumbnail_url', 'created_at']
+        fields = ['id', 'title', 'url', 'thumbnail_url', 'thumbnail_srcset', 'created_at']
     
     def get_thumbnail_url(self, obj):
-        if obj.thumbnail and hasattr(obj.thumbnail, 'url'):
+        thumbnail = obj.thumbnail_file
+        if thumbnail and hasattr(thumbnail, 'url'):
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(obj.thumbnail.url)
+                return request.build_absolute_uri(thumbnail.url)
         return obj.thumbnail_url
 
+    def get_thumbnail_srcset(self, obj):
+        """srcset strings per format, e.g. {"webp": "<url> 160w, <url> 320w", "jpeg": ...}"""
+        request = self.context.get('request')
+        if not obj.thumbnail_blob_id or not request:
+            return None
+        srcset = {}
+        for derivative in obj.thumbnail_blob.derivatives.all():
+            entry = f"{request.build_absolute_uri(derivative.file.url)} {derivative.width}w"
+            srcset.setdefault(derivative.format, []).append(entry)
+        return {fmt: ", ".join(entries) for fmt, entries in srcset.items()} or None
+
 class BookmarkCreateSerializer(serializers.Serializer):
     url = serializers.URLField()
     
     def validate_url(self, value):
         """Validate that the URL is from a supported site"""
-        from .scrapers import get_scraper_for_url
-        scraper_class = get_scraper_for_url(value)
-        if not scraper_class:
+        from .scrapers import is_supported_url
+        if not is_supported_url(value):
             from urllib.parse import urlparse
             domain = urlparse(value).netloc
             raise serializers.ValidationError(
@@ -30,6 +43,22 @@ class BookmarkCreateSerializer(serializers.Serializer):
             )
         return value
 
+class BookmarkImportSerializer(serializers.Serializer):
+    # Entries are not validated here: invalid and unsupported URLs are counted and skipped
+    urls = serializers.ListField(child=serializers.CharField(allow_blank=True), required=False)
+    file = serializers.FileField(required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('urls') and not attrs.get('file'):
+            raise serializers.ValidationError("Provide a list of 'urls' or a bookmarks export 'file'.")
+        return attrs
+
+class TaskStatusBatchSerializer(serializers.Serializer):
+    task_ids = serializers.ListField(
+        child=serializers.CharField(max_length=255), allow_empty=False,
+        max_length=settings.TASK_STATUS_BATCH_MAX
+    )
+
 class SupportedSiteSerializer(serializers.ModelSerializer):
     class Meta:
         model = SupportedSite
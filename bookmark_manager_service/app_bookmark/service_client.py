@@ -0,0 +1,213 @@
+"""
+Shared HTTP client for calls to other internal services (the user service).
+
+One httpx.Client per process is used by every thread: a connection pool
+with keep-alive, and separate connect, read and pool-wait timeouts
+(SERVICE_HTTP_*), so a slow service costs a bounded wait instead of a fresh
+TCP connection and a flat timeout per call. On top of it, per service:
+
+- Retries: a call that failed to connect, timed out or got a 502/503/504 is
+  retried up to SERVICE_HTTP_RETRIES times after a short jittered backoff.
+  Only GET is retried, and retries draw from a budget that refills by
+  SERVICE_HTTP_RETRY_BUDGET_RATIO per call, so an outage cannot multiply
+  the load on the service.
+- Circuit breaker, kept in-process so checking it costs no network: after
+  SERVICE_CIRCUIT_FAILURE_THRESHOLD consecutive failures (network errors,
+  timeouts, 5xx), calls fail at once with ServiceUnavailable for
+  SERVICE_CIRCUIT_OPEN_SECONDS, then one probe call is let through; a
+  success closes the circuit, a failure opens it again. The semantics follow
+  circuit_breaker.py, the scrapers' per-site breaker shared through Redis.
+- Metrics: bookmark_service_request_duration_seconds{service,outcome} for
+  every call, including the ones shed by the breaker.
+
+New cross-service calls should go through get_client() rather than their own
+connections.
+"""
+from django.conf import settings
+import atexit
+import os
+import random
+import threading
+import time
+import httpx
+import logging
+from .metrics import SERVICE_CIRCUIT_OPENED, SERVICE_REQUEST_DURATION, SERVICE_REQUEST_RETRIES
+from .timing import log_event
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+RETRYABLE_STATUS = {502, 503, 504}
+
+
+class ServiceUnavailable(Exception):
+    """The service's circuit is open; the call was not attempted"""
+
+    def __init__(self, service: str, retry_after: float):
+        self.service = service
+        self.retry_after = retry_after
+        super().__init__(f"Circuit open for {service}, retry in {retry_after:.1f}s")
+
+
+class ServiceCircuit:
+    """In-process closed / open / half_open breaker of one service"""
+
+    def __init__(self, service: str, failure_threshold: int, open_seconds: float):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise ServiceUnavailable unless a call may go out now"""
+        if self.state == 'closed':
+            return
+        with self._lock:
+            now = time.monotonic()
+            if now < self.open_until:
+                raise ServiceUnavailable(self.service, self.open_until - now)
+            # One probe at a time; the others are shed until it reports back
+            self.state = 'half_open'
+            self.open_until = now + self.open_seconds
+
+    def record(self, healthy: bool):
+        with self._lock:
+            if healthy:
+                self.state, self.failures = 'closed', 0
+                return
+            self.failures += 1
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.state = 'open'
+                self.open_until = time.monotonic() + self.open_seconds
+                SERVICE_CIRCUIT_OPENED.labels(self.service).inc()
+                log_event(logger, logging.WARNING, 'service_circuit_opened', service=self.service, open_seconds=self.open_seconds)
+
+
+class RetryBudget:
+    """Retries allowed as a fraction of calls: each call adds `ratio` tokens, each retry spends one"""
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class ServiceClient:
+    """Process-wide pooled client with retries and circuit breakers; use get_client()"""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_connections=50, max_keepalive=20, connect_timeout=1.0, read_timeout=3.0,
+                 pool_timeout=1.0, retries=1, retry_backoff=0.05, retry_budget_ratio=0.1,
+                 failure_threshold=5, open_seconds=10.0):
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.retry_budget_ratio = retry_budget_ratio
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self._pid = os.getpid()
+        self._circuits = {}
+        self._budgets = {}
+        self._lock = threading.Lock()
+        self._client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout, pool=pool_timeout),
+        )
+
+    @classmethod
+    def get_client(cls):
+        """Return the client shared by every thread in this process"""
+        with cls._instance_lock:
+            # A forked child must not share the parent's sockets
+            if cls._instance is None or cls._instance._pid != os.getpid():
+                cls._instance = cls(
+                    max_connections=settings.SERVICE_HTTP_MAX_CONNECTIONS,
+                    max_keepalive=settings.SERVICE_HTTP_MAX_KEEPALIVE,
+                    connect_timeout=settings.SERVICE_HTTP_CONNECT_TIMEOUT,
+                    read_timeout=settings.SERVICE_HTTP_READ_TIMEOUT,
+                    pool_timeout=settings.SERVICE_HTTP_POOL_TIMEOUT,
+                    retries=settings.SERVICE_HTTP_RETRIES,
+                    retry_backoff=settings.SERVICE_HTTP_RETRY_BACKOFF,
+                    retry_budget_ratio=settings.SERVICE_HTTP_RETRY_BUDGET_RATIO,
+                    failure_threshold=settings.SERVICE_CIRCUIT_FAILURE_THRESHOLD,
+                    open_seconds=settings.SERVICE_CIRCUIT_OPEN_SECONDS,
+                )
+                atexit.register(cls._instance.close)
+            return cls._instance
+
+    def circuit(self, service: str) -> ServiceCircuit:
+        with self._lock:
+            if service not in self._circuits:
+                self._circuits[service] = ServiceCircuit(service, self.failure_threshold, self.open_seconds)
+                # Up to 10 retries in a row before the budget has to refill
+                self._budgets[service] = RetryBudget(self.retry_budget_ratio, max_tokens=10)
+            return self._circuits[service]
+
+    def request(self, service: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request to `service` (a name for its circuit and metrics) and
+        return the response, whatever its status. Raises ServiceUnavailable
+        while the circuit is open, and httpx.HTTPError (TimeoutException,
+        ConnectError, ...) when the service could not be reached.
+        """
+        circuit = self.circuit(service)
+        budget = self._budgets[service]
+        budget.deposit()
+        retries = self.retries if method.upper() in RETRYABLE_METHODS else 0
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                circuit.allow()
+            except ServiceUnavailable:
+                SERVICE_REQUEST_DURATION.labels(service, 'circuit_open').observe(time.monotonic() - start)
+                raise
+            try:
+                response = self._client.request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                outcome = 'timeout' if isinstance(e, httpx.TimeoutException) else 'network'
+                SERVICE_REQUEST_DURATION.labels(service, outcome).observe(time.monotonic() - start)
+                circuit.record(False)
+                if attempt < retries and budget.withdraw():
+                    attempt += 1
+                    self._backoff(service, attempt)
+                    continue
+                raise
+            healthy = response.status_code < 500
+            SERVICE_REQUEST_DURATION.labels(service, f"{response.status_code // 100}xx").observe(time.monotonic() - start)
+            circuit.record(healthy)
+            if response.status_code in RETRYABLE_STATUS and attempt < retries and budget.withdraw():
+                response.close()
+                attempt += 1
+                self._backoff(service, attempt)
+                continue
+            return response
+
+    def get(self, service: str, url: str, **kwargs) -> httpx.Response:
+        return self.request(service, 'GET', url, **kwargs)
+
+    def _backoff(self, service: str, attempt: int):
+        SERVICE_REQUEST_RETRIES.labels(service).inc()
+        time.sleep(self.retry_backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+    def close(self):
+        self._client.close()
+
+
+def get_client() -> ServiceClient:
+    return ServiceClient.get_client()
@@ -0,0 +1,173 @@
+"""
+Single-flight registry for scrapes, keyed by canonical URL.
+
+The first request for a URL becomes the leader: it records its task id under
+the URL's in-flight key and dispatches scrape_manga_info_task. Requests that
+arrive while that key exists join the URL's waiter list and get the leader's
+task id back. When the leader's scrape finishes it atomically clears the key
+and drains the waiters, then saves its result to every waiter's bookmark.
+"""
+from django.conf import settings
+from django_redis import get_redis_connection
+import json
+import uuid
+from .canonical import canonicalize_url
+from .task_events import watch_task, watch_tasks, unwatch_task
+
+# Clear the in-flight key and drain the waiters in one step, but only for the
+# task that owns the key, so a follower never joins a flight that has landed
+FINISH_SCRIPT = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] then
+    return false
+end
+local waiters = redis.call('lrange', KEYS[2], 0, -1)
+redis.call('del', KEYS[1], KEYS[2])
+return waiters
+"""
+
+# Keep a flight alive while its task is deferred, again only for its owner
+EXTEND_SCRIPT = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('expire', KEYS[1], ARGV[2])
+redis.call('expire', KEYS[2], ARGV[2])
+return 1
+"""
+
+
+def _inflight_key(canonical_url: str) -> str:
+    return f"scrape_inflight:{canonical_url}"
+
+
+def _waiters_key(canonical_url: str) -> str:
+    return f"scrape_waiters:{canonical_url}"
+
+
+def _lead_flight(connection, canonical_url: str, ttl: int, args: tuple, kwargs: dict = None, watcher=None, **options):
+    """Claim the URL's flight and dispatch its task; returns the task id, or None if already in flight"""
+    from .tasks import scrape_manga_info_task
+
+    task_id = str(uuid.uuid4())
+    if not connection.set(_inflight_key(canonical_url), task_id, nx=True, ex=ttl):
+        return None
+    try:
+        if watcher is not None:
+            watch_task(watcher, task_id, connection)
+        scrape_manga_info_task.apply_async(args, kwargs, task_id=task_id, **options)
+    except Exception:
+        finish_flight(canonical_url, task_id)  # Nobody will land this flight
+        raise
+    return task_id
+
+
+def dispatch_scrape(user_id: int, url: str, bookmark_id: str = None, import_job_id: str = None) -> str:
+    """
+    Start a scrape of `url` for a user's new bookmark (or refresh of
+    `bookmark_id`), or join the scrape of the same canonical URL that is
+    already running. `import_job_id` counts the outcome towards a bulk
+    import job either way. Returns the id of the task that will save the result.
+    """
+    canonical_url = canonicalize_url(url)
+    connection = get_redis_connection('default')
+    ttl = settings.SCRAPE_INFLIGHT_TTL
+    waiter = json.dumps({
+        'user_id': user_id, 'bookmark_id': bookmark_id, 'import_job_id': import_job_id, 'token': uuid.uuid4().hex
+    })
+    kwargs = {'import_job_id': import_job_id} if import_job_id else None
+
+    task_id = _lead_flight(connection, canonical_url, ttl, (user_id, url, bookmark_id), kwargs, watcher=user_id)
+    if task_id:
+        return task_id
+
+    leader_task_id = connection.get(_inflight_key(canonical_url))
+    if leader_task_id:
+        watch_task(user_id, leader_task_id.decode(), connection)
+        pipeline = connection.pipeline()
+        pipeline.rpush(_waiters_key(canonical_url), waiter)
+        pipeline.expire(_waiters_key(canonical_url), ttl)
+        pipeline.get(_inflight_key(canonical_url))
+        _, _, current_task_id = pipeline.execute()
+        if current_task_id == leader_task_id:
+            return leader_task_id.decode()
+        # The leader landed meanwhile. If it drained our entry it will still
+        # save our bookmark; otherwise take the entry back and scrape ourselves.
+        if not connection.lrem(_waiters_key(canonical_url), 1, waiter):
+            return leader_task_id.decode()
+        unwatch_task(user_id, leader_task_id.decode(), connection)
+
+    # No flight to join: lead one, or join whoever just beat us to it
+    return dispatch_scrape(user_id, url, bookmark_id, import_job_id)
+
+
+def dispatch_scrapes(user_id: int, urls, import_job_id: str = None) -> list:
+    """
+    dispatch_scrape for many URLs (distinct canonical URLs), e.g. those of a
+    bulk import. Their flights are claimed in one pipeline and every flight
+    won is sent as one Celery group (with `import_job_id` as its id); URLs
+    already in flight are joined one by one. Returns the task ids, in order.
+    """
+    from celery import group
+    from .tasks import scrape_manga_info_task
+
+    urls = list(urls)
+    connection = get_redis_connection('default')
+    ttl = settings.SCRAPE_INFLIGHT_TTL
+    kwargs = {'import_job_id': import_job_id} if import_job_id else None
+    task_ids = [str(uuid.uuid4()) for _ in urls]
+
+    pipeline = connection.pipeline()
+    for url, task_id in zip(urls, task_ids):
+        pipeline.set(_inflight_key(canonicalize_url(url)), task_id, nx=True, ex=ttl)
+    claimed = pipeline.execute()
+
+    led = [(url, task_id) for url, task_id, won in zip(urls, task_ids, claimed) if won]
+    if led:
+        try:
+            watch_tasks(user_id, [task_id for _, task_id in led], connection)
+            group(
+                scrape_manga_info_task.signature((user_id, url, None), kwargs, task_id=task_id)
+                for url, task_id in led
+            ).apply_async(task_id=import_job_id)
+        except Exception:
+            for url, task_id in led:
+                finish_flight(canonicalize_url(url), task_id)  # Nobody will land these flights
+            raise
+
+    return [
+        task_id if won else dispatch_scrape(user_id, url, import_job_id=import_job_id)
+        for url, task_id, won in zip(urls, task_ids, claimed)
+    ]
+
+
+def dispatch_background_refresh(canonical_url: str, countdown: float = 0, priority: int = None):
+    """
+    Start a background refresh of every bookmark of `canonical_url` unless a
+    scrape of it is already in flight. Users requesting the URL meanwhile
+    join the refresh. Returns the task id, or None if nothing was started.
+    """
+    connection = get_redis_connection('default')
+    ttl = settings.SCRAPE_INFLIGHT_TTL + int(countdown)
+    return _lead_flight(
+        connection, canonical_url, ttl, (None, canonical_url), {'background': True},
+        countdown=countdown, priority=priority
+    )
+
+
+def finish_flight(canonical_url: str, task_id: str) -> list:
+    """
+    Land the flight led by `task_id` and return its waiters as dicts with
+    `user_id`, `bookmark_id` and `import_job_id`. Tasks that do not lead a flight get [].
+    """
+    connection = get_redis_connection('default')
+    waiters = connection.eval(FINISH_SCRIPT, 2, _inflight_key(canonical_url), _waiters_key(canonical_url), task_id)
+    return [json.loads(waiter) for waiter in waiters or []]
+
+
+def extend_flight(canonical_url: str, task_id: str):
+    """Restart the TTL of the flight led by `task_id`, e.g. before the task is retried"""
+    connection = get_redis_connection('default')
+    connection.eval(
+        EXTEND_SCRIPT, 2, _inflight_key(canonical_url), _waiters_key(canonical_url),
+        task_id, settings.SCRAPE_INFLIGHT_TTL
+    )
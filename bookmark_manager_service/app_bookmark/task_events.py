@@ -0,0 +1,238 @@
+"""
+Live scrape task updates for the users waiting on them.
+
+dispatch_scrape registers every user who gets a task id back as a watcher of
+that task (a leader's user and single-flight waiters alike). The worker
+publishes the task's state transitions and stages with publish_task_event to
+the task's own user and its watchers: each event is stored as the task's
+latest state in each user's hash and published on that user's Redis channel.
+The task_events_stream view serves a user's channel as Server-Sent Events,
+starting with the stored states, so one connection replaces a status poll
+per pending task.
+
+EventSource cannot send an Authorization header, so the stream is opened with
+a short-lived one-time ticket (create_stream_ticket) obtained through the
+normal token authentication.
+
+Each open stream holds a web server thread for as long as it lasts, so a
+process serves at most TASK_EVENTS_MAX_STREAMS of them (open_stream) and
+keeps its other threads for the API; beyond that the stream is refused and
+the frontend polls instead.
+"""
+from django.conf import settings
+from django_redis import get_redis_connection
+import json
+import secrets
+import threading
+import time
+import logging
+from .timing import log_event
+
+logger = logging.getLogger(__name__)
+
+# Task states, as Celery names them, plus the intermediate stages of a scrape
+STATE_PENDING = 'PENDING'
+STATE_STARTED = 'STARTED'
+STATE_RETRY = 'RETRY'
+STATE_SUCCESS = 'SUCCESS'
+STATE_FAILURE = 'FAILURE'
+
+STAGE_QUEUED = 'queued'
+STAGE_SCRAPING = 'scraping'
+STAGE_SAVING = 'saving'
+STAGE_DEFERRED = 'deferred'
+STAGE_ESCALATED = 'escalated'
+STAGE_RETRYING = 'retrying'
+STAGE_DONE = 'done'
+
+# Redeem a ticket exactly once
+REDEEM_TICKET_SCRIPT = """
+local user_id = redis.call('get', KEYS[1])
+if user_id then
+    redis.call('del', KEYS[1])
+end
+return user_id
+"""
+
+
+def _watchers_key(task_id: str) -> str:
+    return f"task_watchers:{task_id}"
+
+
+def _states_key(user_id) -> str:
+    return f"task_states:{user_id}"
+
+
+def _channel(user_id) -> str:
+    return f"task_events:{user_id}"
+
+
+def _ticket_key(ticket: str) -> str:
+    return f"task_events_ticket:{ticket}"
+
+
+def _event(task_id: str, state: str, stage: str, fields: dict) -> dict:
+    return {'task_id': task_id, 'state': state, 'stage': stage, 'time': round(time.time(), 3), **fields}
+
+
+def watch_task(user_id, task_id: str, connection=None):
+    """Send `user_id` the events of `task_id`; a new task starts out PENDING/queued"""
+    watch_tasks(user_id, [task_id], connection)
+
+
+def watch_tasks(user_id, task_ids: list, connection=None):
+    """watch_task for many tasks in one round-trip, e.g. those of a bulk import"""
+    connection = connection or get_redis_connection('default')
+    ttl = settings.TASK_EVENTS_TTL
+    pipeline = connection.pipeline()
+    for task_id in task_ids:
+        pipeline.sadd(_watchers_key(task_id), user_id)
+        pipeline.expire(_watchers_key(task_id), ttl)
+        pipeline.hsetnx(_states_key(user_id), task_id, json.dumps(_event(task_id, STATE_PENDING, STAGE_QUEUED, {})))
+    pipeline.expire(_states_key(user_id), ttl)
+    pipeline.execute()
+
+
+def unwatch_task(user_id, task_id: str, connection=None):
+    """Undo watch_task, e.g. when the flight joined has already landed"""
+    connection = connection or get_redis_connection('default')
+    pipeline = connection.pipeline()
+    pipeline.srem(_watchers_key(task_id), user_id)
+    pipeline.hdel(_states_key(user_id), task_id)
+    pipeline.execute()
+
+
+def watches(user_id, task_ids: list, connection=None) -> list:
+    """Whether `user_id` watches each of `task_ids`, i.e. the task is theirs"""
+    connection = connection or get_redis_connection('default')
+    pipeline = connection.pipeline()
+    for task_id in task_ids:
+        pipeline.sismember(_watchers_key(task_id), user_id)
+    return [bool(is_member) for is_member in pipeline.execute()]
+
+
+def watching_users(task_id: str, connection=None) -> set:
+    """Ids of the users receiving events of `task_id`"""
+    connection = connection or get_redis_connection('default')
+    return {int(user_id) for user_id in connection.smembers(_watchers_key(task_id))}
+
+
+def publish_task_event(task_id: str, state: str, stage: str = None, owner=None, per_user: dict = None, **fields):
+    """
+    Record and publish a task event to the task's `owner` (the user it
+    scrapes for, if any) and every watcher of the task. `per_user`
+    maps a user id (as a string) to extra fields only that user receives,
+    e.g. the id of their own bookmark. Failures are logged, never raised:
+    a scrape must not fail because nobody could be told about it.
+    """
+    try:
+        connection = get_redis_connection('default')
+        users = watching_users(task_id, connection)
+        if owner is not None:
+            users.add(int(owner))
+        if not users:
+            return
+        ttl = settings.TASK_EVENTS_TTL
+        pipeline = connection.pipeline()
+        # A long-running (deferred, retried) task stays owned while it runs
+        pipeline.expire(_watchers_key(task_id), ttl)
+        for user_id in users:
+            event = _event(task_id, state, stage, {**fields, **(per_user or {}).get(str(user_id), {})})
+            payload = json.dumps(event, default=str)
+            pipeline.hset(_states_key(user_id), task_id, payload)
+            pipeline.expire(_states_key(user_id), ttl)
+            pipeline.publish(_channel(user_id), payload)
+        pipeline.execute()
+    except Exception as e:
+        log_event(logger, logging.ERROR, 'task_event_publish_failed', task_id=task_id, state=state, stage=stage, error=str(e))
+
+
+def task_states(user_id, connection=None) -> list:
+    """Latest recorded event of each of the user's recent tasks"""
+    connection = connection or get_redis_connection('default')
+    return [json.loads(payload) for payload in connection.hvals(_states_key(user_id))]
+
+
+def create_stream_ticket(user_id) -> str:
+    """A one-time ticket that opens `user_id`'s event stream within TASK_EVENTS_TICKET_TTL seconds"""
+    ticket = secrets.token_urlsafe(24)
+    get_redis_connection('default').set(_ticket_key(ticket), user_id, ex=settings.TASK_EVENTS_TICKET_TTL)
+    return ticket
+
+
+def redeem_stream_ticket(ticket: str):
+    """The user id a ticket was issued to, or None; a ticket works only once"""
+    if not ticket:
+        return None
+    user_id = get_redis_connection('default').eval(REDEEM_TICKET_SCRIPT, 1, _ticket_key(ticket))
+    return int(user_id) if user_id is not None else None
+
+
+def _sse(event: dict) -> str:
+    return f"event: task\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def stream_events(user_id):
+    """
+    Server-Sent Events of the user's tasks: the stored states first, then
+    every published event. Comments keep idle connections open, and the
+    stream ends after TASK_EVENTS_STREAM_SECONDS; EventSource then reconnects
+    (with a new ticket, see the frontend) and gets the current states again.
+    """
+    connection = get_redis_connection('default')
+    pubsub = connection.pubsub(ignore_subscribe_messages=True)
+    # Subscribe before reading the stored states, so no event falls in between
+    pubsub.subscribe(_channel(user_id))
+    try:
+        yield f"retry: {settings.TASK_EVENTS_RETRY_MS}\n\n"
+        for event in sorted(task_states(user_id, connection), key=lambda event: event['time']):
+            yield _sse(event)
+        deadline = time.monotonic() + settings.TASK_EVENTS_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=settings.TASK_EVENTS_KEEPALIVE)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            data = message['data']
+            yield _sse(json.loads(data.decode() if isinstance(data, bytes) else data))
+    finally:
+        pubsub.close()
+
+
+# Streams this process is serving
+_open_streams = 0
+_streams_lock = threading.Lock()
+
+
+class _SlotStream:
+    """Iterates a stream's events; closing it frees the stream slot"""
+
+    def __init__(self, events):
+        self._events = events
+        self._closed = False
+
+    def __iter__(self):
+        return self._events
+
+    def close(self):
+        global _open_streams
+        with _streams_lock:
+            if self._closed:
+                return
+            self._closed = True
+            _open_streams -= 1
+        self._events.close()
+
+
+def open_stream(user_id):
+    """
+    The user's event stream (stream_events), or None when this process already
+    serves TASK_EVENTS_MAX_STREAMS. The slot is freed when the stream is closed,
+    which the response does even if it never started streaming.
+    """
+    global _open_streams
+    with _streams_lock:
+        if _open_streams >= settings.TASK_EVENTS_MAX_STREAMS:
+            return None
+        _open_streams += 1
+    return _SlotStream(stream_events(user_id))
@@ -0,0 +1,86 @@
+"""
+Status of many scrape tasks at once.
+
+A task belongs to the users registered as its watchers (see task_events.py):
+whoever dispatched it, joined it through single-flight, or imported its URL.
+Watcher sets expire after TASK_EVENTS_TTL, so a finished scrape's result also
+names its users (owner_ids), and the result backend's copy of its arguments
+(CELERY_RESULT_EXTENDED) the user it was dispatched for; either lasts as long
+as the result. Watchers of every requested task are checked in one Redis
+pipeline, and the results are read from the Redis result backend with one MGET.
+"""
+from celery import current_app
+from celery.backends.base import KeyValueStoreBackend
+from celery.result import AsyncResult
+from celery import states
+from .task_events import watches
+
+SCRAPE_TASK_NAME = 'app_bookmark.tasks.scrape_manga_info_task'
+
+
+def result_owner_ids(meta) -> set:
+    """Ids (as strings) of the users a scrape's stored result belongs to"""
+    if meta is None or meta.get('name') not in (None, SCRAPE_TASK_NAME):
+        return set()
+    owners = set()
+    result = meta.get('result')
+    if isinstance(result, dict):
+        owners.update(str(owner) for owner in result.get('owner_ids') or ())
+    if meta.get('name') == SCRAPE_TASK_NAME and meta.get('args'):
+        owners.add(str(meta['args'][0]))
+    return owners
+
+
+def _task_metas(task_ids: list) -> list:
+    """Result backend metadata of each task ({'status': ..., 'result': ...}), or None if unknown"""
+    backend = current_app.backend
+    if isinstance(backend, KeyValueStoreBackend):
+        keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+        values = backend.mget(keys)
+        if hasattr(values, 'items'):
+            # Memcached-style clients return {key: value} without missing keys
+            values = [values.get(key) for key in keys]
+        return [backend.decode_result(value) if value else None for value in values]
+    # Other backends have no multi-get
+    metas = []
+    for task_id in task_ids:
+        result = AsyncResult(task_id)
+        metas.append({'status': result.status, 'result': result.result if result.ready() else None})
+    return metas
+
+
+def task_status_entry(user_id, meta: dict) -> dict:
+    """Compact status of one task for `user_id`: state, and once done, the outcome and their bookmark"""
+    if meta is None:
+        return {'status': states.PENDING}
+    entry = {'status': meta['status']}
+    result = meta.get('result')
+    if meta['status'] == states.SUCCESS and isinstance(result, dict):
+        bookmark_ids = result.get('bookmark_ids') or {}
+        entry['success'] = bool(result.get('success'))
+        # Only the user's own bookmark; a waiter never sees the bookmark of the user who led the scrape
+        entry['bookmark_id'] = bookmark_ids.get(str(user_id))
+        if result.get('error'):
+            entry['error'] = result['error']
+    elif meta['status'] == states.FAILURE:
+        entry['success'] = False
+    return entry
+
+
+def get_task_statuses(user_id, task_ids: list) -> dict:
+    """
+    {'tasks': {task id: status entry}, 'not_found': [task id, ...]} for the
+    requested tasks; tasks that do not belong to the user count as not found
+    """
+    task_ids = list(dict.fromkeys(task_ids))
+    if not task_ids:
+        return {'tasks': {}, 'not_found': []}
+    watched = watches(user_id, task_ids)
+    metas = _task_metas(task_ids)
+    tasks, not_found = {}, []
+    for task_id, is_watcher, meta in zip(task_ids, watched, metas):
+        if is_watcher or str(user_id) in result_owner_ids(meta):
+            tasks[task_id] = task_status_entry(user_id, meta)
+        else:
+            not_found.append(task_id)
+    return {'tasks': tasks, 'not_found': not_found}
@@ -1,57 +1,187 @@
-from celery import shared_task
-from .scrapers import get_scraper_for_url
-from .models import Bookmark, SupportedSite, ScrapingLog
+from celery import shared_task, states
+from celery.signals import task_prerun, task_postrun
+from .scrapers import get_scraper_ref_for_url, get_site_name_for_url, get_engine_for_url, TierEscalation
+from .scrapers.failures import classify_failure, retry_countdown, TRANSIENT_FAILURES, SITE_HEALTH_FAILURES
+from .models import Bookmark, SupportedSite, ScrapingLog, ThumbnailBlob
+from .canonical import canonicalize_url
+from .scrape_cache import get_fresh_entry, result_from_entry, store_result
+from .thumbnails import store_thumbnail, generate_derivatives, collect_garbage
+from .bulk_import import record_import_progress
+from .singleflight import finish_flight, extend_flight, dispatch_background_refresh
+from .rate_limit import ScrapeDeferred, RateLimited, scrape_slot, record_deferral
+from .circuit_breaker import check_circuit, record_outcome
+from .refresh import select_stale_urls, apply_background_refresh
+from .metrics import observe_scrape, TASK_DURATION
+from .task_events import (
+    publish_task_event, STATE_STARTED, STATE_RETRY, STATE_SUCCESS, STATE_FAILURE,
+    STAGE_SCRAPING, STAGE_SAVING, STAGE_DEFERRED, STAGE_ESCALATED, STAGE_RETRYING, STAGE_DONE,
+)
+from .timing import start_timings, stop_timings, span, current_timings, log_timings, log_event, STAGE_FILE_WRITE, STAGE_CACHE_WRITE, STAGE_DB_TRANSACTION
 from django.db import transaction
-from urllib.parse import urlparse, urlunparse
+from django.conf import settings
+from urllib.parse import urlparse
+import logging
+import random
 import time
-import re
 
-# Helper function to shorten Hitomi.la URLs
-def shorten_hitomi_url(original_url: str) -> str:
+logger = logging.getLogger(__name__)
+
+@shared_task(bind=True)
+def scrape_manga_info_task(self, user_id, submitted_url, bookmark_id=None, import_job_id=None, start_tier=None, background=False, attempt=0,
+                           deferrals=0, reserved_at=None, partial=None):
+    # import_job_id is only read by count_import_progress once the task has finished.
+    # start_tier skips cheaper tiers that already ran on another queue (see routing.py);
+    # partial holds the title and cover URL they found (see ScrapingEngine).
+    # background refreshes every bookmark of the URL instead of one user's (see refresh.py).
+    # attempt counts retries after transient failures, deferrals the waits for an open circuit.
+    # reserved_at is the task's turn in the site's rate limit queue (see rate_limit.py).
+    # Determine the canonical URL that should be stored in the database
+    canonical_db_url = canonicalize_url(submitted_url)
+    start_timings(self.request.id)
+
+    task_kwargs = {
+        'bookmark_id': bookmark_id, 'import_job_id': import_job_id,
+        'start_tier': start_tier, 'background': background, 'attempt': attempt,
+        'deferrals': deferrals, 'reserved_at': None, 'partial': partial,
+    }
+    publish_task_event(self.request.id, STATE_STARTED, STAGE_SCRAPING, owner=user_id, tier=start_tier, attempt=attempt)
+    try:
+        scraped, error_response = _scrape(
+            submitted_url, canonical_db_url, bookmark_id, start_tier, use_cache=not background, reserved_at=reserved_at,
+            partial=partial,
+        )
+    except TierEscalation as e:
+        publish_task_event(self.request.id, STATE_RETRY, STAGE_ESCALATED, owner=user_id, tier=e.tier)
+        raise _requeue(self, canonical_db_url, (user_id, submitted_url), {**task_kwargs, 'start_tier': e.tier, 'partial': e.partial}, 0, e.queue)
+    except RateLimited as e:
+        # Wait for the task's turn in the site's queue, in the broker rather than on a
+        # worker. Being rate limited never fails a scrape; the queue only spreads it out.
+        if reserved_at is None:
+            record_deferral(e.domain)
+        # Long waits are split so no countdown outlives the broker's visibility timeout
+        countdown = min(e.retry_after, settings.SCRAPER_MAX_DEFER_SECONDS) + random.uniform(0, 1)
+        publish_task_event(self.request.id, STATE_RETRY, STAGE_DEFERRED, owner=user_id, retry_in=round(e.retry_after, 1))
+        raise _requeue(self, canonical_db_url, (user_id, submitted_url), {**task_kwargs, 'reserved_at': e.reserved_at}, countdown)
+    except ScrapeDeferred as e:
+        # Circuit open: wait for the site to recover, a bounded number of times
+        if deferrals < settings.SCRAPER_MAX_DEFERRALS:
+            record_deferral(e.domain)
+            countdown = e.retry_after + random.uniform(0, 1)
+            publish_task_event(self.request.id, STATE_RETRY, STAGE_DEFERRED, owner=user_id, retry_in=round(countdown, 1))
+            raise _requeue(self, canonical_db_url, (user_id, submitted_url), {**task_kwargs, 'deferrals': deferrals + 1}, countdown)
+        # Out of deferrals: the requests that joined this flight fail with it. Their
+        # watchers get this result through publish_task_outcome like the leader's.
+        waiters = finish_flight(canonical_db_url, self.request.id)
+        _fail_waiters(waiters)
+        ScrapingLog.objects.create(url=canonical_db_url, status='FAILED', error_message=str(e), timings=current_timings())
+        log_timings(canonical_db_url, task_id=self.request.id, status='DEFERRED', waiters=len(waiters))
+        return _with_owners({"success": False, "error": str(e), "bookmark_id": None, "bookmark_ids": {}}, user_id, waiters)
+    except Exception:
+        _fail_waiters(finish_flight(canonical_db_url, self.request.id))
+        raise
+
+    if scraped and scraped['result'].failure_type in TRANSIENT_FAILURES and attempt < settings.SCRAPER_MAX_RETRIES:
+        # Exponential backoff with jitter, retrying from the tier that failed
+        result = scraped['result']
+        countdown = retry_countdown(attempt)
+        retry_kwargs = {**task_kwargs, 'start_tier': result.tier, 'attempt': attempt + 1}
+        queue = get_engine_for_url(submitted_url).queue_for(result.tier)
+        log_timings(
+            canonical_db_url, task_id=self.request.id, tier=result.tier, status='RETRY',
+            failure_type=result.failure_type, attempt=attempt + 1, retry_in=round(countdown, 1)
+        )
+        observe_scrape(scraped['site'].domain, result.scraper, result.failure_type, scraped['scraping_duration'], current_timings())
+        publish_task_event(
+            self.request.id, STATE_RETRY, STAGE_RETRYING, owner=user_id,
+            tier=result.tier, failure_type=result.failure_type, retry_in=round(countdown, 1)
+        )
+        raise _requeue(self, canonical_db_url, (user_id, submitted_url), retry_kwargs, countdown, queue)
+
+    # Requests for the same URL that joined this task's flight (see singleflight.py)
+    waiters = finish_flight(canonical_db_url, self.request.id)
+    if error_response:
+        _fail_waiters(waiters)
+        return _with_owners(error_response, user_id, waiters)
+
+    changed = scraped.pop('changed')
+    result = scraped['result']
+    publish_task_event(self.request.id, STATE_STARTED, STAGE_SAVING, owner=user_id, tier=result.tier)
+    if background:
+        response = apply_background_refresh(canonical_db_url, changed=changed, **scraped)
+        bookmark_ids = {}
+    else:
+        response = save_scrape_result(user_id, bookmark_id, canonical_db_url, **scraped)
+        bookmark_ids = {str(user_id): response["bookmark_id"]}
+    for waiter in waiters:
+        try:
+            waiter_response = save_scrape_result(waiter['user_id'], waiter['bookmark_id'], canonical_db_url, **scraped)
+        except Exception as e:
+            log_event(
+                logger, logging.ERROR, 'waiter_save_failed',
+                url=canonical_db_url, task_id=self.request.id, user_id=waiter['user_id'], error=str(e)
+            )
+            _record_waiter_import(waiter, False)
+            continue
+        _record_waiter_import(waiter, waiter_response["success"])
+        bookmark_ids.setdefault(str(waiter['user_id']), waiter_response["bookmark_id"])
+    response["bookmark_ids"] = bookmark_ids
+    log_timings(
+        canonical_db_url, task_id=self.request.id, tier=result.tier,
+        status='SUCCESS' if result.success else 'FAILED', failure_type=result.failure_type,
+        background=background, waiters=len(waiters), total=round(scraped['scraping_duration'], 3)
+    )
+    observe_scrape(
+        scraped['site'].domain, result.scraper or result.tier,
+        'success' if result.success else result.failure_type, scraped['scraping_duration'], current_timings()
+    )
+    return _with_owners(response, user_id, waiters)
+
+def _with_owners(response, user_id, waiters):
     """
-    Shortens a Hitomi.la URL to its essential parts if it matches the common pattern.
-    Example: https://hitomi.la/doujinshi/long-title-here-12345.html#1
-    Becomes: https://hitomi.la/doujinshi/-12345.html#1
-    Otherwise, returns the original URL.
+    Name the users the result belongs to (the task's and its waiters'), so
+    task_status.py can tell them after their watcher sets have expired
     """
-    parsed_url = urlparse(original_url)
-    # Check if the domain is hitomi.la or www.hitomi.la
-    if parsed_url.netloc.endswith('hitomi.la'):
-        path = parsed_url.path
-        # Regex to find:
-        # 1. base_path: The content type part like "/doujinshi/" or "/manga/"
-        # 2. slug: The descriptive (long) part of the URL slug.
-        # 3. id_part: The crucial "-<numbers>.html" part at the end of the path.
-        match = re.match(r'(?P<base_path>/[^/]+/)(?P<slug>.*?)(?P<id_part>-\d+\.html)$', path)
-        if match:
-            # Reconstruct path with only base_path and id_part
-            new_path = match.group('base_path') + match.group('id_part')
-            # Reconstruct the full URL with the new path, preserving other components
-            return urlunparse((
-                parsed_url.scheme,
-                parsed_url.netloc,
-                new_path,
-                '',
-                '',
-                parsed_url.fragment
-            ))
-    return original_url # Return original if not a matching Hitomi.la URL or pattern mismatch
+    response["owner_ids"] = sorted({user_id, *(waiter['user_id'] for waiter in waiters)} - {None})
+    return response
 
-@shared_task
-def scrape_manga_info_task(user_id, submitted_url, bookmark_id=None):
-    url_for_scraping = submitted_url
-    # Determine the canonical URL that should be stored in the database
-    canonical_db_url = shorten_hitomi_url(submitted_url)
-    print(f"DEBUG: Original submitted URL: {submitted_url}")
-    print(f"DEBUG: Canonical DB URL determined: {canonical_db_url}")
+def _record_waiter_import(waiter, succeeded):
+    """Count a waiter's outcome towards its bulk import job, if it came from one"""
+    if waiter.get('import_job_id'):
+        record_import_progress(waiter['import_job_id'], succeeded)
+
+def _fail_waiters(waiters):
+    """The flight ended without a result: count it as failed for the waiters' import jobs"""
+    for waiter in waiters:
+        _record_waiter_import(waiter, False)
 
-    scraper_class = get_scraper_for_url(url_for_scraping)
-    if not scraper_class:
+def _requeue(task, canonical_db_url, args, kwargs, countdown, queue=None):
+    """
+    Retry the running scrape with new arguments under the same task id, so
+    single-flight waiters and status pollers keep following it. Callers bound
+    the number of re-queues themselves.
+    """
+    extend_flight(canonical_db_url, task.request.id)
+    return task.retry(
+        args=args, kwargs=kwargs, countdown=countdown, queue=queue,
+        max_retries=task.request.retries + 1
+    )
+
+def _scrape(url_for_scraping, canonical_db_url, bookmark_id, start_tier=None, use_cache=True, reserved_at=None, partial=None):
+    """
+    Scrape (or read from the scrape cache) the page at `url_for_scraping`.
+    Returns (scraped, None) where scraped holds the keyword arguments of
+    save_scrape_result plus `changed` (whether the title or cover differ from
+    the cached ones), or (None, task response) if the URL cannot be scraped.
+    Raises TierEscalation when the remaining tiers run on another queue, and
+    ScrapeDeferred when the site's rate limit or circuit breaker holds it back.
+    """
+    scraper_ref = get_scraper_ref_for_url(url_for_scraping)
+    if not scraper_ref:
         ScrapingLog.objects.create(
             url=canonical_db_url, status='FAILED',
             error_message="Unsupported site (task level check)"
         )
-        return {"success": False, "error": "Unsupported site", "bookmark_id": None}
+        return None, {"success": False, "error": "Unsupported site", "bookmark_id": None}
 
     parsed_canonical_url = urlparse(canonical_db_url)
     domain_for_site_model = parsed_canonical_url.netloc.lower()
@@ -63,8 +193,8 @@ def scrape_manga_info_task(user_id, submitted_url, bookmark_id=None):
         site, _ = SupportedSite.objects.get_or_create(
             domain=domain_for_site_model,
             defaults={
-                'name': scraper_class().get_site_name(),
-                'scraper_class': scraper_class.__name__
+                'name': get_site_name_for_url(url_for_scraping),
+                'scraper_class': scraper_ref.name
             }
         )
     except Exception as e:
@@ -72,14 +202,50 @@ def scrape_manga_info_task(user_id, submitted_url, bookmark_id=None):
             url=canonical_db_url, status='ERROR',
             error_message=f"Failed to get/create SupportedSite: {str(e)}"
         )
-        return {"success": False, "error": f"Internal error with site configuration: {str(e)}", "bookmark_id": None}
+        return None, {"success": False, "error": f"Internal error with site configuration: {str(e)}", "bookmark_id": None}
+
+    # Refreshes accept only a recent cache entry; new bookmarks accept any fresh one
+    max_cache_age = settings.SCRAPE_CACHE_REFRESH_TTL if bookmark_id else settings.SCRAPE_CACHE_TTL
+    # An escalated task already missed the cache
+    cache_entry = None
+    if use_cache and not start_tier:
+        cache_entry = get_fresh_entry(canonical_db_url, max_cache_age)
 
-    scraper = scraper_class()
     start_time = time.time()
-    result = scraper.scrape_manga_info(url_for_scraping)
+    thumbnail_blob = None
+    changed = False
+    if cache_entry:
+        result = result_from_entry(cache_entry)
+        thumbnail_blob = cache_entry.thumbnail_blob
+    else:
+        # Raise ScrapeDeferred while the site is failing or its request budget is spent
+        check_circuit(site.domain)
+        with scrape_slot(site, reserved_at):
+            result = get_engine_for_url(url_for_scraping).scrape(url_for_scraping, start_tier, partial)
+        result.failure_type = classify_failure(result)
+        record_outcome(site.domain, result.failure_type not in SITE_HEALTH_FAILURES)
+        if result.thumbnail_data:
+            # Content-addressed: an unchanged cover is not written again
+            with span(STAGE_FILE_WRITE):
+                thumbnail_blob = store_thumbnail(result.thumbnail_data)
+            if not thumbnail_blob.derivatives.exists():
+                generate_thumbnail_derivatives_task.delay(thumbnail_blob.id)
+        with span(STAGE_CACHE_WRITE):
+            changed = store_result(canonical_db_url, site, result, thumbnail_blob)
     scraping_duration = time.time() - start_time
 
-    with transaction.atomic():
+    scraped = {
+        'site': site,
+        'result': result,
+        'thumbnail_blob': thumbnail_blob,
+        'scraping_duration': scraping_duration,
+        'changed': changed,
+    }
+    return scraped, None
+
+def save_scrape_result(user_id, bookmark_id, canonical_db_url, site, result, thumbnail_blob, scraping_duration):
+    """Create the user's bookmark (or update `bookmark_id`) from a scrape and log it"""
+    with span(STAGE_DB_TRANSACTION, accumulate=False), transaction.atomic():
         bookmark_to_save = None
         log_status = 'SUCCESS' if result.success else 'FAILED'
         log_error_message = result.error_message
@@ -102,7 +268,11 @@ def scrape_manga_info_task(user_id, submitted_url, bookmark_id=None):
                 ScrapingLog.objects.create(
                     url=canonical_db_url, status=log_status,
                     error_message=log_error_message,
-                    scraping_duration=scraping_duration
+                    scraping_duration=scraping_duration,
+                    ready_wait_duration=result.ready_wait,
+                    tier=result.tier,
+                    failure_type=result.failure_type,
+                    timings=current_timings()
                 )
                 return {"success": False, "error": log_error_message, "bookmark_id": None}
         else:
@@ -124,14 +294,12 @@ def scrape_manga_info_task(user_id, submitted_url, bookmark_id=None):
             if result.thumbnail_url:
                 bookmark_to_save.thumbnail_url = result.thumbnail_url
             
-            if result.thumbnail_data:
+            if thumbnail_blob:
                 if bookmark_to_save.thumbnail:
+                    # Drop the legacy per-user copy now that the blob replaces it
                     bookmark_to_save.thumbnail.delete(save=False)
-                thumbnail_file_name = f"thumbnail_{bookmark_to_save.id}.jpg" 
-                thumbnail_file = scraper.create_thumbnail_file(result.thumbnail_data, thumbnail_file_name)
-                bookmark_to_save.thumbnail.save(thumbnail_file.name, thumbnail_file, save=False)
+                bookmark_to_save.thumbnail_blob = thumbnail_blob
             
-            print(f"DEBUG: Final URL to be saved for bookmark ID {bookmark_to_save.id if bookmark_to_save.id else 'NEW'}: {bookmark_to_save.url}")
             bookmark_to_save.save()
 
             ScrapingLog.objects.create(
@@ -139,7 +307,11 @@ def scrape_manga_info_task(user_id, submitted_url, bookmark_id=None):
                 url=canonical_db_url, 
                 status=log_status,
                 error_message=log_error_message,
-                scraping_duration=scraping_duration
+                scraping_duration=scraping_duration,
+                ready_wait_duration=result.ready_wait,
+                tier=result.tier,
+                failure_type=result.failure_type,
+                timings=current_timings()
             )
             return {
                 "success": result.success and log_status != 'ERROR',
@@ -151,6 +323,86 @@ def scrape_manga_info_task(user_id, submitted_url, bookmark_id=None):
             ScrapingLog.objects.create(
                 url=canonical_db_url, status='ERROR',
                 error_message="Failed to determine bookmark for saving.",
-                scraping_duration=scraping_duration
+                scraping_duration=scraping_duration,
+                ready_wait_duration=result.ready_wait,
+                tier=result.tier,
+                failure_type=result.failure_type,
+                timings=current_timings()
             )
-            return {"success": False, "error": "Failed to determine bookmark for saving.", "bookmark_id": None}
\ No newline at end of file
+            return {"success": False, "error": "Failed to determine bookmark for saving.", "bookmark_id": None}
+
+_task_started = {}
+
+@task_prerun.connect
+def start_task_timer(task_id=None, **extra):
+    _task_started[task_id] = time.monotonic()
+
+@task_postrun.connect
+def observe_task_duration(sender=None, task_id=None, state=None, **extra):
+    started = _task_started.pop(task_id, None)
+    if sender is not None and started is not None:
+        TASK_DURATION.labels(sender.name, state or 'UNKNOWN').observe(time.monotonic() - started)
+
+@task_postrun.connect
+def count_import_progress(sender=None, kwargs=None, retval=None, state=None, **extra):
+    """Count finished scrapes that belong to a bulk import job (see bulk_import.py)"""
+    if sender is None or sender.name != scrape_manga_info_task.name:
+        return
+    import_job_id = (kwargs or {}).get('import_job_id')
+    if import_job_id and state in (states.SUCCESS, states.FAILURE):
+        succeeded = state == states.SUCCESS and bool(retval and retval.get('success'))
+        record_import_progress(import_job_id, succeeded)
+
+@task_postrun.connect
+def publish_task_outcome(sender=None, task_id=None, args=None, retval=None, state=None, **extra):
+    """Tell the task's users how a scrape ended, each with the id of their own bookmark"""
+    if sender is None or sender.name != scrape_manga_info_task.name or state not in (states.SUCCESS, states.FAILURE):
+        return
+    owner = args[0] if args else None
+    if state == states.FAILURE:
+        publish_task_event(task_id, STATE_FAILURE, STAGE_DONE, owner=owner, success=False, error="Scraping failed")
+        return
+    bookmark_ids = retval.get('bookmark_ids') or {}
+    publish_task_event(
+        task_id, STATE_SUCCESS, STAGE_DONE, owner=owner,
+        per_user={user: {'bookmark_id': bookmark_id} for user, bookmark_id in bookmark_ids.items()},
+        success=bool(retval.get('success')), error=retval.get('error'),
+    )
+
+@task_postrun.connect
+def clear_task_timings(**extra):
+    """Runs after the handlers above, which may still log under the task's id"""
+    stop_timings()
+
+@shared_task
+def refresh_stale_bookmarks_task():
+    """
+    Periodic (celery beat): queue low-priority background refreshes of the
+    stalest bookmarked URLs, spread evenly over the refresh interval
+    """
+    urls = select_stale_urls(settings.BACKGROUND_REFRESH_BUDGET)
+    spacing = settings.BACKGROUND_REFRESH_INTERVAL / max(len(urls), 1)
+    started = 0
+    for index, url in enumerate(urls):
+        if dispatch_background_refresh(url, countdown=index * spacing, priority=settings.BACKGROUND_REFRESH_PRIORITY):
+            started += 1
+    return {"success": True, "selected": len(urls), "started": started}
+
+@shared_task
+def collect_thumbnail_garbage_task():
+    """Periodic (celery beat): delete thumbnail blobs nobody references any more"""
+    deleted = collect_garbage(settings.THUMBNAIL_GC_GRACE_SECONDS)
+    return {"success": True, "deleted": deleted}
+
+@shared_task
+def generate_thumbnail_derivatives_task(blob_id):
+    """Post-scrape stage: write the resized WebP/JPEG derivatives of a stored cover"""
+    blob = ThumbnailBlob.objects.filter(id=blob_id).first()
+    if not blob:
+        return {"success": False, "error": "Thumbnail blob not found"}
+    try:
+        written = generate_derivatives(blob)
+    except Exception as e:
+        log_event(logger, logging.ERROR, 'thumbnail_derivatives_failed', blob=blob.sha256, error=str(e))
+        return {"success": False, "error": str(e)}
+    return {"success": True, "derivatives_written": written}
\ No newline at end of file
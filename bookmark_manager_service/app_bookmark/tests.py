@@ -1,3 +1,1058 @@
-from django.test import TestCase
+from celery.signals import task_postrun
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, override_settings
+from django.conf import settings
+from django.urls import reverse
+from django_redis import get_redis_connection
+from prometheus_client import REGISTRY
+from types import SimpleNamespace
+from unittest import mock
+from lxml import html as lxml_html
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import httpx
+import logging
+import redis
+from rest_framework.test import APIRequestFactory, force_authenticate
+from . import access_tokens, rate_limit, scrape_cache, service_client, singleflight, task_events, task_status, tasks, timing, thumbnails, token_cache, views
+from .authentication import SimpleAuthenticatedUser
+from .benchmark import FixtureSite, FixtureServer, FIXTURES_DIR
+from .scrapers import ScraperRef, QUEUE_HTTP, QUEUE_BROWSER
+from .scrapers.base import ScrapingResult
+from .scrapers.failures import (
+    classify_failure, retry_countdown, FAILURE_TIMEOUT, FAILURE_BLOCKED, FAILURE_SELECTOR_MISSING,
+    FAILURE_NETWORK, FAILURE_BROWSER_UNAVAILABLE, FAILURE_UNKNOWN, TRANSIENT_FAILURES, SITE_HEALTH_FAILURES,
+)
+from .canonical import canonicalize_url
+from .scrapers.bato import BatoScraper
+from .scrapers.engine import ScrapingEngine, TierEscalation, TIER_HTTP, TIER_BROWSER
+from .scrapers.http_tier import BatoHttpScraper, HitomiHttpScraper
+from .scrapers.extraction import Candidate, ExtractionSpec
+from .scrapers.selectors import BATO_PAGE, OPENGRAPH, HITOMI_GALLERY_BLOCK
+from .scrapers.page_profile import PageLoadProfile, RESOURCE_PATTERNS, TRACKER_PATTERNS
+from .scrapers import webdriver_manager
 
-# Create your tests here.
+
+class TitleOnlyScraper:
+    """Stands in for an HTTP tier that found the title but no cover"""
+
+    def scrape_manga_info(self, url):
+        return ScrapingResult(title='Partial', success=True)
+
+
+class CoverOnlyScraper:
+    """Stands in for a browser tier that found the cover but not the title"""
+
+    def scrape_manga_info(self, url):
+        return ScrapingResult(thumbnail_url=url + '/cover.jpg', thumbnail_data=b'jpeg', success=True)
+
+
+class FailingScraper:
+    """Stands in for a tier that found nothing"""
+
+    def scrape_manga_info(self, url):
+        return ScrapingResult(success=False, error_message='Page load timeout')
+
+
+class CompleteScraper:
+    """Stands in for a browser tier that found everything"""
+
+    def scrape_manga_info(self, url):
+        return ScrapingResult(title='Full', thumbnail_url=url + '/cover.jpg', thumbnail_data=b'jpeg', success=True)
+
+
+class RecordingDriver:
+    """Records the DevTools commands a page load profile sends"""
+
+    def __init__(self):
+        self.commands = []
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+
+
+def _ref(name, queue):
+    return ScraperRef(f'app_bookmark.tests.{name}', queue)
+
+
+class HttpTierTests(SimpleTestCase):
+    """HTTP tier scrapers against the recorded benchmark pages"""
+
+    def _scrape(self, domain, scraper_class):
+        site = FixtureSite(domain)
+        with FixtureServer(site) as server, override_settings(SCRAPER_HOST_OVERRIDES={domain: server.origin}):
+            return scraper_class().scrape_manga_info(site.url(1)), server.requests
+
+    def test_bato_page_and_cover(self):
+        result, requests = self._scrape('bato.to', BatoHttpScraper)
+        self.assertTrue(result.success)
+        self.assertEqual(result.title, 'Benchmark Series')
+        self.assertEqual(result.thumbnail_url, 'https://bato.to/media/covers/benchmark-series.jpg')
+        self.assertTrue(result.thumbnail_data)
+        self.assertEqual(requests, 2)
+
+    def test_hitomi_page_and_cover(self):
+        result, _ = self._scrape('hitomi.la', HitomiHttpScraper)
+        self.assertTrue(result.success)
+        self.assertTrue(result.title.startswith('Benchmark Gallery'))
+        self.assertTrue(result.thumbnail_url.startswith('https://tn.hitomi.la/'))
+        self.assertTrue(result.thumbnail_data)
+
+
+class ScrapingEngineTests(SimpleTestCase):
+
+    def test_complete_http_result_skips_browser(self):
+        engine = ScrapingEngine([
+            (TIER_HTTP, _ref('CompleteScraper', QUEUE_HTTP)),
+            (TIER_BROWSER, _ref('TitleOnlyScraper', QUEUE_HTTP)),
+        ])
+        result = engine.scrape('https://bato.to/series/1')
+        self.assertEqual((result.tier, result.scraper), (TIER_HTTP, 'CompleteScraper'))
+
+    def test_incomplete_http_result_falls_back_to_browser(self):
+        engine = ScrapingEngine([
+            (TIER_HTTP, _ref('TitleOnlyScraper', QUEUE_HTTP)),
+            (TIER_BROWSER, _ref('CompleteScraper', QUEUE_HTTP)),
+        ])
+        result = engine.scrape('https://bato.to/series/1')
+        self.assertEqual((result.tier, result.title), (TIER_BROWSER, 'Full'))
+
+    def test_browser_tier_on_another_queue_escalates(self):
+        engine = ScrapingEngine([
+            (TIER_HTTP, _ref('TitleOnlyScraper', QUEUE_HTTP)),
+            (TIER_BROWSER, _ref('CompleteScraper', QUEUE_BROWSER)),
+        ])
+        with self.assertRaises(TierEscalation) as raised:
+            engine.scrape('https://bato.to/series/1')
+        self.assertEqual((raised.exception.tier, raised.exception.queue), (TIER_BROWSER, QUEUE_BROWSER))
+        self.assertEqual(raised.exception.partial, {'title': 'Partial'})
+        self.assertEqual(engine.queue_for(TIER_BROWSER), QUEUE_BROWSER)
+
+    def test_escalated_tier_keeps_the_partial_fields(self):
+        engine = ScrapingEngine([
+            (TIER_HTTP, _ref('TitleOnlyScraper', QUEUE_HTTP)),
+            (TIER_BROWSER, _ref('CoverOnlyScraper', QUEUE_BROWSER)),
+        ])
+        result = engine.scrape('https://bato.to/series/1', TIER_BROWSER, partial={'title': 'Partial'})
+        self.assertEqual(
+            (result.tier, result.title, result.thumbnail_data, result.success), (TIER_BROWSER, 'Partial', b'jpeg', True)
+        )
+
+        engine.tiers[1] = (TIER_BROWSER, _ref('FailingScraper', QUEUE_BROWSER))
+        result = engine.scrape('https://bato.to/series/1', TIER_BROWSER, partial={'title': 'Partial'})
+        self.assertEqual((result.title, result.success, result.error_message), ('Partial', True, None))
+
+    def test_tiers_on_one_queue_combine_their_fields(self):
+        engine = ScrapingEngine([
+            (TIER_HTTP, _ref('TitleOnlyScraper', QUEUE_HTTP)),
+            (TIER_BROWSER, _ref('CoverOnlyScraper', QUEUE_HTTP)),
+        ])
+        result = engine.scrape('https://bato.to/series/1')
+        self.assertEqual((result.tier, result.title, result.thumbnail_data), (TIER_BROWSER, 'Partial', b'jpeg'))
+
+    def test_best_partial_result_when_no_tier_completes(self):
+        engine = ScrapingEngine([
+            (TIER_HTTP, _ref('TitleOnlyScraper', QUEUE_HTTP)),
+            (TIER_BROWSER, _ref('TitleOnlyScraper', QUEUE_HTTP)),
+        ])
+        result = engine.scrape('https://bato.to/series/1')
+        self.assertEqual((result.tier, result.title), (TIER_BROWSER, 'Partial'))
+
+
+class FakeChromeDriver:
+    """A driver the pool can health-check and quit; `crashed` makes it stop answering"""
+
+    def __init__(self):
+        self.crashed = False
+        self.quit_called = False
+
+    def execute_script(self, script):
+        if self.crashed:
+            raise ConnectionRefusedError('chrome not reachable')
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+class WebDriverPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.created = []
+
+        def create_driver():
+            self.created.append(FakeChromeDriver())
+            return self.created[-1]
+
+        patcher = mock.patch.object(webdriver_manager, 'create_chrome_driver', side_effect=create_driver)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = webdriver_manager.WebDriverPool(size=1, lease_timeout=0.05, max_pages=50, max_rss_mb=0)
+        self.addCleanup(self.pool.close)
+
+    def test_exhausted_pool_times_out(self):
+        with self.pool.lease() as driver:
+            with self.assertRaises(webdriver_manager.DriverLeaseTimeout):
+                with self.pool.lease():
+                    pass
+        # Returned to the pool and leased again, not started anew
+        with self.pool.lease() as again:
+            self.assertIs(again, driver)
+        stats = self.pool.stats()
+        self.assertEqual((stats['lease_timeouts_total'], stats['leases_total'], stats['drivers_created_total']), (1, 2, 1))
+
+    def test_crashed_driver_is_replaced(self):
+        with self.pool.lease() as driver:
+            pass
+        driver.crashed = True
+        with self.pool.lease() as replacement:
+            self.assertIsNot(replacement, driver)
+        self.assertTrue(driver.quit_called)
+        self.assertEqual(len(self.created), 2)
+        self.assertEqual(self.pool.stats()['drivers_recycled_total']['unhealthy'], 1)
+
+    def test_driver_is_discarded_after_a_failed_lease(self):
+        with self.assertRaises(RuntimeError):
+            with self.pool.lease():
+                raise RuntimeError('renderer crashed')
+        self.assertTrue(self.created[0].quit_called)
+        stats = self.pool.stats()
+        self.assertEqual((stats['drivers_idle'], stats['drivers_in_use']), (0, 0))
+        self.assertEqual(stats['drivers_recycled_total']['error'], 1)
+
+
+class PageLoadProfileTests(SimpleTestCase):
+
+    def test_lean_profile_blocks_every_kind_and_trackers(self):
+        patterns = PageLoadProfile().blocked_patterns()
+        for kind_patterns in RESOURCE_PATTERNS.values():
+            for pattern in kind_patterns:
+                self.assertIn(pattern, patterns)
+        for pattern in TRACKER_PATTERNS:
+            self.assertIn(pattern, patterns)
+
+    def test_allowed_kinds_are_let_through(self):
+        patterns = PageLoadProfile(allow=['stylesheet', 'font'], extra_blocked=['*ads.example.com*']).blocked_patterns()
+        self.assertNotIn('*.css', patterns)
+        self.assertNotIn('*.woff2', patterns)
+        self.assertIn('*.jpg', patterns)
+        self.assertIn('*doubleclick.net*', patterns)
+        self.assertEqual(patterns[-1], '*ads.example.com*')
+
+    def test_unknown_kind_is_rejected(self):
+        with self.assertRaises(ValueError):
+            PageLoadProfile(allow=['images'])
+
+    def test_apply_sends_the_patterns(self):
+        driver = RecordingDriver()
+        PageLoadProfile().apply(driver)
+        self.assertEqual(driver.commands[-1], ('Network.setBlockedURLs', {'urls': PageLoadProfile().blocked_patterns()}))
+
+    @override_settings(SCRAPER_LEAN_PAGE_LOADS=False)
+    def test_apply_blocks_nothing_when_disabled(self):
+        driver = RecordingDriver()
+        PageLoadProfile().apply(driver)
+        self.assertEqual(driver.commands[-1], ('Network.setBlockedURLs', {'urls': []}))
+
+
+class FailureClassificationTests(SimpleTestCase):
+
+    def _classify(self, message):
+        return classify_failure(ScrapingResult(success=False, error_message=message))
+
+    def test_success_has_no_class(self):
+        self.assertIsNone(classify_failure(ScrapingResult(title='Title', success=True)))
+
+    def test_error_messages(self):
+        cases = {
+            "Browser unavailable: no driver free after 30s": FAILURE_BROWSER_UNAVAILABLE,
+            "Page load timeout - site may be slow or blocking automated access": FAILURE_TIMEOUT,
+            "HTTP request failed: ReadTimeout": FAILURE_TIMEOUT,
+            "HTTP 403 fetching page": FAILURE_BLOCKED,
+            "Just a moment... Cloudflare": FAILURE_BLOCKED,
+            "Scraping error: [Errno 111] Connection refused": FAILURE_NETWORK,
+            "Scraping error: net::ERR_NAME_NOT_RESOLVED": FAILURE_NETWORK,
+            "Could not find title or thumbnail": FAILURE_SELECTOR_MISSING,
+            "Something else went wrong": FAILURE_UNKNOWN,
+            None: FAILURE_UNKNOWN,
+        }
+        for message, failure_type in cases.items():
+            with self.subTest(message=message):
+                self.assertEqual(self._classify(message), failure_type)
+
+    def test_retried_and_circuit_classes(self):
+        self.assertEqual(TRANSIENT_FAILURES, {FAILURE_TIMEOUT, FAILURE_NETWORK, FAILURE_BROWSER_UNAVAILABLE})
+        self.assertNotIn(FAILURE_SELECTOR_MISSING, SITE_HEALTH_FAILURES)
+        self.assertNotIn(FAILURE_BROWSER_UNAVAILABLE, SITE_HEALTH_FAILURES)
+
+
+@override_settings(SCRAPER_RETRY_BACKOFF=15, SCRAPER_RETRY_BACKOFF_MAX=300)
+class RetryCountdownTests(SimpleTestCase):
+
+    def test_backoff_doubles_within_its_upper_half(self):
+        for attempt, backoff in enumerate([15, 30, 60, 120, 240]):
+            with self.subTest(attempt=attempt):
+                with mock.patch('random.uniform', side_effect=lambda low, high: low):
+                    self.assertEqual(retry_countdown(attempt), backoff / 2)
+                with mock.patch('random.uniform', side_effect=lambda low, high: high):
+                    self.assertEqual(retry_countdown(attempt), backoff)
+
+    def test_backoff_is_capped(self):
+        for _ in range(50):
+            self.assertTrue(150 <= retry_countdown(10) <= 300)
+
+
+GALLERY_CARD = """
+<div class="gallery-content">
+  <h1 class="lillie"><a href="/galleries/1.html">  Card Title  </a></h1>
+  <picture>
+    <source type="image/avif" data-srcset="//tn.hitomi.la/avifsmalltn/1.avif 1x, //tn.hitomi.la/avifsmalltn/1@2x.avif 2x">
+    <img class="lazyload" src="" data-src="">
+  </picture>
+</div>
+"""
+
+# A bato.to series page after a layout change: none of the layout XPaths match
+OPENGRAPH_ONLY_PAGE = """
+<html>
+<head>
+  <meta property="og:title" content="Benchmark Series">
+  <meta property="og:image" content="/media/covers/benchmark-series.jpg">
+</head>
+<body><main><section><h1>Benchmark Series</h1></section></main></body>
+</html>
+"""
+
+
+class ExtractionSpecTests(SimpleTestCase):
+
+    def _fixture_tree(self, domain, name):
+        with open(os.path.join(FIXTURES_DIR, domain, name), 'rb') as f:
+            return lxml_html.fromstring(f.read())
+
+    def test_saved_bato_page(self):
+        tree = self._fixture_tree('bato.to', 'series.html')
+        values = BATO_PAGE.extend(OPENGRAPH).extract_from_tree(tree, 'https://bato.to/series/1/benchmark-series')
+        self.assertEqual(values, {
+            'title': 'Benchmark Series',
+            'thumbnail_url': 'https://bato.to/media/covers/benchmark-series.jpg',
+        })
+
+    def test_bato_page_with_only_opengraph_tags(self):
+        tree = lxml_html.fromstring(OPENGRAPH_ONLY_PAGE)
+        # The page counts as ready, so the scraper does not wait out the timeout for the layout XPaths
+        for group in BatoScraper.readiness.xpath_groups:
+            self.assertTrue(any(tree.xpath(xpath) for xpath in group), group)
+        values = BatoScraper.extraction.extract_from_tree(tree, 'https://bato.to/series/1/benchmark-series')
+        self.assertEqual(values, {
+            'title': 'Benchmark Series',
+            'thumbnail_url': 'https://bato.to/media/covers/benchmark-series.jpg',
+        })
+
+    def test_gallery_card_falls_back_to_srcset(self):
+        tree = lxml_html.fromstring(GALLERY_CARD)
+        values = HITOMI_GALLERY_BLOCK.extract_from_tree(tree, 'https://ltn.hitomi.la/galleryblock/1.html')
+        self.assertEqual(values, {'thumbnail_url': 'https://tn.hitomi.la/avifsmalltn/1.avif'})
+
+    def test_first_candidate_with_a_value_wins(self):
+        spec = ExtractionSpec(
+            title=[Candidate('//h2'), Candidate('//h1/a'), Candidate('//title')],
+            link=[Candidate('//h1/a', ['data-href', 'href'], url=True)],
+            missing=[Candidate('//h3')],
+        )
+        values = spec.extract_from_tree(lxml_html.fromstring(GALLERY_CARD), 'https://hitomi.la/')
+        self.assertEqual(values, {
+            'title': 'Card Title',
+            'link': 'https://hitomi.la/galleries/1.html',
+            'missing': None,
+        })
+
+    def test_extend_tries_own_candidates_first(self):
+        first = ExtractionSpec(title=[Candidate('//h1')])
+        combined = first.extend(ExtractionSpec(title=[Candidate('//title')], cover=[Candidate('//img')]))
+        self.assertEqual(combined.xpaths('title'), ['//h1', '//title'])
+        self.assertEqual(combined.xpaths('cover'), ['//img'])
+        self.assertEqual(first.xpaths('title'), ['//h1'])
+
+
+class FakeTokenRedis:
+    """The Redis commands token_cache uses, kept in a dict"""
+
+    def __init__(self, revoked=()):
+        self.values = {}
+        self.ttls = {}
+        self.revoked = list(revoked)
+
+    def get(self, key):
+        value = self.values.get(key)
+        return value.encode() if value is not None else None
+
+    def set(self, key, value, ex=None):
+        self.values[key] = str(value)
+        self.ttls[key] = ex
+
+    def pubsub(self, **kwargs):
+        return FakeRevocations(self.revoked)
+
+
+class StopListening(BaseException):
+    """Ends the revocation listener's loop, which outlives any Exception"""
+
+
+class FakeRevocations:
+    def __init__(self, revoked):
+        self.revoked = revoked
+        self.channels = []
+
+    def subscribe(self, channel):
+        self.channels.append(channel)
+
+    def listen(self):
+        for token_hash in self.revoked:
+            yield {'type': 'message', 'data': token_hash.encode()}
+        raise StopListening
+
+
+class UnavailableRedis:
+    def get(self, key):
+        raise redis.ConnectionError('Connection refused')
+
+    def set(self, key, value, ex=None):
+        raise redis.ConnectionError('Connection refused')
+
+
+@override_settings(AUTH_TOKEN_LOCAL_TTL=30, AUTH_TOKEN_CACHE_TTL=300, AUTH_TOKEN_NEGATIVE_TTL=10)
+class TokenCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = FakeTokenRedis()
+        token_cache.local_cache.clear()
+        self.addCleanup(token_cache.local_cache.clear)
+        for patcher in (
+            mock.patch.object(token_cache, '_redis', lambda: self.redis),
+            mock.patch.object(token_cache, 'start_revocation_listener'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _shared_key(self, token):
+        return token_cache.KEY_PREFIX + token_cache.token_hash(token)
+
+    def test_miss_then_remembered(self):
+        self.assertEqual(token_cache.lookup('token-a'), (False, None))
+        token_cache.remember('token-a', 5)
+        self.assertEqual(self.redis.values[self._shared_key('token-a')], '5')
+        self.assertEqual(self.redis.ttls[self._shared_key('token-a')], 300)
+        self.assertNotIn('token-a', ''.join(self.redis.values))
+        self.assertEqual(token_cache.lookup('token-a'), (True, 5))
+
+    def test_shared_hit_fills_local_cache(self):
+        self.redis.set(self._shared_key('token-b'), 7)
+        self.assertEqual(token_cache.lookup('token-b'), (True, 7))
+        self.redis.values.clear()
+        self.assertEqual(token_cache.lookup('token-b'), (True, 7))
+
+    def test_rejected_token_is_cached_briefly(self):
+        token_cache.remember('bad-token', None)
+        self.assertEqual(self.redis.values[self._shared_key('bad-token')], token_cache.INVALID)
+        self.assertEqual(self.redis.ttls[self._shared_key('bad-token')], 10)
+        self.assertEqual(token_cache.lookup('bad-token'), (True, None))
+        token_cache.local_cache.clear()
+        self.assertEqual(token_cache.lookup('bad-token'), (True, None))
+
+    def test_redis_unavailable_is_a_miss(self):
+        self.redis = UnavailableRedis()
+        token_cache.remember('token-c', 5)
+        token_cache.local_cache.clear()
+        self.assertEqual(token_cache.lookup('token-c'), (False, None))
+
+    def test_revocation_evicts_token_and_session(self):
+        token_cache.remember('token-d', 5)
+        token_cache.remember('token-e', 6)
+        self.redis.values.clear()
+        revoked = token_cache.token_hash('token-d')
+        self.redis.revoked.append(revoked)
+        # Keep the cache across subscribing, to see what the message itself evicts
+        with mock.patch.object(token_cache.local_cache, 'clear'), \
+                mock.patch.object(access_tokens, 'revoke_session') as revoke_session:
+            with self.assertRaises(StopListening):
+                token_cache._listen_for_revocations()
+        revoke_session.assert_called_once_with(revoked)
+        self.assertEqual(token_cache.lookup('token-d'), (False, None))
+        self.assertEqual(token_cache.lookup('token-e'), (True, 6))
+
+    def test_local_cache_is_bounded_and_expires(self):
+        cache = token_cache.LocalTokenCache(max_size=2)
+        cache.set('a', 1, 30)
+        cache.set('b', 2, 30)
+        cache.get('a')
+        cache.set('c', 3, 30)
+        self.assertEqual(cache.get('b'), (False, None))
+        self.assertEqual(cache.get('a'), (True, 1))
+        cache.set('d', 4, 0)
+        self.assertEqual(cache.get('d'), (False, None))
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _access_token(kid='current', secret='current-secret', alg='HS256', **claims):
+    """An access token as the user service issues it (user_service/app_user/access_tokens.py)"""
+    now = int(time.time())
+    claims = {'iss': 'user_service', 'sub': '42', 'iat': now, 'exp': now + 300, 'sid': 'session-1', 'typ': 'access', **claims}
+    signing_input = '.'.join(
+        _b64(json.dumps(part).encode()) for part in ({'alg': alg, 'typ': 'JWT', 'kid': kid}, claims)
+    )
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{_b64(signature)}"
+
+
+def _signed(header, claims, secret='current-secret'):
+    """A token with arbitrary JSON as its header and claims, signed with `secret`"""
+    signing_input = f"{_b64(json.dumps(header).encode())}.{_b64(json.dumps(claims).encode())}"
+    return f"{signing_input}.{_b64(hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest())}"
+
+
+@override_settings(
+    ACCESS_TOKEN_KEYS={'current': 'current-secret', 'previous': 'previous-secret'},
+    ACCESS_TOKEN_TTL=300, ACCESS_TOKEN_LEEWAY=10,
+)
+class AccessTokenTests(SimpleTestCase):
+
+    def setUp(self):
+        access_tokens._revoked_sessions.clear()
+        self.addCleanup(access_tokens._revoked_sessions.clear)
+
+    def test_valid_token(self):
+        claims = access_tokens.verify(_access_token())
+        self.assertEqual(claims['user_id'], 42)
+        self.assertEqual(claims['sid'], 'session-1')
+
+    def test_expiry_allows_leeway(self):
+        now = int(time.time())
+        self.assertEqual(access_tokens.verify(_access_token(exp=now - 5))['user_id'], 42)
+        with self.assertRaises(access_tokens.ExpiredAccessToken):
+            access_tokens.verify(_access_token(exp=now - 30))
+
+    def test_token_signed_with_previous_key_during_rotation(self):
+        token = _access_token(kid='previous', secret='previous-secret')
+        self.assertEqual(access_tokens.verify(token)['user_id'], 42)
+        with override_settings(ACCESS_TOKEN_KEYS={'current': 'current-secret'}):
+            with self.assertRaisesMessage(access_tokens.InvalidAccessToken, 'Unknown signing key'):
+                access_tokens.verify(token)
+
+    def test_wrong_kid_or_secret(self):
+        with self.assertRaisesMessage(access_tokens.InvalidAccessToken, 'Unknown signing key'):
+            access_tokens.verify(_access_token(kid='other'))
+        with self.assertRaisesMessage(access_tokens.InvalidAccessToken, 'Bad signature'):
+            access_tokens.verify(_access_token(kid='current', secret='previous-secret'))
+
+    def test_tampered_claims(self):
+        header, _, signature = _access_token().split('.')
+        forged_claims = _access_token(sub='1').split('.')[1]
+        with self.assertRaisesMessage(access_tokens.InvalidAccessToken, 'Bad signature'):
+            access_tokens.verify(f"{header}.{forged_claims}.{signature}")
+
+    def test_rejected_tokens(self):
+        for token in ['', 'not-a-token', 'a.b.c', _access_token(alg='none'), _access_token(typ='refresh'),
+                      _access_token(iss='someone-else'), _access_token(sub='not-a-number')]:
+            with self.subTest(token=token):
+                with self.assertRaises(access_tokens.InvalidAccessToken):
+                    access_tokens.verify(token)
+
+    def test_malformed_header_or_claims(self):
+        claims = {'iss': 'user_service', 'sub': '42', 'exp': int(time.time()) + 300, 'sid': 's', 'typ': 'access'}
+        header = {'alg': 'HS256', 'kid': 'current'}
+        for token in [
+            _signed({'alg': 'HS256', 'kid': ['current']}, claims),
+            _signed({'alg': 'HS256', 'kid': {'current': 1}}, claims),
+            _signed(['HS256', 'current'], claims),
+            _signed('HS256', claims),
+            _signed(header, ['42']),
+            _signed(header, 42),
+            _signed(header, {**claims, 'sid': ['s']}),
+        ]:
+            with self.subTest(token=token):
+                with self.assertRaises(access_tokens.InvalidAccessToken):
+                    access_tokens.verify(token)
+
+    def test_revoked_session(self):
+        token = _access_token(sid='session-2')
+        access_tokens.revoke_session('session-2')
+        with self.assertRaises(access_tokens.RevokedAccessToken):
+            access_tokens.verify(token)
+        self.assertEqual(access_tokens.verify(_access_token(sid='session-3'))['user_id'], 42)
+
+
+class FakeClock:
+    """Stands in for the time module in service_client: monotonic time only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        pass
+
+
+class ServiceClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(service_client, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.statuses = []
+        self.requests = 0
+
+    def _client(self, **kwargs):
+        """A client whose requests are answered with self.statuses (200 once they run out)"""
+        def respond(request):
+            self.requests += 1
+            return httpx.Response(self.statuses.pop(0) if self.statuses else 200)
+
+        client = service_client.ServiceClient(**kwargs)
+        client._client = httpx.Client(transport=httpx.MockTransport(respond))
+        self.addCleanup(client.close)
+        return client
+
+    def test_get_retried_after_503(self):
+        client = self._client(retries=1)
+        self.statuses = [503]
+        self.assertEqual(client.get('users', 'http://users.test/me/').status_code, 200)
+        self.assertEqual(self.requests, 2)
+
+    def test_post_not_retried(self):
+        client = self._client(retries=1)
+        self.statuses = [503]
+        self.assertEqual(client.request('users', 'POST', 'http://users.test/login/').status_code, 503)
+        self.assertEqual(self.requests, 1)
+
+    def test_retry_budget_exhaustion(self):
+        client = self._client(retries=1, retry_budget_ratio=0.1, failure_threshold=1000)
+        calls = 40
+        self.statuses = [503] * (calls * 2)
+        for _ in range(calls):
+            self.assertEqual(client.get('users', 'http://users.test/me/').status_code, 503)
+        retries = self.requests - calls
+        # The 10 banked retries, then one per 10 calls; the first call's deposit is lost to the cap
+        self.assertEqual(retries, 10 + int(calls * 0.1) - 1)
+
+    def test_retry_budget_refills(self):
+        budget = service_client.RetryBudget(ratio=0.5, max_tokens=2)
+        self.assertEqual([budget.withdraw() for _ in range(3)], [True, True, False])
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+        for _ in range(10):
+            budget.deposit()
+        self.assertEqual(budget.tokens, 2)
+
+    def test_circuit_opens_then_probes_and_closes(self):
+        client = self._client(retries=0, failure_threshold=2, open_seconds=10)
+        self.statuses = [500, 502]
+        client.get('users', 'http://users.test/me/')
+        client.get('users', 'http://users.test/me/')
+        circuit = client.circuit('users')
+        self.assertEqual(circuit.state, 'open')
+
+        with self.assertRaises(service_client.ServiceUnavailable) as raised:
+            client.get('users', 'http://users.test/me/')
+        self.assertEqual(raised.exception.retry_after, 10)
+        self.assertEqual(self.requests, 2)
+
+        self.clock.now += 10
+        self.assertEqual(client.get('users', 'http://users.test/me/').status_code, 200)
+        self.assertEqual((circuit.state, circuit.failures), ('closed', 0))
+        self.assertEqual(self.requests, 3)
+
+    def test_half_open_lets_one_probe_through(self):
+        circuit = service_client.ServiceCircuit('users', failure_threshold=1, open_seconds=10)
+        circuit.record(False)
+        self.clock.now += 10
+        circuit.allow()
+        self.assertEqual(circuit.state, 'half_open')
+        with self.assertRaises(service_client.ServiceUnavailable):
+            circuit.allow()
+        # A failed probe opens the circuit again for the full period
+        circuit.record(False)
+        self.assertEqual(circuit.state, 'open')
+        self.clock.now += 9
+        with self.assertRaises(service_client.ServiceUnavailable):
+            circuit.allow()
+        self.clock.now += 1
+        circuit.allow()
+        circuit.record(True)
+        self.assertEqual(circuit.state, 'closed')
+
+
+class TimingContextTests(SimpleTestCase):
+    log = logging.getLogger('app_bookmark.tests')
+
+    def _logged_event(self):
+        with self.assertLogs(self.log, logging.INFO) as captured:
+            timing.log_event(self.log, logging.INFO, 'probe')
+        return json.loads(captured.records[0].getMessage())
+
+    def test_task_id_does_not_leak_into_the_next_task(self):
+        timing.start_timings('scrape-1')
+        self.addCleanup(timing.stop_timings)
+        with timing.span(timing.STAGE_EXTRACTION):
+            pass
+        self.assertEqual(self._logged_event()['task_id'], 'scrape-1')
+
+        # The worker thread is reused for the next task once this one has ended
+        task_postrun.send(sender=None, task_id='scrape-1', args=(), kwargs={}, retval=None, state='SUCCESS')
+        self.assertNotIn('task_id', self._logged_event())
+        self.assertIsNone(timing.current_timings())
+
+
+class TaskStatusTests(SimpleTestCase):
+    # User 1 led the scrape, user 2 joined it through single-flight
+    META = {
+        'status': 'SUCCESS', 'name': task_status.SCRAPE_TASK_NAME, 'args': [1, 'https://bato.to/series/1'],
+        'result': {'success': True, 'bookmark_id': 10, 'bookmark_ids': {'1': 10, '2': 20}, 'owner_ids': [1, 2]},
+    }
+
+    def setUp(self):
+        self.watched = set()
+        self.metas = {}
+        for name, fake in (
+            ('watches', lambda user_id, task_ids: [(user_id, task_id) in self.watched for task_id in task_ids]),
+            ('_task_metas', lambda task_ids: [self.metas.get(task_id) for task_id in task_ids]),
+        ):
+            patcher = mock.patch.object(task_status, name, side_effect=fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _get(self, user_id, task_id):
+        request = APIRequestFactory().get(f'/api/bookmarks/tasks/{task_id}/status/')
+        force_authenticate(request, user=SimpleAuthenticatedUser(user_id))
+        return views.task_status(request, task_id=task_id)
+
+    def test_each_owner_sees_their_own_bookmark(self):
+        self.metas['scrape'] = self.META
+        self.assertEqual(self._get(1, 'scrape').data['bookmark_id'], 10)
+        self.assertEqual(self._get(2, 'scrape').data['bookmark_id'], 20)
+
+    def test_non_owner_gets_not_found(self):
+        self.metas['scrape'] = self.META
+        response = self._get(3, 'scrape')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('bookmark_id', response.data)
+        self.assertEqual(task_status.get_task_statuses(3, ['scrape']), {'tasks': {}, 'not_found': ['scrape']})
+
+    def test_watcher_without_a_bookmark_sees_none(self):
+        # Still watching, but their bookmark was not saved: never fall back to the leader's
+        self.metas['scrape'] = {**self.META, 'result': {**self.META['result'], 'bookmark_ids': {'1': 10}}}
+        self.watched.add((2, 'scrape'))
+        response = self._get(2, 'scrape')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['bookmark_id'])
+
+    def test_legacy_bookmark_ids_do_not_grant_access(self):
+        self.metas['scrape'] = {**self.META, 'args': [1], 'result': {'success': True, 'bookmark_ids': {'1': 10, '2': 20}}}
+        self.assertEqual(self._get(2, 'scrape').status_code, 404)
+
+
+class RedisTestCase(SimpleTestCase):
+    """Runs against the configured Redis (CACHES['default']), on keys of its own; skipped if Redis is down"""
+
+    def setUp(self):
+        self.redis = get_redis_connection('default')
+        try:
+            self.redis.ping()
+        except redis.RedisError as e:
+            self.skipTest(f"Redis unavailable: {e}")
+        # Numeric, so it fits in gallery URLs and user ids
+        self.tag = str(random.randrange(10 ** 9, 10 ** 10))
+        self.addCleanup(self.delete_keys, self.tag)
+
+    def delete_keys(self, *fragments):
+        for fragment in fragments:
+            for key in self.redis.scan_iter(match=f'*{fragment}*'):
+                self.redis.delete(key)
+
+    def gallery_url(self, number: int = 0) -> str:
+        return f'https://hitomi.la/galleries/{self.tag}{number}.html'
+
+
+@override_settings(SCRAPER_BUSY_RETRY_SECONDS=10, SCRAPER_SLOT_TTL=180)
+class RateLimitTests(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # One token a second, up to two at once
+        self.site = SimpleNamespace(domain=f'{self.tag}.test', rate_limit_per_minute=60, burst=2, max_concurrency=5)
+
+    def _take(self, reserved_at=None, site=None):
+        with rate_limit.scrape_slot(site or self.site, reserved_at):
+            pass
+
+    def _rewind_bucket(self, seconds):
+        """Pretend the bucket was last updated `seconds` earlier, as if that much time had passed"""
+        key = rate_limit._bucket_key(self.site.domain)
+        self.redis.hset(key, 'updated_at', float(self.redis.hget(key, 'updated_at')) - seconds)
+
+    def test_burst_then_deferral(self):
+        self._take()
+        self._take()
+        with self.assertRaises(rate_limit.RateLimited) as raised:
+            self._take()
+        self.assertAlmostEqual(raised.exception.retry_after, 1, delta=0.1)
+        self.assertEqual(raised.exception.domain, self.site.domain)
+
+    def test_tokens_refill_at_the_rate(self):
+        self._take()
+        self._take()
+        self._rewind_bucket(1.5)
+        self._take()
+        # Half a token left: the next one is half a second away
+        with self.assertRaises(rate_limit.RateLimited) as raised:
+            self._take()
+        self.assertAlmostEqual(raised.exception.retry_after, 0.5, delta=0.1)
+
+    def test_deferred_scrapes_queue_by_turn(self):
+        self._take()
+        self._take()
+        turns = []
+        for _ in range(2):
+            with self.assertRaises(rate_limit.RateLimited) as raised:
+                self._take()
+            turns.append(raised.exception.reserved_at)
+        self.assertAlmostEqual(turns[1] - turns[0], 1, delta=0.01)
+        self.assertEqual(rate_limit.limiter_state(self.site)['queued'], 2)
+
+        # Tokens are back, but the turns handed out come first: a newcomer waits behind them
+        self._rewind_bucket(2)
+        with self.assertRaises(rate_limit.RateLimited) as raised:
+            self._take()
+        self.assertAlmostEqual(raised.exception.reserved_at - turns[1], 1, delta=0.01)
+        # while the scrape holding the first turn goes ahead
+        self._take(reserved_at=turns[0])
+
+    def test_woken_early_keeps_its_turn(self):
+        turn = float(self.redis.time()[0]) + 30
+        with self.assertRaises(rate_limit.RateLimited) as raised:
+            self._take(reserved_at=turn)
+        self.assertEqual(raised.exception.reserved_at, turn)
+        self.assertAlmostEqual(raised.exception.retry_after, 30, delta=1.5)
+
+    def test_concurrency_cap(self):
+        site = SimpleNamespace(domain=self.site.domain, rate_limit_per_minute=600, burst=10, max_concurrency=1)
+        with rate_limit.scrape_slot(site):
+            with self.assertRaises(rate_limit.RateLimited) as raised:
+                self._take(site=site)
+            self.assertEqual(raised.exception.retry_after, 10)
+            self.assertEqual(rate_limit.limiter_state(site)['in_flight'], 1)
+        self.assertEqual(rate_limit.limiter_state(site)['in_flight'], 0)
+
+
+class SingleFlightTests(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = self.gallery_url()
+        self.canonical_url = canonicalize_url(self.url)
+        patcher = mock.patch.object(tasks.scrape_manga_info_task, 'apply_async')
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _dispatched_task_ids(self):
+        return [call.kwargs['task_id'] for call in self.apply_async.call_args_list]
+
+    def test_concurrent_claims_run_one_scrape(self):
+        bookmarks = {int(self.tag): 'b-1', int(self.tag) + 1: 'b-2'}
+        start = threading.Barrier(2)
+        returned = {}
+
+        def claim(user_id):
+            start.wait()
+            returned[user_id] = singleflight.dispatch_scrape(user_id, self.url, bookmark_id=bookmarks[user_id])
+
+        threads = [threading.Thread(target=claim, args=(user_id,)) for user_id in bookmarks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.addCleanup(self.delete_keys, *returned.values())
+
+        # Exactly one task was sent, and both users were handed its id
+        self.assertEqual(len(self._dispatched_task_ids()), 1)
+        task_id = self._dispatched_task_ids()[0]
+        self.assertEqual(set(returned.values()), {task_id})
+        scraper = self.apply_async.call_args.args[0][0]
+        (waiter,) = set(bookmarks) - {scraper}
+
+        # Landing the flight hands the scrape's result to the waiter's bookmark
+        waiters = singleflight.finish_flight(self.canonical_url, task_id)
+        self.assertEqual([(w['user_id'], w['bookmark_id']) for w in waiters], [(waiter, bookmarks[waiter])])
+        self.assertEqual(task_events.watches(waiter, [task_id]), [True])
+        self.assertIsNone(self.redis.get(singleflight._inflight_key(self.canonical_url)))
+
+    def test_expired_lease_is_claimed_again(self):
+        first = singleflight.dispatch_scrape(int(self.tag), self.url)
+        # The leader's worker died: its lease runs out
+        self.redis.pexpire(singleflight._inflight_key(self.canonical_url), 1)
+        time.sleep(0.01)
+
+        second = singleflight.dispatch_scrape(int(self.tag) + 1, self.url)
+        self.addCleanup(self.delete_keys, first, second)
+        self.assertNotEqual(first, second)
+        self.assertEqual(self._dispatched_task_ids(), [first, second])
+
+        # A late leader can neither extend nor land the flight that replaced its own
+        singleflight.extend_flight(self.canonical_url, first)
+        self.assertEqual(singleflight.finish_flight(self.canonical_url, first), [])
+        self.assertEqual(self.redis.get(singleflight._inflight_key(self.canonical_url)).decode(), second)
+
+
+class DispatchScrapesTests(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user_id = int(self.tag)
+        self.sent = []
+        patcher = mock.patch(
+            'celery.group.apply_async', autospec=True,
+            side_effect=lambda group, **options: self.sent.append((group, options)),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flights_are_claimed_and_sent_as_one_group(self):
+        busy, free = self.gallery_url(1), self.gallery_url(2)
+        self.redis.set(singleflight._inflight_key(canonicalize_url(busy)), 'leader-task', ex=60)
+        self.addCleanup(self.delete_keys, 'leader-task')
+
+        task_ids = singleflight.dispatch_scrapes(self.user_id, [busy, free], import_job_id='job-1')
+        self.addCleanup(self.delete_keys, *task_ids)
+
+        self.assertEqual(task_ids[0], 'leader-task')
+        self.assertEqual(len(self.sent), 1)
+        group, options = self.sent[0]
+        self.assertEqual(options, {'task_id': 'job-1'})
+        self.assertEqual(
+            [(task.args, task.kwargs, task.options['task_id']) for task in group.tasks],
+            [((self.user_id, free, None), {'import_job_id': 'job-1'}, task_ids[1])],
+        )
+        self.assertEqual(self.redis.get(singleflight._inflight_key(canonicalize_url(free))).decode(), task_ids[1])
+        # The busy URL was joined: the user waits on the leader and watches both tasks
+        waiters = singleflight.finish_flight(canonicalize_url(busy), 'leader-task')
+        self.assertEqual([(w['user_id'], w['import_job_id']) for w in waiters], [(self.user_id, 'job-1')])
+        self.assertEqual(task_events.watches(self.user_id, task_ids), [True, True])
+
+    def test_failed_send_releases_the_claims(self):
+        url = self.gallery_url()
+        with mock.patch('celery.group.apply_async', side_effect=ConnectionError('broker down')):
+            with self.assertRaises(ConnectionError):
+                singleflight.dispatch_scrapes(self.user_id, [url])
+        self.assertIsNone(self.redis.get(singleflight._inflight_key(canonicalize_url(url))))
+
+
+class ScrapeCacheLookupTests(SimpleTestCase):
+
+    def setUp(self):
+        self.entries = []
+        objects = mock.patch.object(scrape_cache.ScrapeCacheEntry, 'objects')
+        queryset = objects.start().select_related.return_value.filter
+        queryset.side_effect = lambda **lookup: mock.Mock(
+            __iter__=lambda _: iter(self.entries), first=lambda: self.entries[0] if self.entries else None,
+        )
+        self.addCleanup(objects.stop)
+
+    def _lookups(self):
+        return tuple(
+            REGISTRY.get_sample_value('bookmark_scrape_cache_lookups_total', {'result': result}) or 0
+            for result in ('hit', 'miss')
+        )
+
+    def _entry(self, url, fresh):
+        return SimpleNamespace(url=url, is_fresh=lambda max_age=None: fresh)
+
+    def test_single_lookup_counts_hit_or_miss(self):
+        before = self._lookups()
+        self.assertIsNone(scrape_cache.get_fresh_entry('https://bato.to/series/1'))
+        self.entries = [self._entry('https://bato.to/series/1', fresh=True)]
+        self.assertIs(scrape_cache.get_fresh_entry('https://bato.to/series/1'), self.entries[0])
+        self.assertEqual(self._lookups(), (before[0] + 1, before[1] + 1))
+
+    def test_batch_lookup_counts_every_url(self):
+        fresh = self._entry('https://bato.to/series/1', fresh=True)
+        self.entries = [fresh, self._entry('https://bato.to/series/2', fresh=False)]
+        before = self._lookups()
+        urls = ['https://bato.to/series/1', 'https://bato.to/series/2', 'https://bato.to/series/3']
+        self.assertEqual(scrape_cache.get_fresh_entries(urls), [fresh])
+        self.assertEqual(self._lookups(), (before[0] + 1, before[1] + 2))
+
+
+class ThumbnailStorageTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = FileSystemStorage(location=directory.name)
+        self.data = b'\xff\xd8cover bytes\xff\xd9'
+        self.digest = hashlib.sha256(self.data).hexdigest()
+        self.name = f'thumbnails/ab/cd/{self.digest}.jpg'
+
+    def _stored(self):
+        with self.storage.open(self.name, 'rb') as stored:
+            return stored.read()
+
+    def test_writes_into_place_without_leftovers(self):
+        thumbnails._ensure_stored(self.storage, self.name, self.data, self.digest)
+        self.assertEqual(self._stored(), self.data)
+        self.assertEqual(self.storage.listdir('thumbnails/ab/cd'), ([], [f'{self.digest}.jpg']))
+
+    def test_truncated_file_is_replaced(self):
+        # Left behind by a writer that was interrupted halfway
+        self.storage.save(self.name, ContentFile(self.data[:5]))
+        thumbnails._ensure_stored(self.storage, self.name, self.data, self.digest)
+        self.assertEqual(self._stored(), self.data)
+
+    def test_matching_file_is_kept(self):
+        self.storage.save(self.name, ContentFile(self.data))
+        with mock.patch.object(thumbnails.os, 'replace') as replace:
+            thumbnails._ensure_stored(self.storage, self.name, self.data, self.digest)
+        replace.assert_not_called()
+
+
+@override_settings(TASK_EVENTS_MAX_STREAMS=2)
+class TaskEventStreamCapTests(RedisTestCase):
+
+    def _open(self):
+        ticket = task_events.create_stream_ticket(int(self.tag))
+        response = self.client.get(reverse('task-events'), {'ticket': ticket})
+        self.addCleanup(response.close)
+        return response
+
+    def test_streams_over_the_cap_are_turned_away(self):
+        first, second = self._open(), self._open()
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        rejected = self._open()
+        self.assertEqual(rejected.status_code, 503)
+        self.assertEqual(rejected['Retry-After'], str(settings.TASK_EVENTS_STREAM_SECONDS))
+        self.assertEqual(task_events._open_streams, settings.TASK_EVENTS_MAX_STREAMS)
+
+    def test_disconnect_frees_the_slot(self):
+        streaming, idle = self._open(), self._open()
+        self.assertTrue(next(iter(streaming.streaming_content)).startswith(b'retry:'))
+        streaming.close()
+        # A response closed before it streamed anything frees its slot too, and only once
+        idle.close()
+        idle.close()
+        self.assertEqual(task_events._open_streams, 0)
+        self.assertEqual(self._open().status_code, 200)
@@ -0,0 +1,208 @@
+"""
+Content-addressed thumbnail storage.
+
+Each distinct image is stored once as a ThumbnailBlob named by its SHA-256.
+Bookmarks and scrape cache entries reference blobs; blobs nobody references
+are deleted by collect_garbage (periodically by celery beat, or manage.py
+gc_thumbnails). Files are written to a temporary name and renamed into place,
+so a blob's file is never seen half-written. Each blob also gets
+small WebP and JPEG derivatives for the dashboard (generate_derivatives).
+"""
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models.deletion import ProtectedError
+from django.utils import timezone
+from datetime import timedelta
+from io import BytesIO
+from PIL import Image
+import hashlib
+import logging
+import os
+import tempfile
+from .models import Bookmark, ThumbnailBlob, ThumbnailDerivative
+from .timing import log_event
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp', 'AVIF': 'avif'}
+
+# (format, Pillow encoder, file extension, encoder options) for each derivative
+DERIVATIVE_ENCODINGS = [
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+]
+
+
+def _image_extension(data: bytes) -> str:
+    try:
+        image_format = Image.open(BytesIO(data)).format
+    except Exception:
+        image_format = None
+    return IMAGE_EXTENSIONS.get(image_format, 'jpg')
+
+
+def _stored_digest(storage, name: str):
+    """SHA-256 of the stored file `name`, or None if there is none"""
+    if not storage.exists(name):
+        return None
+    digest = hashlib.sha256()
+    with storage.open(name, 'rb') as stored:
+        for chunk in stored.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _ensure_stored(storage, name: str, data: bytes, digest: str):
+    """
+    Make the file `name` hold `data` (whose SHA-256 is `digest`). A file
+    already there is kept only if its content matches, since it may be left
+    from an interrupted write; otherwise `data` is written to a temporary
+    file and renamed over it, which concurrent writers of the same content
+    can all do safely.
+    """
+    if _stored_digest(storage, name) == digest:
+        return
+    path = storage.path(name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(data)
+        if storage.file_permissions_mode is not None:
+            os.chmod(temp_path, storage.file_permissions_mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def store_thumbnail(data: bytes) -> ThumbnailBlob:
+    """Return the blob holding `data`, writing it to storage only if it is new"""
+    digest = hashlib.sha256(data).hexdigest()
+    now = timezone.now()
+
+    blob = ThumbnailBlob.objects.filter(sha256=digest).first()
+    if blob:
+        ThumbnailBlob.objects.filter(pk=blob.pk).update(last_referenced_at=now)
+        return blob
+
+    blob = ThumbnailBlob(sha256=digest, size=len(data), last_referenced_at=now)
+    name = blob.file.field.generate_filename(blob, f"{digest}.{_image_extension(data)}")
+    storage = blob.file.storage
+    _ensure_stored(storage, name, data, digest)
+    blob.file.name = name
+
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        # Another task stored the same content first
+        winner = ThumbnailBlob.objects.get(sha256=digest)
+        if winner.file.name != name:
+            storage.delete(name)
+        return winner
+    return blob
+
+
+def generate_derivatives(blob: ThumbnailBlob) -> int:
+    """
+    Create the THUMBNAIL_DERIVATIVE_WIDTHS derivatives of a blob that do not
+    exist yet. The original is decoded once, in JPEG draft mode when possible
+    so the decoder skips detail the largest derivative does not need. Widths
+    wider than the original are replaced by the original width. Returns the
+    number of files written.
+    """
+    existing = set(blob.derivatives.values_list('width', 'format'))
+    widths = sorted(settings.THUMBNAIL_DERIVATIVE_WIDTHS)
+    wanted = [(width, fmt) for width in widths for fmt, _, _, _ in DERIVATIVE_ENCODINGS]
+    if all(key in existing for key in wanted):
+        return 0
+
+    with blob.file.open('rb') as original:
+        image = Image.open(original)
+        # Only the width matters; a height of 1 leaves it unconstrained
+        image.draft('RGB', (widths[-1], 1))
+        image = image.convert('RGB')
+
+    # Never upscale: covers narrower than the largest width get one full-size derivative
+    if image.width < widths[-1]:
+        widths = [width for width in widths if width < image.width] + [image.width]
+    written = 0
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt, encoder, ext, options in DERIVATIVE_ENCODINGS:
+            if (width, fmt) in existing:
+                continue
+            buffer = BytesIO()
+            resized.save(buffer, encoder, **options)
+            derivative = ThumbnailDerivative(blob=blob, width=width, format=fmt, size=buffer.tell())
+            derivative.file.save(f"derivative.{ext}", ContentFile(buffer.getvalue()), save=False)
+            try:
+                with transaction.atomic():
+                    derivative.save()
+            except IntegrityError:
+                # Generated concurrently by another task
+                derivative.file.delete(save=False)
+                continue
+            written += 1
+    return written
+
+
+def collect_garbage(grace_seconds: int = 3600) -> int:
+    """
+    Delete blobs no bookmark or cache entry references. Blobs referenced within
+    the last `grace_seconds` are kept so a task that has just stored a blob can
+    still link it. Returns the number of blobs deleted.
+    """
+    cutoff = timezone.now() - timedelta(seconds=grace_seconds)
+    candidates = ThumbnailBlob.objects.filter(
+        bookmarks__isnull=True,
+        cache_entries__isnull=True,
+        last_referenced_at__lt=cutoff,
+    )
+    deleted = 0
+    for blob in candidates.iterator():
+        storage = blob.file.storage
+        names = [blob.file.name] + [derivative.file.name for derivative in blob.derivatives.all()]
+        try:
+            blob.delete()
+        except ProtectedError:
+            continue  # Referenced since the query ran
+        for name in names:
+            if name:
+                storage.delete(name)
+        deleted += 1
+    return deleted
+
+
+def adopt_legacy_thumbnails() -> int:
+    """
+    Move per-user thumbnail copies written before content addressing into
+    blobs and delete the copies, along with the covers the scrape cache used
+    to store under scrape_cache/. Returns the number of bookmarks converted.
+    """
+    storage = ThumbnailBlob._meta.get_field('file').storage
+    try:
+        _, cache_files = storage.listdir('scrape_cache')
+    except FileNotFoundError:
+        cache_files = []
+    for name in cache_files:
+        storage.delete(f"scrape_cache/{name}")
+
+    converted = 0
+    legacy = Bookmark.objects.filter(thumbnail_blob__isnull=True).exclude(thumbnail='').exclude(thumbnail__isnull=True)
+    for bookmark in legacy.iterator():
+        try:
+            with bookmark.thumbnail.open('rb') as thumbnail_file:
+                data = thumbnail_file.read()
+        except (OSError, ValueError) as e:
+            log_event(logger, logging.ERROR, 'legacy_thumbnail_unreadable', name=bookmark.thumbnail.name, error=str(e))
+            continue
+        bookmark.thumbnail_blob = store_thumbnail(data)
+        bookmark.thumbnail.delete(save=False)
+        bookmark.save(update_fields=['thumbnail', 'thumbnail_blob'])
+        converted += 1
+    return converted
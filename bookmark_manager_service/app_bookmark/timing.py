@@ -0,0 +1,102 @@
+"""
+Per-stage timing spans of a scrape.
+
+A scrape task calls start_timings() and stop_timings() when it ends; code anywhere below it wraps a stage in
+`with span('stage')`. Spans are kept in a context variable, so concurrent
+tasks in a threaded worker do not mix, and code outside a task pays nothing.
+Repeated stages add up (e.g. an image fetched by both tiers). The collected
+seconds per stage are stored with the ScrapingLog (ScrapingLog.timings) and
+emitted as one JSON log line per scrape by log_timings(). log_event() writes
+other scrape events in the same format, tagged with the running task's id.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import logging
+import time
+
+STAGE_RATE_LIMIT = 'rate_limit'
+STAGE_DRIVER_LEASE = 'driver_lease'
+STAGE_NAVIGATE = 'navigate'
+STAGE_READINESS_WAIT = 'readiness_wait'
+STAGE_PAGE_FETCH = 'page_fetch'
+STAGE_EXTRACTION = 'extraction'
+STAGE_IMAGE_FETCH = 'image_fetch'
+STAGE_IMAGE_VALIDATION = 'image_validation'
+STAGE_FILE_WRITE = 'file_write'
+STAGE_CACHE_WRITE = 'cache_write'
+STAGE_DB_TRANSACTION = 'db_transaction'
+
+logger = logging.getLogger('app_bookmark.timing')
+
+# {'task_id': id, 'spans': {stage: seconds}, 'open': {stage: start}, 'token': reset token} of the running scrape, or None
+_timings = ContextVar('scrape_timings', default=None)
+
+
+def start_timings(task_id: str = None):
+    """Start collecting spans for the scrape (task `task_id`) running in this context"""
+    timings = {'task_id': task_id, 'spans': {}, 'open': {}}
+    timings['token'] = _timings.set(timings)
+
+
+def stop_timings():
+    """
+    Drop the spans of the scrape running in this context. Worker threads are
+    reused, so without this the next task on the thread would log under the
+    finished task's id.
+    """
+    timings = _timings.get()
+    if timings is None:
+        return
+    try:
+        _timings.reset(timings['token'])
+    except ValueError:  # started in another context (e.g. a copied one)
+        _timings.set(None)
+
+
+@contextmanager
+def span(stage: str, accumulate: bool = True):
+    """Time the block as `stage`; with accumulate=False it replaces earlier time of that stage"""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.monotonic()
+    timings['open'][stage] = start
+    try:
+        yield
+    finally:
+        timings['open'].pop(stage, None)
+        elapsed = time.monotonic() - start
+        previous = timings['spans'].get(stage, 0.0) if accumulate else 0.0
+        timings['spans'][stage] = previous + elapsed
+
+
+def current_timings() -> dict:
+    """Seconds per stage so far, rounded to milliseconds; stages still open count up to now"""
+    timings = _timings.get()
+    if timings is None:
+        return None
+    now = time.monotonic()
+    spans = dict(timings['spans'])
+    for stage, start in timings['open'].items():
+        spans[stage] = spans.get(stage, 0.0) + now - start
+    return {stage: round(seconds, 3) for stage, seconds in spans.items()}
+
+
+def log_timings(url: str, **fields):
+    """Emit the scrape's spans as one structured (JSON) log line"""
+    spans = current_timings()
+    if spans is None:
+        return
+    logger.info(json.dumps({'event': 'scrape_timings', 'url': url, **fields, 'spans': spans}, default=str))
+
+
+def log_event(log: logging.Logger, level: int, event: str, **fields):
+    """Emit one structured (JSON) log line, in the same format as log_timings"""
+    if not log.isEnabledFor(level):
+        return
+    timings = _timings.get()
+    if timings is not None and timings['task_id'] and 'task_id' not in fields:
+        fields['task_id'] = timings['task_id']
+    log.log(level, json.dumps({'event': event, **fields}, default=str))
@@ -0,0 +1,163 @@
+"""
+Two-level cache of tokens validated by the user service.
+
+UserServiceTokenAuthentication would otherwise call the user service on
+every request. Outcomes are cached by the token's SHA-256 (the token itself
+is never stored): in-process in a small LRU for AUTH_TOKEN_LOCAL_TTL seconds,
+and in the Redis database AUTH_TOKEN_CACHE_URL, shared by every process, for
+AUTH_TOKEN_CACHE_TTL seconds. Rejected tokens are cached as well, for
+AUTH_TOKEN_NEGATIVE_TTL seconds, so a client retrying a bad token cannot
+flood the user service.
+
+When the user service deletes a token (logout) it removes the shared entry
+and publishes the token's hash on AUTH_TOKEN_REVOKED_CHANNEL; each process
+listens on that channel in a background thread and drops its local entry,
+and refuses the signed access tokens of that session (access_tokens.py).
+The user service writes the same keys (app_user/token_revocation.py).
+"""
+from collections import OrderedDict
+from django.conf import settings
+import hashlib
+import threading
+import time
+import redis
+import logging
+from .metrics import AUTH_TOKEN_CACHE_LOOKUPS
+from . import access_tokens
+from .timing import log_event
+
+logger = logging.getLogger(__name__)
+
+# Shared with the user service, which deletes these keys on revocation
+KEY_PREFIX = 'auth_token:'
+# Stored for a token the user service rejected
+INVALID = '-'
+
+_client = None
+_client_lock = threading.Lock()
+_listener = None
+
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class LocalTokenCache:
+    """Thread-safe LRU of token hash -> (user id or None, expiry time)"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """(found, user id or None for a rejected token)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            user_id, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, user_id
+
+    def set(self, key: str, user_id, ttl: float):
+        with self._lock:
+            self._entries[key] = (user_id, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalTokenCache(settings.AUTH_TOKEN_LOCAL_CACHE_SIZE)
+
+
+def _redis():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = redis.Redis.from_url(
+                    settings.AUTH_TOKEN_CACHE_URL, socket_timeout=0.5, socket_connect_timeout=0.5
+                )
+    return _client
+
+
+def _listen_for_revocations():
+    """Evict revoked tokens from this process's cache; resubscribes after Redis errors"""
+    while True:
+        try:
+            pubsub = _redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(settings.AUTH_TOKEN_REVOKED_CHANNEL)
+            # Entries cached while unsubscribed may have missed a revocation
+            local_cache.clear()
+            for message in pubsub.listen():
+                if message['type'] == 'message':
+                    data = message['data']
+                    revoked = data.decode() if isinstance(data, bytes) else data
+                    local_cache.evict(revoked)
+                    access_tokens.revoke_session(revoked)
+        except Exception as e:
+            log_event(logger, logging.ERROR, 'revocation_listener_error', error=str(e))
+            local_cache.clear()
+            time.sleep(5)
+
+
+def start_revocation_listener():
+    """Start this process's revocation listener thread, once"""
+    global _listener
+    if _listener is None:
+        with _client_lock:
+            if _listener is None:
+                _listener = threading.Thread(target=_listen_for_revocations, name='token-revocations', daemon=True)
+                _listener.start()
+
+
+def lookup(token: str):
+    """
+    (found, user id) for a cached token; user id None means the token was
+    rejected. (False, None) when nothing is cached or Redis is unavailable.
+    """
+    start_revocation_listener()
+    key = token_hash(token)
+    found, user_id = local_cache.get(key)
+    if found:
+        AUTH_TOKEN_CACHE_LOOKUPS.labels('local').inc()
+        return True, user_id
+    try:
+        value = _redis().get(KEY_PREFIX + key)
+    except redis.RedisError as e:
+        log_event(logger, logging.ERROR, 'token_cache_unavailable', error=str(e))
+        value = None
+    if value is None:
+        AUTH_TOKEN_CACHE_LOOKUPS.labels('miss').inc()
+        return False, None
+    AUTH_TOKEN_CACHE_LOOKUPS.labels('shared').inc()
+    value = value.decode()
+    user_id = None if value == INVALID else int(value)
+    local_cache.set(key, user_id, settings.AUTH_TOKEN_LOCAL_TTL if user_id is not None else settings.AUTH_TOKEN_NEGATIVE_TTL)
+    return True, user_id
+
+
+def remember(token: str, user_id):
+    """Cache the user service's answer for a token: its user id, or None if it was rejected"""
+    key = token_hash(token)
+    if user_id is None:
+        local_ttl = shared_ttl = settings.AUTH_TOKEN_NEGATIVE_TTL
+    else:
+        local_ttl, shared_ttl = settings.AUTH_TOKEN_LOCAL_TTL, settings.AUTH_TOKEN_CACHE_TTL
+    local_cache.set(key, user_id, local_ttl)
+    try:
+        _redis().set(KEY_PREFIX + key, INVALID if user_id is None else user_id, ex=shared_ttl)
+    except redis.RedisError as e:
+        log_event(logger, logging.ERROR, 'token_cache_unavailable', error=str(e))
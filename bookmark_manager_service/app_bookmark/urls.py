@@ -3,8 +3,13 @@ from . import views
 
 urlpatterns = [
     path('bookmarks/', views.BookmarkListCreateView.as_view(), name='bookmark-list-create'),
+    path('bookmarks/import/', views.import_bookmarks, name='bookmark-import'),
     path('bookmarks/<uuid:pk>/', views.BookmarkDetailView.as_view(), name='bookmark-detail'),
     path('bookmarks/<uuid:bookmark_id>/refresh/', views.refresh_bookmark, name='bookmark-refresh'),
     path('supported-sites/', views.supported_sites, name='supported-sites'),
+    path('imports/<str:job_id>/', views.import_status, name='import-status'),
+    path('tasks/events/', views.task_events_stream, name='task-events'),
+    path('tasks/events/ticket/', views.task_events_ticket, name='task-events-ticket'),
+    path('tasks/status/', views.task_status_batch, name='task-status-batch'),
     path('tasks/<str:task_id>/status/', views.task_status, name='task-status'),
 ]
\ No newline at end of file
@@ -3,12 +3,20 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from django.shortcuts import get_object_or_404
 from .models import Bookmark, SupportedSite
-from .serializers import BookmarkSerializer, BookmarkCreateSerializer, SupportedSiteSerializer
-from .tasks import scrape_manga_info_task
-from celery.result import AsyncResult
+from .serializers import BookmarkSerializer, BookmarkCreateSerializer, BookmarkImportSerializer, SupportedSiteSerializer, TaskStatusBatchSerializer
+from .canonical import canonicalize_url
+from .scrape_cache import get_fresh_entry, create_bookmark_from_entry
+from .singleflight import dispatch_scrape
+from .bulk_import import urls_from_file, start_import, get_import_progress
+from .task_events import create_stream_ticket, redeem_stream_ticket, open_stream
+from .task_status import get_task_statuses
 from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_GET
+from django.http import JsonResponse, StreamingHttpResponse
+from django.conf import settings
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 
 class BookmarkListCreateView(generics.ListCreateAPIView):
     serializer_class = BookmarkSerializer
@@ -21,7 +29,7 @@ class BookmarkListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         # request.user will be SimpleAuthenticatedUser if authentication was successful
-        return Bookmark.objects.filter(user_id=self.request.user.id).order_by('-created_at')
+        return Bookmark.objects.filter(user_id=self.request.user.id).select_related('thumbnail_blob').prefetch_related('thumbnail_blob__derivatives').order_by('-created_at')
 
     def create(self, request, *args, **kwargs):
         user_id = request.user.id # Get user_id from authenticated user
@@ -31,17 +39,28 @@ class BookmarkListCreateView(generics.ListCreateAPIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         url = serializer.validated_data['url']
+        canonical_url = canonicalize_url(url)
 
-        existing_bookmark = Bookmark.objects.filter(user_id=user_id, url=url).first()
+        existing_bookmark = Bookmark.objects.filter(user_id=user_id, url=canonical_url).first()
         if existing_bookmark:
             return Response(
                 BookmarkSerializer(existing_bookmark, context={'request': request}).data, # Pass context
                 status=status.HTTP_200_OK
             )
 
-        task = scrape_manga_info_task.delay(user_id, url)
+        # Another user already scraped this title recently: no need to scrape again
+        cache_entry = get_fresh_entry(canonical_url)
+        if cache_entry:
+            bookmark = create_bookmark_from_entry(user_id, cache_entry)
+            return Response(
+                BookmarkSerializer(bookmark, context={'request': request}).data,
+                status=status.HTTP_201_CREATED
+            )
+
+        # Joins a scrape of the same URL that is already running, if any
+        task_id = dispatch_scrape(user_id, url)
         return Response(
-            {"detail": "Scraping started", "task_id": task.id},
+            {"detail": "Scraping started", "task_id": task_id},
             status=status.HTTP_202_ACCEPTED
         )
 
@@ -50,7 +69,7 @@ class BookmarkDetailView(generics.RetrieveDestroyAPIView):
     permission_classes = [IsAuthenticated] # Require authentication
 
     def get_queryset(self):
-        return Bookmark.objects.filter(user_id=self.request.user.id)
+        return Bookmark.objects.filter(user_id=self.request.user.id).select_related('thumbnail_blob').prefetch_related('thumbnail_blob__derivatives')
 
     def destroy(self, request, *args, **kwargs):
         user_id = request.user.id # Get user_id from authenticated user
@@ -64,10 +83,54 @@ class BookmarkDetailView(generics.RetrieveDestroyAPIView):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def task_status(request, task_id):
-    
-    """Get Celery task status by task_id"""
-    result = AsyncResult(task_id)
-    return Response({"status": result.status})
+    """Get the status of one of the user's scrape tasks"""
+    statuses = get_task_statuses(request.user.id, [task_id])
+    if task_id not in statuses['tasks']:
+        return Response({"error": "Task not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(statuses['tasks'][task_id])
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def task_status_batch(request):
+    """
+    Get the status of many of the user's scrape tasks in one request:
+    {"task_ids": [...]} -> {"tasks": {task_id: {"status", "success", "bookmark_id"}}, "not_found": [...]}
+    """
+    serializer = TaskStatusBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    return Response(get_task_statuses(request.user.id, serializer.validated_data['task_ids']))
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def task_events_ticket(request):
+    """Issue a one-time ticket for opening the user's task event stream"""
+    ticket = create_stream_ticket(request.user.id)
+    return Response(
+        {"ticket": ticket, "expires_in": settings.TASK_EVENTS_TICKET_TTL},
+        status=status.HTTP_201_CREATED
+    )
+
+@require_GET
+def task_events_stream(request):
+    """
+    Server-Sent Events with the state of each of the user's scrape tasks.
+    Opened with ?ticket= from task_events_ticket, since EventSource cannot
+    send the Authorization header; the user service is not called again.
+    """
+    user_id = redeem_stream_ticket(request.GET.get('ticket'))
+    if user_id is None:
+        return JsonResponse({"error": "Invalid or expired ticket."}, status=status.HTTP_401_UNAUTHORIZED)
+    events = open_stream(user_id)
+    if events is None:
+        # Every stream slot of this process is taken; the frontend polls instead
+        response = JsonResponse({"error": "Too many open event streams."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response['Retry-After'] = str(settings.TASK_EVENTS_STREAM_SECONDS)
+        return response
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Let a proxy pass each event on as it comes
+    return response
 
 @api_view(['GET'])
 @cache_page(60 * 15)
@@ -85,8 +148,38 @@ def refresh_bookmark(request, bookmark_id):
 
     bookmark = get_object_or_404(Bookmark, id=bookmark_id, user_id=user_id)
 
-    task = scrape_manga_info_task.delay(user_id, bookmark.url, str(bookmark.id))
+    task_id = dispatch_scrape(user_id, bookmark.url, str(bookmark.id))
     return Response(
-        {"detail": "Refresh started", "task_id": task.id},
+        {"detail": "Refresh started", "task_id": task_id},
         status=status.HTTP_202_ACCEPTED
-    )
\ No newline at end of file
+    )
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser, MultiPartParser, FormParser])
+def import_bookmarks(request):
+    """Import many bookmarks from a URL list or an uploaded browser bookmarks export"""
+    user_id = request.user.id # Get user_id from authenticated user
+
+    serializer = BookmarkImportSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    urls = [url.strip() for url in serializer.validated_data.get('urls', [])]
+    try:
+        if serializer.validated_data.get('file'):
+            urls += urls_from_file(serializer.validated_data['file'])
+        summary = start_import(user_id, urls)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(summary, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def import_status(request, job_id):
+    """Get aggregate progress of a bulk import job"""
+    progress = get_import_progress(job_id, request.user.id)
+    if progress is None:
+        return Response({"error": "Import job not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(progress)
\ No newline at end of file
@@ -0,0 +1 @@
+var galleryinfo = {"id": "1", "title": "Benchmark Gallery: Recorded Fixture", "japanese_title": "ベンチマーク", "language": "english", "language_localname": "English", "type": "manga", "date": "2024-01-01 00:00:00-06", "galleryurl": "/galleries/1.html", "artists": [{"artist": "fixture artist", "url": "/artist/fixture%20artist-all.html"}], "groups": null, "parodys": null, "characters": null, "tags": [{"tag": "full color", "url": "/tag/full%20color-all.html", "female": "", "male": ""}, {"tag": "sole female", "url": "/tag/sole%20female-all.html", "female": "", "male": ""}, {"tag": "big breasts", "url": "/tag/big%20breasts-all.html", "female": "", "male": ""}, {"tag": "schoolgirl uniform", "url": "/tag/schoolgirl%20uniform-all.html", "female": "", "male": ""}, {"tag": "glasses", "url": "/tag/glasses-all.html", "female": "", "male": ""}, {"tag": "story arc", "url": "/tag/story%20arc-all.html", "female": "", "male": ""}], "files": [{"hash": "0000000000000000000000000000000000000000000000000000000000000001", "name": "001.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000002", "name": "002.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000003", "name": "003.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000004", "name": "004.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000005", "name": "005.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000006", "name": "006.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000007", "name": "007.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000008", "name": "008.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000009", "name": "009.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000000a", "name": "010.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000000b", "name": "011.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000000c", "name": "012.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000000d", "name": "013.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000000e", "name": "014.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000000f", "name": "015.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000010", "name": "016.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000011", "name": "017.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000012", "name": "018.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000013", "name": "019.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000014", "name": "020.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000015", "name": "021.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000016", "name": "022.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000017", "name": "023.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000018", "name": "024.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000019", "name": "025.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000001a", "name": "026.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000001b", "name": "027.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000001c", "name": "028.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000001d", "name": "029.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000001e", "name": "030.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000001f", "name": "031.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000020", "name": "032.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000021", "name": "033.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000022", "name": "034.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000023", "name": "035.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000024", "name": "036.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000025", "name": "037.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000026", "name": "038.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000027", "name": "039.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000028", "name": "040.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000029", "name": "041.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000002a", "name": "042.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000002b", "name": "043.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000002c", "name": "044.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000002d", "name": "045.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000002e", "name": "046.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000002f", "name": "047.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000030", "name": "048.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000031", "name": "049.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000032", "name": "050.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000033", "name": "051.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000034", "name": "052.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000035", "name": "053.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000036", "name": "054.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000037", "name": "055.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000038", "name": "056.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "0000000000000000000000000000000000000000000000000000000000000039", "name": "057.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000003a", "name": "058.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000003b", "name": "059.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}, {"hash": "000000000000000000000000000000000000000000000000000000000000003c", "name": "060.webp", "width": 1280, "height": 1810, "haswebp": 1, "hasavif": 1}]}
\ No newline at end of file
@@ -0,0 +1,15 @@
+"""
+gunicorn settings of the web service (docker-compose.yml passes this file with -c).
+
+With PROMETHEUS_MULTIPROC_DIR set, every worker process writes its metric
+samples to files in that directory and /metrics aggregates them
+(app_bookmark/metrics.py). When a worker exits, its files are marked dead so
+a restarted worker does not leave stale samples behind.
+"""
+import os
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,8 +1,26 @@
 import os
 from celery import Celery
+from celery.signals import worker_ready
+from celery.worker.control import inspect_command
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_bookmark.settings')
 
 app = Celery('project_bookmark')
 app.config_from_object('django.conf:settings', namespace='CELERY')
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+
+@inspect_command()
+def webdriver_pool_stats(state):
+    """Report this worker's Chrome driver pool metrics (celery inspect webdriver_pool_stats)"""
+    from app_bookmark.scrapers.webdriver_manager import WebDriverPool
+    return WebDriverPool.get_pool().stats()
+
+
+@worker_ready.connect
+def start_metrics_exporter(**kwargs):
+    """Expose this worker's Prometheus metrics on CELERY_METRICS_PORT"""
+    from django.conf import settings
+    from app_bookmark.metrics import start_worker_exporter
+    if settings.CELERY_METRICS_PORT:
+        start_worker_exporter(settings.CELERY_METRICS_PORT)
@@ -33,6 +33,39 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 CELERY_TIMEZONE = 'Asia/Manila'
+# Scrapes go to the scrape_http or scrape_browser queue of their first scraper
+# (app_bookmark/routing.py); every other task goes to the default queue
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = ('app_bookmark.routing.route_task',)
+# Honour message priorities on Redis: 0 (the default) is consumed first, 9 last
+CELERY_BROKER_TRANSPORT_OPTIONS = {'priority_steps': list(range(10)), 'queue_order_strategy': 'priority'}
+# Keep each task's name and arguments with its result, so the user a scrape ran for is
+# known for as long as the result is (app_bookmark/task_status.py), even when it raised
+CELERY_RESULT_EXTENDED = True
+
+# Background refresh (app_bookmark/refresh.py): every BACKGROUND_REFRESH_INTERVAL
+# seconds, refresh up to BACKGROUND_REFRESH_BUDGET bookmarked URLs not refreshed
+# for BACKGROUND_REFRESH_MIN_AGE seconds, at BACKGROUND_REFRESH_PRIORITY
+BACKGROUND_REFRESH_INTERVAL = int(os.environ.get('BACKGROUND_REFRESH_INTERVAL', str(60 * 15)))
+BACKGROUND_REFRESH_BUDGET = int(os.environ.get('BACKGROUND_REFRESH_BUDGET', '20'))
+BACKGROUND_REFRESH_MIN_AGE = int(os.environ.get('BACKGROUND_REFRESH_MIN_AGE', str(60 * 60 * 24 * 7)))
+BACKGROUND_REFRESH_PRIORITY = 9
+
+# Thumbnail garbage collection (app_bookmark/thumbnails.py): every THUMBNAIL_GC_INTERVAL
+# seconds, delete blobs no bookmark or cache entry has referenced for THUMBNAIL_GC_GRACE_SECONDS
+THUMBNAIL_GC_INTERVAL = int(os.environ.get('THUMBNAIL_GC_INTERVAL', str(60 * 60 * 24)))
+THUMBNAIL_GC_GRACE_SECONDS = int(os.environ.get('THUMBNAIL_GC_GRACE_SECONDS', '3600'))
+
+CELERY_BEAT_SCHEDULE = {
+    'refresh-stale-bookmarks': {
+        'task': 'app_bookmark.tasks.refresh_stale_bookmarks_task',
+        'schedule': BACKGROUND_REFRESH_INTERVAL,
+    },
+    'collect-thumbnail-garbage': {
+        'task': 'app_bookmark.tasks.collect_thumbnail_garbage_task',
+        'schedule': THUMBNAIL_GC_INTERVAL,
+    },
+}
 
 CACHES = {
     "default": {
@@ -71,8 +104,162 @@ REST_FRAMEWORK = {
 
 USER_SERVICE_VALIDATE_TOKEN_URL = os.environ.get('USER_SERVICE_VALIDATE_TOKEN_URL', 'http://localhost:8001/api/user/me/')
 
+# Shared client for calls to other internal services (app_bookmark/service_client.py): pool size
+# per process, timeouts in seconds (POOL_TIMEOUT: wait for a free connection), retries of
+# idempotent calls (at most RETRY_BUDGET_RATIO of all calls) and the per-service circuit breaker
+SERVICE_HTTP_MAX_CONNECTIONS = int(os.environ.get('SERVICE_HTTP_MAX_CONNECTIONS', '50'))
+SERVICE_HTTP_MAX_KEEPALIVE = int(os.environ.get('SERVICE_HTTP_MAX_KEEPALIVE', '20'))
+SERVICE_HTTP_CONNECT_TIMEOUT = float(os.environ.get('SERVICE_HTTP_CONNECT_TIMEOUT', '1'))
+SERVICE_HTTP_READ_TIMEOUT = float(os.environ.get('SERVICE_HTTP_READ_TIMEOUT', '3'))
+SERVICE_HTTP_POOL_TIMEOUT = float(os.environ.get('SERVICE_HTTP_POOL_TIMEOUT', '1'))
+SERVICE_HTTP_RETRIES = int(os.environ.get('SERVICE_HTTP_RETRIES', '1'))
+SERVICE_HTTP_RETRY_BACKOFF = float(os.environ.get('SERVICE_HTTP_RETRY_BACKOFF', '0.05'))
+SERVICE_HTTP_RETRY_BUDGET_RATIO = float(os.environ.get('SERVICE_HTTP_RETRY_BUDGET_RATIO', '0.1'))
+SERVICE_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('SERVICE_CIRCUIT_FAILURE_THRESHOLD', '5'))
+SERVICE_CIRCUIT_OPEN_SECONDS = float(os.environ.get('SERVICE_CIRCUIT_OPEN_SECONDS', '10'))
+
+# Tokens validated by the user service are cached (app_bookmark/token_cache.py) in each
+# process for AUTH_TOKEN_LOCAL_TTL seconds and in the Redis database AUTH_TOKEN_CACHE_URL,
+# shared with the user service, for AUTH_TOKEN_CACHE_TTL; rejected tokens for
+# AUTH_TOKEN_NEGATIVE_TTL. The user service publishes deleted tokens on AUTH_TOKEN_REVOKED_CHANNEL.
+AUTH_TOKEN_CACHE_URL = os.environ.get('AUTH_TOKEN_CACHE_URL', 'redis://redis:6379/3')
+AUTH_TOKEN_LOCAL_TTL = int(os.environ.get('AUTH_TOKEN_LOCAL_TTL', '30'))
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', '300'))
+AUTH_TOKEN_NEGATIVE_TTL = int(os.environ.get('AUTH_TOKEN_NEGATIVE_TTL', '30'))
+AUTH_TOKEN_LOCAL_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_LOCAL_CACHE_SIZE', '10000'))
+AUTH_TOKEN_REVOKED_CHANNEL = os.environ.get('AUTH_TOKEN_REVOKED_CHANNEL', 'auth_token_revoked')
+
+# Keys of the user service's signed access tokens (app_bookmark/access_tokens.py), verified
+# locally: the same comma-separated key_id:secret pairs as the user service's ACCESS_TOKEN_KEYS,
+# with every key still in use during a rotation. ACCESS_TOKEN_TTL must match the user service's;
+# ACCESS_TOKEN_LEEWAY is the clock skew tolerated on expiry, in seconds.
+ACCESS_TOKEN_KEYS = dict(
+    pair.strip().split(':', 1) for pair in os.environ.get('ACCESS_TOKEN_KEYS', '').split(',') if pair.strip()
+)
+ACCESS_TOKEN_TTL = int(os.environ.get('ACCESS_TOKEN_TTL', '300'))
+ACCESS_TOKEN_LEEWAY = int(os.environ.get('ACCESS_TOKEN_LEEWAY', '10'))
+
+# Chrome driver pool used by the Selenium scrapers (one pool per worker process)
+WEBDRIVER_POOL_SIZE = int(os.environ.get('WEBDRIVER_POOL_SIZE', '2'))
+WEBDRIVER_LEASE_TIMEOUT = float(os.environ.get('WEBDRIVER_LEASE_TIMEOUT', '60'))
+WEBDRIVER_MAX_PAGES = int(os.environ.get('WEBDRIVER_MAX_PAGES', '50'))
+WEBDRIVER_MAX_RSS_MB = int(os.environ.get('WEBDRIVER_MAX_RSS_MB', '1024'))
+
+# Upper bound in seconds for waiting on a scraped page to become ready
+SCRAPER_READY_TIMEOUT = float(os.environ.get('SCRAPER_READY_TIMEOUT', '15'))
+SCRAPER_READY_TIMEOUTS = {
+    'hitomi.la': float(os.environ.get('SCRAPER_READY_TIMEOUT_HITOMI', SCRAPER_READY_TIMEOUT)),
+    'bato.to': float(os.environ.get('SCRAPER_READY_TIMEOUT_BATO', SCRAPER_READY_TIMEOUT)),
+}
+
+# Block images, fonts, stylesheets and trackers on scraped pages (scrapers/page_profile.py)
+SCRAPER_LEAN_PAGE_LOADS = os.environ.get('SCRAPER_LEAN_PAGE_LOADS', 'True') == 'True'
+
+# Port of each Celery worker's Prometheus exporter (app_bookmark/metrics.py); 0 disables it
+CELERY_METRICS_PORT = int(os.environ.get('CELERY_METRICS_PORT', '9540'))
+
+# Per-stage scrape timings (app_bookmark/timing.py) are logged as one JSON line per scrape,
+# and so are the app's other scrape events (failures, retries) at APP_LOG_LEVEL
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'timing_console': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'app_bookmark': {
+            'handlers': ['console'],
+            'level': os.environ.get('APP_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'app_bookmark.timing': {
+            'handlers': ['timing_console'],
+            'level': os.environ.get('SCRAPE_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Shared asyncio HTTP client used by scrapers (app_bookmark/scrapers/async_fetch.py):
+# pool size per worker process and timeouts in seconds
+SCRAPER_HTTP_MAX_CONNECTIONS = int(os.environ.get('SCRAPER_HTTP_MAX_CONNECTIONS', '100'))
+SCRAPER_HTTP_MAX_KEEPALIVE = int(os.environ.get('SCRAPER_HTTP_MAX_KEEPALIVE', '20'))
+SCRAPER_HTTP_TIMEOUT = float(os.environ.get('SCRAPER_HTTP_TIMEOUT', '15'))
+SCRAPER_HTTP_CONNECT_TIMEOUT = float(os.environ.get('SCRAPER_HTTP_CONNECT_TIMEOUT', '5'))
+# Largest cover image a scraper will download, in bytes
+SCRAPER_MAX_IMAGE_BYTES = int(os.environ.get('SCRAPER_MAX_IMAGE_BYTES', str(10 * 1024 * 1024)))
+
+# Shared scrape cache: new bookmarks reuse entries younger than SCRAPE_CACHE_TTL,
+# refreshes only reuse entries younger than SCRAPE_CACHE_REFRESH_TTL (seconds)
+SCRAPE_CACHE_TTL = int(os.environ.get('SCRAPE_CACHE_TTL', str(60 * 60 * 24)))
+SCRAPE_CACHE_REFRESH_TTL = int(os.environ.get('SCRAPE_CACHE_REFRESH_TTL', str(60 * 10)))
+
+# Per-site scraper limits used when a SupportedSite leaves them empty: a token
+# bucket of SCRAPER_DEFAULT_RATE_PER_MINUTE refilling up to SCRAPER_DEFAULT_BURST
+# scrapes, and at most SCRAPER_DEFAULT_MAX_CONCURRENCY scrapes of a site at once.
+# Over-budget tasks wait for their turn in the site's queue, re-checking at least every
+# SCRAPER_MAX_DEFER_SECONDS; tasks held back by an open circuit wait at most SCRAPER_MAX_DEFERRALS times.
+SCRAPER_DEFAULT_RATE_PER_MINUTE = int(os.environ.get('SCRAPER_DEFAULT_RATE_PER_MINUTE', '30'))
+SCRAPER_DEFAULT_BURST = int(os.environ.get('SCRAPER_DEFAULT_BURST', '5'))
+SCRAPER_DEFAULT_MAX_CONCURRENCY = int(os.environ.get('SCRAPER_DEFAULT_MAX_CONCURRENCY', '2'))
+SCRAPER_MAX_DEFERRALS = int(os.environ.get('SCRAPER_MAX_DEFERRALS', '30'))
+SCRAPER_MAX_DEFER_SECONDS = int(os.environ.get('SCRAPER_MAX_DEFER_SECONDS', '300'))
+# Retry delay when all of a site's slots are busy, and how long a slot survives a crashed worker
+SCRAPER_BUSY_RETRY_SECONDS = int(os.environ.get('SCRAPER_BUSY_RETRY_SECONDS', '10'))
+SCRAPER_SLOT_TTL = int(os.environ.get('SCRAPER_SLOT_TTL', '180'))
+
+# Transient scrape failures (timeouts, network errors) are retried up to
+# SCRAPER_MAX_RETRIES times, waiting about SCRAPER_RETRY_BACKOFF * 2^attempt
+# seconds (capped at SCRAPER_RETRY_BACKOFF_MAX) with jitter
+SCRAPER_MAX_RETRIES = int(os.environ.get('SCRAPER_MAX_RETRIES', '3'))
+SCRAPER_RETRY_BACKOFF = int(os.environ.get('SCRAPER_RETRY_BACKOFF', '15'))
+SCRAPER_RETRY_BACKOFF_MAX = int(os.environ.get('SCRAPER_RETRY_BACKOFF_MAX', '300'))
+
+# Per-site circuit breaker: after SCRAPER_CIRCUIT_FAILURE_THRESHOLD consecutive
+# timeouts/blocks/network errors a site is not scraped for SCRAPER_CIRCUIT_OPEN_SECONDS,
+# then one probe scrape is allowed every SCRAPER_CIRCUIT_PROBE_INTERVAL seconds until one succeeds
+SCRAPER_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('SCRAPER_CIRCUIT_FAILURE_THRESHOLD', '5'))
+SCRAPER_CIRCUIT_OPEN_SECONDS = int(os.environ.get('SCRAPER_CIRCUIT_OPEN_SECONDS', '120'))
+SCRAPER_CIRCUIT_PROBE_INTERVAL = int(os.environ.get('SCRAPER_CIRCUIT_PROBE_INTERVAL', '20'))
+
+# Seconds a scrape may stay in flight before requests for the same URL stop joining it
+SCRAPE_INFLIGHT_TTL = int(os.environ.get('SCRAPE_INFLIGHT_TTL', '600'))
+
+# Live task updates (app_bookmark/task_events.py): a user's latest task states are
+# kept for TASK_EVENTS_TTL seconds; an event stream ends after TASK_EVENTS_STREAM_SECONDS
+# (the browser reconnects after TASK_EVENTS_RETRY_MS) and sends a keepalive comment
+# every TASK_EVENTS_KEEPALIVE idle seconds; a stream ticket is valid for TASK_EVENTS_TICKET_TTL.
+# Each web process serves at most TASK_EVENTS_MAX_STREAMS streams (one thread each) and
+# refuses more with 503; keep it below the gunicorn threads per worker
+TASK_EVENTS_TTL = int(os.environ.get('TASK_EVENTS_TTL', '3600'))
+TASK_EVENTS_STREAM_SECONDS = int(os.environ.get('TASK_EVENTS_STREAM_SECONDS', '300'))
+TASK_EVENTS_RETRY_MS = int(os.environ.get('TASK_EVENTS_RETRY_MS', '2000'))
+TASK_EVENTS_KEEPALIVE = int(os.environ.get('TASK_EVENTS_KEEPALIVE', '15'))
+TASK_EVENTS_TICKET_TTL = int(os.environ.get('TASK_EVENTS_TICKET_TTL', '60'))
+TASK_EVENTS_MAX_STREAMS = int(os.environ.get('TASK_EVENTS_MAX_STREAMS', '24'))
+
+# Most task ids one POST /tasks/status/ request may ask about
+TASK_STATUS_BATCH_MAX = int(os.environ.get('TASK_STATUS_BATCH_MAX', '200'))
+
+# Maximum number of URLs one bulk import may send to the scrapers
+BULK_IMPORT_MAX_URLS = int(os.environ.get('BULK_IMPORT_MAX_URLS', '5000'))
+
+# Widths (px) of the WebP/JPEG thumbnail derivatives generated for every stored cover
+THUMBNAIL_DERIVATIVE_WIDTHS = [int(width) for width in os.environ.get('THUMBNAIL_DERIVATIVE_WIDTHS', '160 320 480').split()]
+
+# Redirect scraper traffic for a site (and its subdomains) to another origin, e.g. a
+# local fixture server: "hitomi.la=http://127.0.0.1:8765 bato.to=http://127.0.0.1:8766"
+SCRAPER_HOST_OVERRIDES = dict(
+    entry.split('=', 1) for entry in os.environ.get('SCRAPER_HOST_OVERRIDES', '').split() if '=' in entry
+)
+
 
 MIDDLEWARE = [
+    'app_bookmark.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -1,17 +1,22 @@
 import React from "react"
 import { ExternalLink, BookOpen, Trash2 } from "lucide-react"
+import type { ThumbnailSrcSet } from "@/services/MangaBookmarkService"
+
+// Rendered width of a card at each grid breakpoint (see MangaGrid)
+const THUMBNAIL_SIZES = "(min-width: 1280px) 16vw, (min-width: 1024px) 20vw, (min-width: 768px) 25vw, (min-width: 640px) 33vw, 50vw"
 
 interface MangaCardProps {
   id?: string | number
   title: string
   thumbnail: string
+  thumbnailSrcSet?: ThumbnailSrcSet | null
   url?: string
   onClick?: () => void
   onDelete?: () => void
   className?: string
 }
 
-const MangaCard: React.FC<MangaCardProps> = React.memo(({ title, thumbnail, url, onClick, onDelete, className = "" }) => {
+const MangaCard: React.FC<MangaCardProps> = React.memo(({ title, thumbnail, thumbnailSrcSet, url, onClick, onDelete, className = "" }) => {
   const handleClick = () => {
     if (onClick) {
       onClick()
@@ -32,7 +37,8 @@ const MangaCard: React.FC<MangaCardProps> = React.memo(({ title, thumbnail, url,
     const target = e.target as HTMLImageElement
     console.error("Failed to load image:", target.src) // Add logging
     target.style.display = "none"
-    const fallback = target.nextElementSibling as HTMLElement
+    // The fallback follows the <picture> wrapper
+    const fallback = (target.closest("picture") ?? target).nextElementSibling as HTMLElement
     if (fallback) {
       fallback.classList.remove("hidden")
     }
@@ -47,13 +53,21 @@ const MangaCard: React.FC<MangaCardProps> = React.memo(({ title, thumbnail, url,
       <div className="relative aspect-[3/4] overflow-hidden rounded-t-2xl bg-gradient-to-br from-gray-100 to-gray-200">
         {thumbnail && thumbnail !== "/placeholder.svg" ? (
           <>
-            <img
-              src={thumbnail || "/placeholder.svg"}
-              alt={title}
-              loading="lazy"
-              className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-105"
-              onError={handleImageError}
-            />
+            <picture>
+              {thumbnailSrcSet?.webp && (
+                <source type="image/webp" srcSet={thumbnailSrcSet.webp} sizes={THUMBNAIL_SIZES} />
+              )}
+              <img
+                src={thumbnail || "/placeholder.svg"}
+                srcSet={thumbnailSrcSet?.jpeg}
+                sizes={thumbnailSrcSet?.jpeg ? THUMBNAIL_SIZES : undefined}
+                alt={title}
+                loading="lazy"
+                decoding="async"
+                className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-105"
+                onError={handleImageError}
+              />
+            </picture>
             {/* Fallback placeholder - hidden by default */}
             <div className="hidden w-full h-full flex items-center justify-center bg-gradient-to-br from-blue-50 to-purple-50">
               <div className="text-center">
@@ -1,10 +1,12 @@
 import React from "react"
 import MangaCard from "@/components/ui/MangaCard"
+import type { ThumbnailSrcSet } from "@/services/MangaBookmarkService"
 
 interface MangaItem {
   id: string | number
   title: string
   thumbnail: string
+  thumbnailSrcSet?: ThumbnailSrcSet | null
   url?: string
 }
 
@@ -53,6 +55,7 @@ const MangaGrid: React.FC<MangaGridProps> = React.memo(({
           key={manga.id}
           title={manga.title}
           thumbnail={manga.thumbnail}
+          thumbnailSrcSet={manga.thumbnailSrcSet}
           url={manga.url}
           onClick={() => onMangaClick?.(manga)}
           onDelete={onMangaDelete ? () => onMangaDelete(manga) : undefined}
@@ -6,6 +6,7 @@ import React, {
   ReactNode,
 } from "react";
 import { authenticationService, SignUpRequest, SignUpResponse } from "@/services/AuthenticationService";
+import { storeAccessToken, clearAccessToken } from "@/services/AccessToken";
 
 interface User {
   id: number;
@@ -61,6 +62,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
       // Store token and user data
       localStorage.setItem("token", response.token);
       localStorage.setItem("user", JSON.stringify(response.user_info));
+      storeAccessToken(response.access_token, response.access_token_expires_in);
 
       setToken(response.token);
       setUser(response.user_info);
@@ -80,6 +82,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
       // Store token and user data
       localStorage.setItem("token", response.token);
       localStorage.setItem("user", JSON.stringify(response.user_info));
+      storeAccessToken(response.access_token, response.access_token_expires_in);
 
       setToken(response.token);
       setUser(response.user_info);
@@ -98,6 +101,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
       // Clear local storage and state
       localStorage.removeItem("token");
       localStorage.removeItem("user");
+      clearAccessToken();
       setToken(null);
       setUser(null);
     }
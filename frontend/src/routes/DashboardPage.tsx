@@ -6,12 +6,14 @@ import MangaCardSkeleton from "@/components/ui/MangaCardSkeleton";
 import SupportedSitesModal from "@/components/dashboardpage/SupportedSitesModal"
 import Footer from "@/components/global/Footer";
 import { useToast } from "@/contexts/ToastContext";
-import { mangaApi } from "@/services/MangaBookmarkService";
+import { mangaApi, type ThumbnailSrcSet } from "@/services/MangaBookmarkService";
+import { taskEvents } from "@/services/TaskEventStream";
 
 interface MangaItem {
   id: string | number;
   title: string;
   thumbnail: string;
+  thumbnailSrcSet?: ThumbnailSrcSet | null;
   url?: string;
 }
 
@@ -41,6 +43,7 @@ const DashboardPage: React.FC = () => {
             title: manga.title,
             // Use thumbnail_url primarily (should be local when available)
             thumbnail: manga.thumbnail_url || '/placeholder.svg',
+            thumbnailSrcSet: manga.thumbnail_srcset,
             url: manga.url
           };
         });
@@ -53,18 +56,6 @@ const DashboardPage: React.FC = () => {
     }
   };
 
-  // Polling helper
-  const pollTaskCompletion = async (taskId: string, interval = 2000, timeout = 30000) => {
-    const start = Date.now();
-    while (true) {
-      const statusResp = await mangaApi.getTaskStatus(taskId);
-      if (statusResp.status === "SUCCESS") return;
-      if (statusResp.status === "FAILURE") throw new Error("Failed to add manga (scraping failed).");
-      if (Date.now() - start > timeout) throw new Error("Timed out while adding manga.");
-      await new Promise(res => setTimeout(res, interval));
-    }
-  };
-
   const handleAddManga = async (url: string): Promise<void> => {
     setIsLoading(true);
 
@@ -79,8 +70,8 @@ const DashboardPage: React.FC = () => {
           message: "We're fetching manga details. This may take a few seconds.",
         });
 
-        // Step 2: Poll for task completion
-        await pollTaskCompletion(addResponse.task_id);
+        // Step 2: Wait for the task to finish (pushed over the task event stream)
+        await taskEvents.waitFor(addResponse.task_id, 60000);
 
         // Step 3: Reload manga list
         await loadMangaList();
@@ -95,6 +86,7 @@ const DashboardPage: React.FC = () => {
           id: addResponse.id,
           title: addResponse.title,
           thumbnail: addResponse.thumbnail_url || addResponse.thumbnail || '/placeholder.svg',
+          thumbnailSrcSet: addResponse.thumbnail_srcset,
           url: addResponse.url,
         };
         setMangaList(prev => [mangaItem, ...prev]);
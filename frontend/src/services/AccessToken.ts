@@ -0,0 +1,55 @@
+const USER_API_BASE_URL = import.meta.env.VITE_USER_API_BASE_URL
+
+// Renew the access token this long before it expires
+const REFRESH_MARGIN_MS = 30000;
+
+let refreshing: Promise<string | null> | null = null;
+
+export function storeAccessToken(accessToken?: string, expiresIn?: number) {
+  if (!accessToken || !expiresIn) {
+    clearAccessToken();
+    return;
+  }
+  localStorage.setItem("access_token", accessToken);
+  localStorage.setItem("access_token_expires_at", String(Date.now() + expiresIn * 1000));
+}
+
+export function clearAccessToken() {
+  localStorage.removeItem("access_token");
+  localStorage.removeItem("access_token_expires_at");
+}
+
+async function refreshAccessToken(token: string): Promise<string | null> {
+  const response = await fetch(`${USER_API_BASE_URL}/token/refresh/`, {
+    method: "POST",
+    headers: { Authorization: `Token ${token}` },
+  });
+  if (!response.ok) {
+    clearAccessToken();
+    return null;
+  }
+  const data = await response.json();
+  storeAccessToken(data.access_token, data.access_token_expires_in);
+  return data.access_token;
+}
+
+/**
+ * Authorization header for bookmark service requests. The signed access token
+ * from login is verified by the bookmark service without calling the user
+ * service; it is renewed with the login token shortly before it expires. If
+ * there is none (signing disabled) or it cannot be renewed, the login token
+ * is sent instead, which the bookmark service validates with the user service.
+ */
+export async function authorizationHeader(): Promise<string> {
+  const token = localStorage.getItem("token");
+  if (!token) throw new Error("Authentication token not found. Please log in again.");
+  const accessToken = localStorage.getItem("access_token");
+  if (!accessToken) return `Token ${token}`;
+  if (Date.now() < Number(localStorage.getItem("access_token_expires_at")) - REFRESH_MARGIN_MS) {
+    return `Bearer ${accessToken}`;
+  }
+  // Concurrent requests share one refresh
+  refreshing ??= refreshAccessToken(token).finally(() => { refreshing = null; });
+  const refreshed = await refreshing.catch(() => null);
+  return refreshed ? `Bearer ${refreshed}` : `Token ${token}`;
+}
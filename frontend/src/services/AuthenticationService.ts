@@ -16,6 +16,9 @@ export interface SignUpResponse {
     email: string;
   };
   token: string;
+  // Signed access token for the bookmark service, if the user service issues them
+  access_token?: string;
+  access_token_expires_in?: number;
 }
 
 export interface ApiError {
@@ -1,11 +1,20 @@
+import { authorizationHeader } from "@/services/AccessToken";
+
 const API_BASE_URL = import.meta.env.VITE_BOOKMARK_API_BASE_URL
 
+// Resized thumbnail variants per format, as `srcset` strings
+export interface ThumbnailSrcSet {
+  webp?: string;
+  jpeg?: string;
+}
+
 interface MangaBookmark {
   id: string; 
   title: string;
   url: string;
   thumbnail?: string;
   thumbnail_url?: string;
+  thumbnail_srcset?: ThumbnailSrcSet | null;
   site_name?: string;
   created_at: string;
   updated_at: string;
@@ -17,6 +26,7 @@ interface AddMangaResponse {
   url: string;
   thumbnail?: string;
   thumbnail_url?: string;
+  thumbnail_srcset?: ThumbnailSrcSet | null;
   site_name?: string;
   created_at: string;
   updated_at: string;
@@ -39,12 +49,11 @@ interface SupportedSite {
 
 export const mangaApi = {
   async addManga(url: string): Promise<AddMangaResponse | { detail: string; task_id: string }> {
-    const token = localStorage.getItem('token');
-    if (!token) throw new Error("Authentication token not found. Please log in again.");
+    const authorization = await authorizationHeader();
 
     const headers: HeadersInit = {
       'Content-Type': 'application/json',
-      'Authorization': `Token ${token}`,
+      'Authorization': authorization,
     };
 
     const response = await fetch(`${API_BASE_URL}/bookmarks/`, {
@@ -53,7 +62,7 @@ export const mangaApi = {
       body: JSON.stringify({ url }),
     });
 
-    // If 202 Accepted, return task_id for polling
+    // If 202 Accepted, return task_id to follow the scrape with
     if (response.status === 202) {
       return await response.json();
     }
@@ -83,26 +92,40 @@ export const mangaApi = {
   },
 
   async getTaskStatus(taskId: string): Promise<{ status: string }> {
-    const token = localStorage.getItem('token');
-    if (!token) throw new Error("Authentication token not found. Please log in again.");
+    const authorization = await authorizationHeader();
 
     const headers: HeadersInit = {
       'Content-Type': 'application/json',
-      'Authorization': `Token ${token}`,
+      'Authorization': authorization,
     };
 
     const response = await fetch(`${API_BASE_URL}/tasks/${taskId}/status/`, {
       method: 'GET',
       headers,
     });
+    // Not one of the user's tasks, or its result has expired: it will not turn up later
+    if (response.status === 404) return { status: "NOT_FOUND" };
     if (!response.ok) throw new Error("Failed to check task status");
     return await response.json();
   },
 
+  // One-time ticket for opening the task event stream (see TaskEventStream.ts)
+  async getTaskEventsTicket(): Promise<{ ticket: string; expires_in: number }> {
+    const authorization = await authorizationHeader();
+
+    const response = await fetch(`${API_BASE_URL}/tasks/events/ticket/`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': authorization,
+      },
+    });
+    if (!response.ok) throw new Error("Failed to open task event stream");
+    return await response.json();
+  },
+
   async getMangaList(): Promise<PaginatedResponse<MangaBookmark>> {
-    const token = localStorage.getItem('token');
-    
-    if (!token) {
+    if (!localStorage.getItem('token')) {
       console.error("Authentication token not found for getMangaList. Returning empty list.");
       return {
         count: 0,
@@ -111,10 +134,11 @@ export const mangaApi = {
         results: []
       };
     }
+    const authorization = await authorizationHeader();
 
     const headers: HeadersInit = {
       'Content-Type': 'application/json',
-      'Authorization': `Token ${token}`,
+      'Authorization': authorization,
     };
     
     const response = await fetch(`${API_BASE_URL}/bookmarks/`, {
@@ -130,12 +154,11 @@ export const mangaApi = {
   },
 
   async deleteManga(id: string): Promise<void> {
-    const token = localStorage.getItem('token');
-    if (!token) throw new Error("Authentication token not found. Please log in again.");
+    const authorization = await authorizationHeader();
 
     const headers: HeadersInit = {
       'Content-Type': 'application/json',
-      'Authorization': `Token ${token}`,
+      'Authorization': authorization,
     };
 
     const response = await fetch(`${API_BASE_URL}/bookmarks/${id}/`, {
@@ -167,12 +190,11 @@ export const mangaApi = {
   },
 
   async refreshManga(bookmarkId: string): Promise<{ detail: string; task_id: string }> {
-    const token = localStorage.getItem('token');
-    if (!token) throw new Error("Authentication token not found. Please log in again.");
+    const authorization = await authorizationHeader();
 
     const headers: HeadersInit = {
       'Content-Type': 'application/json',
-      'Authorization': `Token ${token}`,
+      'Authorization': authorization,
     };
 
     const response = await fetch(`${API_BASE_URL}/bookmarks/${bookmarkId}/refresh/`, {
@@ -0,0 +1,148 @@
+import { mangaApi } from "@/services/MangaBookmarkService";
+
+const API_BASE_URL = import.meta.env.VITE_BOOKMARK_API_BASE_URL
+
+// One state change or stage of a scrape task, as pushed by the bookmark service
+export interface TaskEvent {
+  task_id: string;
+  state: "PENDING" | "STARTED" | "RETRY" | "SUCCESS" | "FAILURE";
+  stage: string;
+  time: number;
+  success?: boolean;
+  error?: string | null;
+  bookmark_id?: string | null;
+  retry_in?: number;
+}
+
+interface Waiter {
+  resolve: (event: TaskEvent) => void;
+  reject: (err: Error) => void;
+  onEvent?: (event: TaskEvent) => void;
+  timer: ReturnType<typeof setTimeout>;
+  deadline: number;
+}
+
+/**
+ * Follows all of the user's pending tasks over one Server-Sent Events
+ * connection, open only while something is being waited for. The stream is
+ * opened with a one-time ticket; when the server ends it, a new ticket is
+ * fetched and the stream reopened, and the server replays the current states.
+ * If no stream can be opened (e.g. the server is at its stream limit and
+ * answers 503), the waiting tasks are polled instead.
+ */
+class TaskEventStream {
+  private source: EventSource | null = null;
+  private waiters = new Map<string, Waiter>();
+  // Final events that arrived before anyone waited for their task
+  private finished = new Map<string, TaskEvent>();
+  private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+
+  waitFor(taskId: string, timeout = 60000, onEvent?: (event: TaskEvent) => void): Promise<TaskEvent> {
+    const done = this.finished.get(taskId);
+    if (done) {
+      this.finished.delete(taskId);
+      return done.state === "SUCCESS" ? Promise.resolve(done) : Promise.reject(new Error(done.error || "Scraping failed."));
+    }
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.settle(taskId);
+        reject(new Error("Timed out while adding manga."));
+      }, timeout);
+      this.waiters.set(taskId, { resolve, reject, onEvent, timer, deadline: Date.now() + timeout });
+      this.open().catch(err => {
+        // No stream (e.g. an older backend): fall back to polling this task
+        console.error("Could not open task event stream, polling instead:", err);
+        this.pollInstead(taskId);
+      });
+    });
+  }
+
+  private settle(taskId: string) {
+    const waiter = this.waiters.get(taskId);
+    if (waiter) clearTimeout(waiter.timer);
+    this.waiters.delete(taskId);
+    if (this.waiters.size === 0) this.close();
+  }
+
+  private pollInstead(taskId: string) {
+    const waiter = this.waiters.get(taskId);
+    if (!waiter) return;
+    this.settle(taskId);
+    pollTaskStatus(taskId, Math.max(0, waiter.deadline - Date.now())).then(waiter.resolve, waiter.reject);
+  }
+
+  private async open() {
+    if (this.source) return;
+    const { ticket } = await mangaApi.getTaskEventsTicket();
+    if (this.source || this.waiters.size === 0) return;
+    const source = new EventSource(`${API_BASE_URL}/tasks/events/?ticket=${encodeURIComponent(ticket)}`);
+    let opened = false;
+    source.onopen = () => { opened = true; };
+    source.addEventListener("task", message => this.handle(JSON.parse((message as MessageEvent).data)));
+    source.onerror = () => {
+      if (source.readyState !== EventSource.CLOSED) source.close();
+      if (this.source !== source) return;
+      this.source = null;
+      if (!opened) {
+        // Refused, e.g. 503 while the server holds its maximum of streams
+        console.error("Task event stream refused, polling instead");
+        for (const taskId of [...this.waiters.keys()]) this.pollInstead(taskId);
+        return;
+      }
+      // A dropped connection retries with the same, already used, ticket and is
+      // refused; start over with a new one
+      this.reconnectTimer = setTimeout(() => {
+        this.reconnectTimer = null;
+        if (this.waiters.size === 0) return;
+        this.open().catch(err => {
+          console.error("Could not reopen task event stream, polling instead:", err);
+          for (const taskId of [...this.waiters.keys()]) this.pollInstead(taskId);
+        });
+      }, 2000);
+    };
+    this.source = source;
+  }
+
+  private close() {
+    if (this.reconnectTimer) clearTimeout(this.reconnectTimer);
+    this.reconnectTimer = null;
+    this.source?.close();
+    this.source = null;
+  }
+
+  private handle(event: TaskEvent) {
+    const waiter = this.waiters.get(event.task_id);
+    const final = event.state === "SUCCESS" || event.state === "FAILURE";
+    if (!waiter) {
+      if (final) {
+        this.finished.set(event.task_id, event);
+        // The stream replays every recent task; keep only the latest few
+        if (this.finished.size > 100) this.finished.delete(this.finished.keys().next().value as string);
+      }
+      return;
+    }
+    waiter.onEvent?.(event);
+    if (!final) return;
+    this.settle(event.task_id);
+    if (event.state === "SUCCESS") waiter.resolve(event);
+    else waiter.reject(new Error(event.error || "Failed to add manga (scraping failed)."));
+  }
+}
+
+async function pollTaskStatus(taskId: string, timeout: number, interval = 2000): Promise<TaskEvent> {
+  const start = Date.now();
+  while (true) {
+    const statusResp = await mangaApi.getTaskStatus(taskId).catch(err => {
+      // A failed check is retried until the timeout
+      console.error("Could not check task status:", err);
+      return null;
+    });
+    if (statusResp?.status === "SUCCESS") return { task_id: taskId, state: "SUCCESS", stage: "done", time: Date.now() / 1000 };
+    if (statusResp?.status === "FAILURE") throw new Error("Failed to add manga (scraping failed).");
+    if (statusResp?.status === "NOT_FOUND") throw new Error("This task is no longer available. Refresh the page to see your bookmarks.");
+    if (Date.now() - start > timeout) throw new Error("Timed out while adding manga.");
+    await new Promise(res => setTimeout(res, interval));
+  }
+}
+
+export const taskEvents = new TaskEventStream();
@@ -0,0 +1,62 @@
+"""
+Short-lived signed access tokens.
+
+Besides its opaque DRF token, a user who logs in or registers gets an access
+token: a JWT signed with HMAC-SHA256 that other services verify locally
+(bookmark_manager_service/app_bookmark/access_tokens.py) instead of calling
+/api/user/me/. It carries the user id, expires after ACCESS_TOKEN_TTL
+seconds and names its signing key in the `kid` header, so keys can be
+rotated (see ACCESS_TOKEN_KEYS in settings). The DRF token serves as the
+refresh credential: POST /api/user/token/refresh/ with it returns a new
+access token, and once it is deleted (logout) no more are issued.
+
+`sid` is the SHA-256 of that DRF token, the hash token_revocation.py
+publishes when the token is deleted, so verifiers can also reject the access
+tokens of a session that has logged out.
+"""
+from django.conf import settings
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+ISSUER = 'user_service'
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def signing_enabled() -> bool:
+    return bool(settings.ACCESS_TOKEN_KEYS)
+
+
+def issue_access_token(user, refresh_key: str) -> str:
+    """An access token for `user`, tied to the session of the DRF token `refresh_key`"""
+    key_id = settings.ACCESS_TOKEN_SIGNING_KEY_ID
+    now = int(time.time())
+    header = {'alg': 'HS256', 'typ': 'JWT', 'kid': key_id}
+    claims = {
+        'iss': ISSUER,
+        'sub': str(user.id),
+        'iat': now,
+        'exp': now + settings.ACCESS_TOKEN_TTL,
+        'sid': hashlib.sha256(refresh_key.encode()).hexdigest(),
+        'typ': 'access',
+    }
+    signing_input = '.'.join(
+        _b64encode(json.dumps(part, separators=(',', ':')).encode()) for part in (header, claims)
+    )
+    signature = hmac.new(settings.ACCESS_TOKEN_KEYS[key_id].encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{_b64encode(signature)}"
+
+
+def access_token_fields(user, refresh_key: str) -> dict:
+    """Access token fields for a login, registration or refresh response; empty if signing is disabled"""
+    if not signing_enabled():
+        return {}
+    return {
+        'access_token': issue_access_token(user, refresh_key),
+        'access_token_expires_in': settings.ACCESS_TOKEN_TTL,
+    }
@@ -0,0 +1,27 @@
+"""
+Prometheus metrics of the user service, served at /metrics.
+
+Metrics are kept in-process by prometheus_client, so they can be read with
+curl without a collector. gunicorn runs several worker processes; set
+PROMETHEUS_MULTIPROC_DIR so that /metrics aggregates all of them.
+"""
+from django.http import HttpResponse
+from prometheus_client import (
+    CollectorRegistry, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess,
+)
+import os
+
+REQUEST_LATENCY = Histogram(
+    'user_http_request_duration_seconds', 'Latency of API requests per view',
+    ['view', 'method', 'status']
+)
+
+
+def metrics_view(request):
+    """GET /metrics: Prometheus text exposition of the service's metrics"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
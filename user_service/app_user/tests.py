@@ -1,3 +1,102 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from unittest import mock
+import base64
+import hashlib
+import hmac
+import json
+from . import access_tokens, token_revocation
 
-# Create your tests here.
+
+def _decode(segment: str) -> dict:
+    return json.loads(base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4)))
+
+
+def _signature_valid(token: str, secret: str) -> bool:
+    signing_input, signature = token.rsplit('.', 1)
+    expected = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return hmac.compare_digest(base64.urlsafe_b64encode(expected).rstrip(b'=').decode(), signature)
+
+
+@override_settings(
+    ACCESS_TOKEN_KEYS={'current': 'current-secret', 'previous': 'previous-secret'},
+    ACCESS_TOKEN_SIGNING_KEY_ID='current', ACCESS_TOKEN_TTL=300, SECURE_SSL_REDIRECT=False,
+)
+class AccessTokenTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'correct horse battery')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+
+    def test_issued_token_claims_and_signature(self):
+        token = access_tokens.issue_access_token(self.user, self.token.key)
+        header, claims, _ = token.split('.')
+        self.assertEqual(_decode(header), {'alg': 'HS256', 'typ': 'JWT', 'kid': 'current'})
+        claims = _decode(claims)
+        self.assertEqual(claims['sub'], str(self.user.id))
+        self.assertEqual((claims['iss'], claims['typ']), ('user_service', 'access'))
+        self.assertEqual(claims['exp'] - claims['iat'], 300)
+        self.assertEqual(claims['sid'], hashlib.sha256(self.token.key.encode()).hexdigest())
+        self.assertTrue(_signature_valid(token, 'current-secret'))
+        self.assertFalse(_signature_valid(token, 'previous-secret'))
+
+    def test_rotated_signing_key(self):
+        with override_settings(ACCESS_TOKEN_SIGNING_KEY_ID='previous'):
+            token = access_tokens.issue_access_token(self.user, self.token.key)
+        self.assertEqual(_decode(token.split('.')[0])['kid'], 'previous')
+        self.assertTrue(_signature_valid(token, 'previous-secret'))
+
+    def test_login_returns_access_token(self):
+        response = self.client.post(
+            '/api/user/login/', {'username': 'reader', 'password': 'correct horse battery'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['token'], self.token.key)
+        self.assertEqual(response.data['access_token_expires_in'], 300)
+        self.assertTrue(_signature_valid(response.data['access_token'], 'current-secret'))
+
+    def test_refresh_with_drf_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        response = self.client.post('/api/user/token/refresh/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(_decode(response.data['access_token'].split('.')[1])['sub'], str(self.user.id))
+
+    def test_no_refresh_after_logout(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with mock.patch.object(token_revocation, 'revoke_token'):
+            self.assertEqual(self.client.post('/api/user/logout/').status_code, 204)
+        self.assertEqual(self.client.post('/api/user/token/refresh/').status_code, 401)
+
+    @override_settings(ACCESS_TOKEN_KEYS={})
+    def test_signing_disabled(self):
+        self.assertEqual(access_tokens.access_token_fields(self.user, self.token.key), {})
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.client.post('/api/user/token/refresh/').status_code, 501)
+
+
+@override_settings(AUTH_TOKEN_REVOKED_CHANNEL='auth_token_revoked', SECURE_SSL_REDIRECT=False)
+class TokenRevocationTests(TestCase):
+
+    def test_logout_revokes_the_access_token_session(self):
+        user = User.objects.create_user('leaver', 'leaver@example.com', 'correct horse battery')
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        with mock.patch.object(token_revocation, 'revoke_token') as revoke_token, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post('/api/user/logout/').status_code, 204)
+        revoke_token.assert_called_once_with(token.key)
+
+    def test_revocation_deletes_shared_entry_and_publishes_session(self):
+        pipeline = mock.Mock()
+        key = 'a' * 40
+        token_hash = hashlib.sha256(key.encode()).hexdigest()
+        with mock.patch.object(token_revocation, '_redis') as client:
+            client.return_value.pipeline.return_value = pipeline
+            token_revocation.revoke_token(key)
+        pipeline.delete.assert_called_once_with(token_revocation.KEY_PREFIX + token_hash)
+        pipeline.publish.assert_called_once_with('auth_token_revoked', token_hash)
+        pipeline.execute.assert_called_once_with()
@@ -0,0 +1,50 @@
+"""
+Revocation of tokens cached by other services.
+
+The bookmark service caches the tokens it has validated, by SHA-256, in its
+processes and in the Redis database AUTH_TOKEN_CACHE_URL
+(bookmark_manager_service/app_bookmark/token_cache.py). When a token is
+deleted, on logout or otherwise, its shared entry is removed and its hash is
+published on AUTH_TOKEN_REVOKED_CHANNEL so every process drops it at once.
+The same hash is the `sid` claim of the access tokens issued for the token
+(access_tokens.py), so its access tokens are rejected from then on as well.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+import hashlib
+import redis
+
+# Must match token_cache.KEY_PREFIX in the bookmark service
+KEY_PREFIX = 'auth_token:'
+
+_client = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.AUTH_TOKEN_CACHE_URL, socket_timeout=2, socket_connect_timeout=2)
+    return _client
+
+
+def revoke_token(key: str):
+    """Evict a token from every service's token cache"""
+    token_hash = hashlib.sha256(key.encode()).hexdigest()
+    try:
+        pipeline = _redis().pipeline()
+        pipeline.delete(KEY_PREFIX + token_hash)
+        pipeline.publish(settings.AUTH_TOKEN_REVOKED_CHANNEL, token_hash)
+        pipeline.execute()
+    except redis.RedisError as e:
+        # Other services keep accepting the token until their cache entries expire
+        print(f"[ERROR] Could not publish revocation of a token: {e}")
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    # The key is the primary key, which Django clears on the instance right after this signal
+    key = instance.key
+    transaction.on_commit(lambda: revoke_token(key))
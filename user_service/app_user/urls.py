@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import UserRegistrationView, UserLoginView, UserLogoutView, UserDetailView
+from .views import UserRegistrationView, UserLoginView, UserLogoutView, UserDetailView, AccessTokenRefreshView
 
 urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='user-registration'),
     path('login/', UserLoginView.as_view(), name='user-login'),
     path('logout/', UserLogoutView.as_view(), name='user-logout'),
+    path('token/refresh/', AccessTokenRefreshView.as_view(), name='access-token-refresh'),
     path('me/', UserDetailView.as_view(), name='user-detail'),
 ]
\ No newline at end of file
@@ -9,6 +9,7 @@ from django.contrib.auth import authenticate
 from django.core.cache import cache
 
 from .serializers import UserRegistrationSerializer, UserDetailSerializer
+from .access_tokens import access_token_fields, signing_enabled
 
 
 class UserRegistrationView(APIView):
@@ -27,7 +28,8 @@ class UserRegistrationView(APIView):
                         "username": user.username,
                         "email": user.email
                     },
-                    "token": token.key
+                    "token": token.key,
+                    **access_token_fields(user, token.key)
                 },
                 status=status.HTTP_201_CREATED
             )
@@ -58,7 +60,8 @@ class UserLoginView(APIView):
                         "username": user.username,
                         "email": user.email
                     },
-                    "token": token.key
+                    "token": token.key,
+                    **access_token_fields(user, token.key)
                 },
                 status=status.HTTP_200_OK
             )
@@ -67,6 +70,20 @@ class UserLoginView(APIView):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+class AccessTokenRefreshView(APIView):
+    """Issue a new signed access token; authenticated with the DRF token, which acts as the refresh token"""
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'token_refresh'
+
+    def post(self, request):
+        if not signing_enabled():
+            return Response(
+                {"error": "Signed access tokens are not enabled"},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        return Response(access_token_fields(request.user, request.auth.key), status=status.HTTP_200_OK)
+
 class UserLogoutView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -74,6 +91,8 @@ class UserLogoutView(APIView):
         try:
             cache_key = f"user_detail_{request.user.id}"
             cache.delete(cache_key)
+            # Also evicts the token from other services' caches and revokes its access tokens
+            # (see token_revocation.py)
             request.user.auth_token.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
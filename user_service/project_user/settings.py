@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -71,10 +72,12 @@ REST_FRAMEWORK = {
         'user': '1000/hour',
         'login': '5/minute',
         'register': '3/minute',
+        'token_refresh': '30/minute',
     }
 }
 
 MIDDLEWARE = [
+    'app_user.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -135,6 +138,24 @@ CACHES = {
     }
 }
 
+# Redis database where other services cache validated tokens, and the channel on which
+# deleted tokens are announced to them (app_user/token_revocation.py)
+AUTH_TOKEN_CACHE_URL = os.environ.get('AUTH_TOKEN_CACHE_URL', 'redis://redis:6379/3')
+AUTH_TOKEN_REVOKED_CHANNEL = os.environ.get('AUTH_TOKEN_REVOKED_CHANNEL', 'auth_token_revoked')
+
+# Signed access tokens (app_user/access_tokens.py). ACCESS_TOKEN_KEYS is a comma-separated list
+# of key_id:secret pairs, shared with the services that verify the tokens; empty disables them.
+# Tokens are signed with ACCESS_TOKEN_SIGNING_KEY_ID (default: the first key). To rotate, add the
+# new key to every service, then make it the signing key, and remove the old one after ACCESS_TOKEN_TTL.
+ACCESS_TOKEN_KEYS = dict(
+    pair.strip().split(':', 1) for pair in os.environ.get('ACCESS_TOKEN_KEYS', '').split(',') if pair.strip()
+)
+ACCESS_TOKEN_SIGNING_KEY_ID = os.environ.get('ACCESS_TOKEN_SIGNING_KEY_ID') or next(iter(ACCESS_TOKEN_KEYS), None)
+if ACCESS_TOKEN_KEYS and ACCESS_TOKEN_SIGNING_KEY_ID not in ACCESS_TOKEN_KEYS:
+    # Would otherwise fail every login and registration
+    raise ImproperlyConfigured(f"ACCESS_TOKEN_SIGNING_KEY_ID '{ACCESS_TOKEN_SIGNING_KEY_ID}' is not in ACCESS_TOKEN_KEYS")
+ACCESS_TOKEN_TTL = int(os.environ.get('ACCESS_TOKEN_TTL', '300'))
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
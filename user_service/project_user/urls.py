@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include # Import include
+from app_user.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/user/', include('app_user.urls')), # Add this line
 ]
\ No newline at end of file